@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import DETAIL_SECTIONS
+from .config import ASYNC_MAX_CONCURRENCY
+from .tmdb_service import TMDbService
+
+# Worker threads that perform the blocking HTTP calls for every AsyncTMDbService.
+# Its size is the process-wide bound on concurrent batch requests.
+_executor = ThreadPoolExecutor(max_workers=ASYNC_MAX_CONCURRENCY, thread_name_prefix="tmdb-async")
+
+
+def _page_numbers(pages):
+    """Normalize a page count or an iterable of page numbers to a list of page numbers"""
+    if isinstance(pages, int):
+        return list(range(1, pages + 1))
+    return list(pages)
+
+
+def run_sync(coro):
+    """Run a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # A loop is already running in this thread, so run the coroutine on a helper thread
+    with ThreadPoolExecutor(max_workers=1) as helper:
+        return helper.submit(asyncio.run, coro).result()
+
+
+class AsyncTMDbService:
+    """asyncio counterpart of TMDbService that fetches many resources concurrently
+
+    Requests go through the wrapped TMDbService, so they share its connection pool,
+    response cache and rate limiter.
+    """
+
+    def __init__(self, service=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self.service = service or TMDbService()
+        self.max_concurrency = max_concurrency
+
+    async def _call(self, semaphore, func, *args, **kwargs):
+        """Run a blocking service method on the worker pool under the semaphore"""
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_executor, lambda: func(*args, **kwargs))
+
+    async def _gather(self, calls):
+        """Run (func, args, kwargs) calls concurrently and return results in order"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(
+            *(self._call(semaphore, func, *args, **kwargs) for func, args, kwargs in calls)
+        )
+
+    async def get_movie_details(self, movie_id):
+        """Get detailed information about a movie"""
+        results = await self._gather([(self.service.get_movie_details, (movie_id,), {})])
+        return results[0]
+
+    async def get_movie_details_many(self, movie_ids, sections=DETAIL_SECTIONS):
+        """Get details for several movies concurrently, in the order of `movie_ids`"""
+        movie_ids = list(movie_ids)
+        unique_ids = list(dict.fromkeys(movie_ids))
+        results = await self._gather(
+            [(self.service.get_movie_details, (movie_id,), {"sections": sections}) for movie_id in unique_ids]
+        )
+        details = dict(zip(unique_ids, results))
+        return [details[movie_id] for movie_id in movie_ids]
+
+    async def search_movies_pages(self, query, pages, include_adult=False):
+        """Get several pages of search results concurrently"""
+        return await self._gather([
+            (self.service.search_movies, (query,), {"page": page, "include_adult": include_adult})
+            for page in _page_numbers(pages)
+        ])
+
+    async def discover_movies_pages(self, params, pages):
+        """Get several pages of discover results concurrently"""
+        params = params or {}
+        return await self._gather([
+            (self.service.discover_movies, (), {"params": {**params, "page": page}})
+            for page in _page_numbers(pages)
+        ])
+
+
+class BatchTMDbService:
+    """Blocking facade over AsyncTMDbService for use from Streamlit scripts"""
+
+    def __init__(self, service=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self.async_service = AsyncTMDbService(service, max_concurrency)
+
+    def get_movie_details_many(self, movie_ids, sections=DETAIL_SECTIONS):
+        """Get details for several movies concurrently, in the order of `movie_ids`"""
+        return run_sync(self.async_service.get_movie_details_many(movie_ids, sections))
+
+    def search_movies_pages(self, query, pages, include_adult=False):
+        """Get several pages of search results concurrently"""
+        return run_sync(self.async_service.search_movies_pages(query, pages, include_adult))
+
+    def discover_movies_pages(self, params, pages):
+        """Get several pages of discover results concurrently"""
+        return run_sync(self.async_service.discover_movies_pages(params, pages))
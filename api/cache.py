@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from .config import CACHE_DIR, CACHE_MEMORY_ENTRIES, CACHE_TTLS, DEFAULT_CACHE_TTL, CACHE_OFFLINE_KEEP_SECONDS
+
+CACHE_DB_NAME = "responses.sqlite3"
+
+# Key added to a response served past its lifetime because upstream is unreachable, holding when it was stored
+STALE_MARKER = "_stale_since"
+
+
+class CacheEntry(namedtuple("CacheEntry", ["value", "stored_at", "ttl", "stale_ttl"])):
+    """A cached response along with the time it was stored and its lifetimes"""
+
+    __slots__ = ()
+
+    def age(self):
+        """Get the age of the entry in seconds"""
+        return time.time() - self.stored_at
+
+    def is_fresh(self):
+        """Check whether the entry can be served without revalidating"""
+        return self.age() < self.ttl
+
+    def is_servable(self):
+        """Check whether the entry is fresh or inside its stale-while-revalidate window"""
+        return self.age() < self.ttl + self.stale_ttl
+
+
+def mark_stale(entry):
+    """Get a copy of an expired entry's response marked with the time it was stored"""
+    if not isinstance(entry.value, dict):
+        return entry.value
+    return {**entry.value, STALE_MARKER: entry.stored_at}
+
+
+def stale_since(data):
+    """Get when a response served while offline was stored, or None for a current response"""
+    return data.get(STALE_MARKER) if isinstance(data, dict) else None
+
+
+def endpoint_family(endpoint):
+    """Get the endpoint family used to look up TTLs (movie/550 belongs to "movie")"""
+    return endpoint.strip("/").split("/", 1)[0]
+
+
+def ttl_for(endpoint):
+    """Get the (ttl, stale_ttl) pair configured for an endpoint"""
+    return CACHE_TTLS.get(endpoint_family(endpoint), DEFAULT_CACHE_TTL)
+
+
+def cache_key(endpoint, params=None):
+    """Build a cache key from an endpoint and canonicalized request params"""
+    canonical = sorted(
+        (str(k), str(v)) for k, v in (params or {}).items()
+        if k != "api_key" and v is not None
+    )
+    return f"{endpoint.strip('/')}?{json.dumps(canonical, separators=(',', ':'))}"
+
+
+# Sections that get_movie_details can add to a movie's details payload, each cached on its own
+DETAIL_SECTIONS = ("credits", "videos", "keywords")
+# Sections fetched to fill in result cards (top cast)
+CARD_SECTIONS = ("credits",)
+# Sections the detail panel shows (cast and trailer)
+PANEL_SECTIONS = ("credits", "videos")
+# Sections found in details payloads, including those older responses appended
+APPENDED_SECTIONS = DETAIL_SECTIONS + ("recommendations", "similar")
+
+
+def movies_in_response(endpoint, data):
+    """Yield the movie dicts contained in a TMDb response"""
+    if not isinstance(data, dict):
+        return
+    if endpoint.startswith("movie/") and "title" in data:
+        movie = {k: v for k, v in data.items() if k not in APPENDED_SECTIONS}
+        movie.setdefault("genre_ids", [genre["id"] for genre in data.get("genres", [])])
+        yield movie
+        for section in ("similar", "recommendations"):
+            yield from (data.get(section) or {}).get("results", [])
+    else:
+        yield from data.get("results", [])
+
+
+def iter_cached_movies(directory=CACHE_DIR):
+    """Yield every movie found in the on-disk response cache"""
+    db_path = os.path.join(directory, CACHE_DB_NAME)
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        for endpoint, payload in conn.execute("SELECT endpoint, payload FROM responses"):
+            yield from movies_in_response(endpoint, json.loads(payload))
+    finally:
+        conn.close()
+
+
+def iter_cached_details(directory=CACHE_DIR):
+    """Yield every movie details payload found in the on-disk response cache, with its cached sections"""
+    db_path = os.path.join(directory, CACHE_DB_NAME)
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        # Ordering by endpoint puts movie/550/credits right after movie/550 and before movie/5500
+        rows = conn.execute(
+            "SELECT endpoint, payload FROM responses WHERE endpoint LIKE 'movie/%' ORDER BY endpoint, stored_at"
+        )
+        current = None
+        for endpoint, payload in rows:
+            parts = endpoint.split("/")
+            data = json.loads(payload)
+            if len(parts) == 2 and isinstance(data, dict) and "title" in data:
+                if current is not None and current["id"] != data.get("id"):
+                    yield current
+                current = dict(data)
+            elif len(parts) == 3 and parts[2] in DETAIL_SECTIONS and current is not None and str(current["id"]) == parts[1]:
+                current[parts[2]] = data
+        if current is not None:
+            yield current
+    finally:
+        conn.close()
+
+
+class ResponseCache:
+    """Two-tier response cache: a bounded in-process LRU in front of SQLite on disk
+
+    Cached values are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=CACHE_MEMORY_ENTRIES):
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, CACHE_DB_NAME)
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale_hits": 0, "writes": 0}
+        self._init_db()
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, ttl REAL NOT NULL, stale_ttl REAL NOT NULL)"
+            )
+
+    def _remember(self, key, entry):
+        """Put an entry into the in-memory LRU, evicting the least recently used"""
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        """Get a cached entry, including expired ones, or None if the key is unknown"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+
+        if entry is None:
+            row = self._connection().execute(
+                "SELECT payload, stored_at, ttl, stale_ttl FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            entry = CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+            self._remember(key, entry)
+            tier = "disk_hits"
+        else:
+            tier = "memory_hits"
+
+        if entry.is_fresh():
+            self._count(tier)
+        elif entry.is_servable():
+            self._count("stale_hits")
+        else:
+            self._count("misses")
+        return entry
+
+    def peek(self, key):
+        """Get an entry from the in-memory tier without touching counters or LRU order"""
+        with self._lock:
+            return self._memory.get(key)
+
+    def set(self, key, endpoint, value, ttl=None, stale_ttl=None):
+        """Store a response in both tiers"""
+        default_ttl, default_stale_ttl = ttl_for(endpoint)
+        entry = CacheEntry(
+            value,
+            time.time(),
+            default_ttl if ttl is None else ttl,
+            default_stale_ttl if stale_ttl is None else stale_ttl
+        )
+        self._remember(key, entry)
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, payload, stored_at, ttl, stale_ttl) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, json.dumps(value, separators=(",", ":")), entry.stored_at, entry.ttl, entry.stale_ttl)
+            )
+        self._count("writes")
+        return entry
+
+    def purge_expired(self, keep_seconds=CACHE_OFFLINE_KEEP_SECONDS):
+        """Delete entries that are past their stale-while-revalidate window by more than `keep_seconds`
+
+        Entries inside that grace period are only served while TMDb is unreachable.
+        """
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM responses WHERE stored_at + ttl + stale_ttl + ? < ?", (keep_seconds, time.time())
+            )
+        return cursor.rowcount
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Get hit/miss counters and the current LRU size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Get the process-wide response cache shared by every TMDbService instance"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                cache = ResponseCache()
+                cache.purge_expired()
+                _response_cache = cache
+    return _response_cache
@@ -0,0 +1,448 @@
+"""Local movie catalog ingested from TMDb daily ID exports
+
+The export is streamed line by line; details for new or changed movies are fetched
+through TMDbService (sharing its connection pool, rate limiter and retries) by a
+bounded worker pool, and stored in SQLite normalized and dictionary-compressed
+(see api.compact_store): people and related movies get tables of their own, so
+each is stored once. Progress is checkpointed after every batch, so an
+interrupted run resumes where it stopped and running the same export again
+does nothing.
+
+    python -m api.catalog ingest movie_ids_05_15_2024.json.gz
+    python -m api.catalog ingest movie_ids_05_15_2024.json.gz --workers 16 --max-age-days 30
+    python -m api.catalog status
+    python -m api.catalog compact
+
+Movies that fail to fetch are left out and picked up by the next export's run.
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .compact_store import (
+    DEFAULT_CODEC, DICTIONARY_MIN_SAMPLES, TRAINING_SAMPLES, DictionaryCodec, denormalize_details, encode,
+    normalize_details, referenced_ids, train_dictionary
+)
+from .config import CATALOG_MODE, CATALOG_DB, CATALOG_INGEST_WORKERS, CATALOG_INGEST_BATCH
+
+# Refetch a movie when its popularity in the export moved by more than this fraction
+POPULARITY_CHANGE = 0.5
+
+# Table holding each kind of normalized document
+KIND_TABLES = {"movie": "movies", "person": "people", "related": "related_movies"}
+# Ids per query when loading the people and movies a document refers to
+LOOKUP_CHUNK = 500
+
+
+def iter_export(path, start_line=0):
+    """Yield (line_number, record) from a TMDb daily ID export, skipping the first `start_line` lines
+
+    line_number counts the lines consumed so far, so it is where a resumed run should start.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line_number <= start_line:
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record.get("id"), int):
+                yield line_number, record
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class MovieCatalog:
+    """SQLite store of movie details payloads, keyed by movie id
+
+    Each row also keeps the export fields it was fetched for, so later exports
+    can tell which movies changed.
+    """
+
+    def __init__(self, path=CATALOG_DB):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        self._codec = DictionaryCodec(self._load_dictionary)
+        self._init_db()
+        self._load_active_dictionaries()
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS movies ("
+                "id INTEGER PRIMARY KEY, title TEXT, popularity REAL, adult INTEGER NOT NULL, "
+                "fetched_at REAL NOT NULL, payload BLOB NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "export TEXT PRIMARY KEY, line INTEGER NOT NULL, finished INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS people (id INTEGER PRIMARY KEY, payload BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS related_movies (id INTEGER PRIMARY KEY, payload BLOB NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dictionaries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, codec INTEGER NOT NULL, "
+                "data BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _load_dictionary(self, dictionary_id):
+        row = self._connection().execute(
+            "SELECT codec, data FROM dictionaries WHERE id = ?", (dictionary_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"Catalog {self.path} has no compression dictionary {dictionary_id}")
+        return row[0], row[1]
+
+    def _load_active_dictionaries(self):
+        """Compress new documents with the latest dictionary of each kind this process can use"""
+        rows = self._connection().execute(
+            "SELECT id, kind, data FROM dictionaries WHERE codec = ? ORDER BY id", (DEFAULT_CODEC,)
+        )
+        for dictionary_id, kind, data in rows:
+            self._codec.add(dictionary_id, kind, DEFAULT_CODEC, data)
+
+    def _train(self, conn, kind, documents):
+        """Train and store a dictionary for a kind from sample documents, if there are enough of them"""
+        if len(documents) < DICTIONARY_MIN_SAMPLES:
+            return False
+        data = train_dictionary([encode(document) for document in documents[:TRAINING_SAMPLES]])
+        if data is None:
+            return False
+        cursor = conn.execute(
+            "INSERT INTO dictionaries (kind, codec, data, created_at) VALUES (?, ?, ?, ?)",
+            (kind, DEFAULT_CODEC, data, time.time())
+        )
+        self._codec.add(cursor.lastrowid, kind, DEFAULT_CODEC, data)
+        return True
+
+    def _lookup(self, table, ids):
+        found = {}
+        conn = self._connection()
+        for chunk in _chunks(ids, LOOKUP_CHUNK):
+            placeholders = ",".join("?" * len(chunk))
+            for row_id, payload in conn.execute(f"SELECT id, payload FROM {table} WHERE id IN ({placeholders})", chunk):
+                found[row_id] = self._codec.decompress(payload)
+        return found
+
+    def _rebuild(self, payload):
+        document = self._codec.decompress(payload)
+        person_ids, movie_ids = referenced_ids(document)
+        return denormalize_details(document, self._lookup("people", person_ids),
+                                   self._lookup("related_movies", movie_ids))
+
+    def get(self, movie_id):
+        """Get a movie's details payload, or None if the catalog does not hold it"""
+        row = self._connection().execute("SELECT payload FROM movies WHERE id = ?", (int(movie_id),)).fetchone()
+        if row is None:
+            return None
+        return self._rebuild(row[0])
+
+    def iter_details(self):
+        """Yield every stored details payload"""
+        for (payload,) in self._connection().execute("SELECT payload FROM movies"):
+            yield self._rebuild(payload)
+
+    def known(self, movie_ids):
+        """Get {id: (title, popularity, adult, fetched_at)} for the given ids that are stored"""
+        movie_ids = list(movie_ids)
+        if not movie_ids:
+            return {}
+        placeholders = ",".join("?" * len(movie_ids))
+        rows = self._connection().execute(
+            f"SELECT id, title, popularity, adult, fetched_at FROM movies WHERE id IN ({placeholders})", movie_ids
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def _write_documents(self, conn, kind, documents):
+        """Compress and store {id: document} for people or related movies, training their dictionary if due"""
+        if not self._codec.has_dictionary(kind):
+            self._train(conn, kind, list(documents.values()))
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {KIND_TABLES[kind]} VALUES (?, ?)",
+            [(row_id, self._codec.compress(kind, document)) for row_id, document in documents.items()]
+        )
+
+    def store_batch(self, movies, export, line):
+        """Store (record, details) pairs and advance the export's checkpoint in one transaction"""
+        now = time.time()
+        documents, people, related = [], {}, {}
+        for record, details in movies:
+            document, movie_people, movie_related = normalize_details(details)
+            documents.append(document)
+            people.update(movie_people)
+            related.update(movie_related)
+
+        conn = self._connection()
+        with conn:
+            if not self._codec.has_dictionary("movie"):
+                self._train(conn, "movie", documents)
+            rows = [(
+                record["id"],
+                record.get("original_title"),
+                record.get("popularity"),
+                int(bool(record.get("adult"))),
+                now,
+                self._codec.compress("movie", document),
+            ) for (record, _), document in zip(movies, documents)]
+            conn.executemany("INSERT OR REPLACE INTO movies VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._write_documents(conn, "person", people)
+            self._write_documents(conn, "related", related)
+            conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, 0, ?)", (export, line, now))
+
+    def finish(self, export):
+        """Mark an export as fully ingested"""
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE checkpoints SET finished = 1, updated_at = ? WHERE export = ?", (time.time(), export))
+
+    def checkpoint(self, export):
+        """Get (lines consumed, finished) for an export"""
+        row = self._connection().execute(
+            "SELECT line, finished FROM checkpoints WHERE export = ?", (export,)
+        ).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    def compact(self):
+        """Retrain every kind's dictionary on what is stored now and recompress all rows with it
+
+        Rows written before a dictionary existed, and those stored whole before the
+        catalog was normalized, end up normalized and compressed like new ones.
+        Returns the number of movies rewritten.
+        """
+        conn = self._connection()
+        with conn:
+            for kind, table in KIND_TABLES.items():
+                samples = [self._codec.decompress(payload) for (payload,) in conn.execute(
+                    f"SELECT payload FROM {table} ORDER BY RANDOM() LIMIT ?", (TRAINING_SAMPLES,)
+                )]
+                if kind == "movie":
+                    samples = [normalize_details(sample)[0] for sample in samples]
+                self._train(conn, kind, samples)
+
+            for kind in ("person", "related"):
+                table = KIND_TABLES[kind]
+                ids = [row_id for (row_id,) in conn.execute(f"SELECT id FROM {table}")]
+                for chunk in _chunks(ids, LOOKUP_CHUNK):
+                    self._write_documents(conn, kind, self._lookup(table, chunk))
+
+            ids = [row_id for (row_id,) in conn.execute("SELECT id FROM movies")]
+            for chunk in _chunks(ids, LOOKUP_CHUNK):
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT id, payload FROM movies WHERE id IN ({placeholders})", chunk).fetchall()
+                people, related, updates = {}, {}, []
+                for row_id, payload in rows:
+                    document, movie_people, movie_related = normalize_details(self._codec.decompress(payload))
+                    people.update(movie_people)
+                    related.update(movie_related)
+                    updates.append((self._codec.compress("movie", document), row_id))
+                conn.executemany("UPDATE movies SET payload = ? WHERE id = ?", updates)
+                # Only rows stored whole carry people and movies that are not in their tables yet
+                for kind, documents in (("person", people), ("related", related)):
+                    stored = self._lookup(KIND_TABLES[kind], documents)
+                    self._write_documents(conn, kind, {k: v for k, v in documents.items() if k not in stored})
+
+            conn.execute(
+                "DELETE FROM dictionaries WHERE id NOT IN (SELECT MAX(id) FROM dictionaries GROUP BY kind, codec)"
+            )
+        conn.execute("VACUUM")
+        return len(ids)
+
+    def stats(self):
+        """Get the number of stored movies, people and related movies, their size and the ingested exports"""
+        conn = self._connection()
+        stats = {}
+        payload_bytes = 0
+        for kind, table in KIND_TABLES.items():
+            count, size = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM {table}").fetchone()
+            stats[table] = count
+            payload_bytes += size
+        dictionaries = conn.execute("SELECT kind, codec, LENGTH(data) FROM dictionaries ORDER BY id").fetchall()
+        exports = conn.execute("SELECT export, line, finished FROM checkpoints ORDER BY updated_at").fetchall()
+        return {
+            **stats,
+            "payload_bytes": payload_bytes,
+            "file_bytes": os.path.getsize(self.path),
+            "dictionaries": [{"kind": kind, "codec": codec, "bytes": size} for kind, codec, size in dictionaries],
+            "exports": [{"export": e, "lines": line, "finished": bool(done)} for e, line, done in exports],
+        }
+
+
+def needs_fetch(record, stored, max_age=None, popularity_change=POPULARITY_CHANGE, now=None):
+    """Check whether an export record is new, or changed since its stored details were fetched"""
+    if stored is None:
+        return True
+    title, popularity, adult, fetched_at = stored
+    if title != record.get("original_title") or bool(adult) != bool(record.get("adult")):
+        return True
+    if max_age is not None and (now or time.time()) - fetched_at > max_age:
+        return True
+    previous = popularity or 0.0
+    return abs((record.get("popularity") or 0.0) - previous) > popularity_change * max(previous, 1.0)
+
+
+def ingest(path, catalog=None, service=None, workers=CATALOG_INGEST_WORKERS, batch_size=CATALOG_INGEST_BATCH,
+           limit=None, max_age=None, progress=None):
+    """Ingest a daily ID export into the catalog, resuming from its checkpoint
+
+    Stops after `limit` export lines if given, leaving the checkpoint for the next run.
+    Returns counters for the lines read and movies fetched, unchanged and failed.
+    """
+    if catalog is None:
+        catalog = MovieCatalog()
+    if service is None:
+        from .tmdb_service import TMDbService
+
+        service = TMDbService()
+
+    export = os.path.basename(path)
+    start_line, finished = catalog.checkpoint(export)
+    stats = {"export": export, "start_line": start_line, "records": 0, "fetched": 0, "unchanged": 0, "failed": 0,
+             "finished": finished}
+    if finished:
+        return stats
+
+    def fetch(record):
+        return service.get_movie_details(record["id"], cached=False)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="tmdb-ingest") as executor:
+        for batch in _batches(iter_export(path, start_line), batch_size):
+            last_line = batch[-1][0]
+            records = [record for _, record in batch]
+            stored = catalog.known(record["id"] for record in records)
+            now = time.time()
+            changed = [record for record in records if needs_fetch(record, stored.get(record["id"]), max_age, now=now)]
+
+            # At most one batch of results is held in memory at a time
+            results = list(executor.map(fetch, changed))
+            fetched = [(record, details) for record, details in zip(changed, results) if details is not None]
+            if changed and not fetched:
+                # Upstream is failing every request; keep the checkpoint so the next run retries this batch
+                print(f"Every fetch in the batch ending at line {last_line} failed, stopping")
+                break
+
+            catalog.store_batch(fetched, export, last_line)
+            stats["records"] += len(records)
+            stats["fetched"] += len(fetched)
+            stats["unchanged"] += len(records) - len(changed)
+            stats["failed"] += len(changed) - len(fetched)
+            if progress is not None:
+                progress(stats, last_line)
+            if limit is not None and stats["records"] >= limit:
+                break
+        else:
+            catalog.finish(export)
+            stats["finished"] = True
+    return stats
+
+
+_catalog = None
+_catalog_checked = False
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Get the process-wide movie catalog, or None if it is disabled or has not been ingested"""
+    global _catalog, _catalog_checked
+    if not _catalog_checked:
+        with _catalog_lock:
+            if not _catalog_checked:
+                if CATALOG_MODE != "off" and os.path.exists(CATALOG_DB):
+                    try:
+                        _catalog = MovieCatalog(CATALOG_DB)
+                    except sqlite3.Error as e:
+                        print(f"Error opening movie catalog {CATALOG_DB}: {e}")
+                _catalog_checked = True
+    return _catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest TMDb daily ID exports into the local movie catalog")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subcommands.add_parser("ingest", help="Fetch details for new or changed movies in an export")
+    ingest_parser.add_argument("export", help="TMDb daily export (.json.gz)")
+    ingest_parser.add_argument("--catalog", default=CATALOG_DB, help="Catalog database")
+    ingest_parser.add_argument("--workers", type=int, default=CATALOG_INGEST_WORKERS)
+    ingest_parser.add_argument("--batch-size", type=int, default=CATALOG_INGEST_BATCH)
+    ingest_parser.add_argument("--limit", type=int, help="Stop after this many export records")
+    ingest_parser.add_argument("--max-age-days", type=float, help="Also refetch movies fetched longer ago than this")
+
+    status = subcommands.add_parser("status", help="Show what the catalog holds")
+    status.add_argument("--catalog", default=CATALOG_DB, help="Catalog database")
+
+    compact = subcommands.add_parser("compact", help="Retrain compression dictionaries and recompress every row")
+    compact.add_argument("--catalog", default=CATALOG_DB, help="Catalog database")
+
+    args = parser.parse_args(argv)
+    catalog = MovieCatalog(args.catalog)
+
+    if args.command == "compact":
+        before = os.path.getsize(args.catalog)
+        started = time.perf_counter()
+        count = catalog.compact()
+        print(f"Recompressed {count} movies in {time.perf_counter() - started:.1f}s: "
+              f"{before / 1024 / 1024:.1f} MiB -> {os.path.getsize(args.catalog) / 1024 / 1024:.1f} MiB")
+        return
+
+    if args.command == "status":
+        stats = catalog.stats()
+        print(f"{stats['movies']} movies, {stats['people']} people, {stats['related_movies']} related movies: "
+              f"{stats['payload_bytes'] / 1024 / 1024:.1f} MiB compressed, {stats['file_bytes'] / 1024 / 1024:.1f} MiB on disk")
+        for export in stats["exports"]:
+            state = "finished" if export["finished"] else "in progress"
+            print(f"  {export['export']:<40} {export['lines']:>10} lines  {state}")
+        return
+
+    started = time.perf_counter()
+
+    def report(stats, line):
+        elapsed = time.perf_counter() - started
+        print(f"line {line:>9}  fetched {stats['fetched']:>8}  unchanged {stats['unchanged']:>8}  "
+              f"failed {stats['failed']:>6}  {stats['fetched'] / elapsed if elapsed else 0:6.1f} movies/s")
+
+    max_age = args.max_age_days * 24 * 3600 if args.max_age_days is not None else None
+    stats = ingest(args.export, catalog, workers=args.workers, batch_size=args.batch_size, limit=args.limit,
+                   max_age=max_age, progress=report)
+    state = "finished" if stats["finished"] else "stopped; run again to resume"
+    print(f"{stats['export']}: {stats['records']} records from line {stats['start_line']}, {stats['fetched']} fetched, "
+          f"{stats['unchanged']} unchanged, {stats['failed']} failed ({state})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import threading
+import time
+
+from .config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_MAX_RESET_SECONDS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "reset_seconds", "trips", "probe")
+
+    def __init__(self, reset_seconds):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.reset_seconds = reset_seconds
+        self.trips = 0
+        self.probe = None
+
+
+class CircuitBreaker:
+    """Per endpoint family circuit breaker for upstream requests
+
+    A family's circuit opens after `failure_threshold` consecutive failures. While it
+    is open, callers must not send requests for that family. After `reset_seconds`
+    the circuit goes half-open and a background thread sends one trial request (the
+    probe recorded with the last failure): success closes the circuit, failure
+    reopens it for twice as long, up to `max_reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS,
+                 max_reset_seconds=BREAKER_MAX_RESET_SECONDS):
+        self.enabled = failure_threshold > 0
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max_reset_seconds
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, family):
+        circuit = self._circuits.get(family)
+        if circuit is None:
+            circuit = self._circuits[family] = _Circuit(self.reset_seconds)
+        return circuit
+
+    def allow(self, family):
+        """Check whether a foreground request for the family may go upstream"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(family)
+            return circuit is None or circuit.state == CLOSED
+
+    def record_success(self, family):
+        """Record a request that reached upstream, closing the family's circuit"""
+        if not self.enabled:
+            return
+        with self._lock:
+            circuit = self._circuit(family)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.opened_at = None
+            circuit.reset_seconds = self.reset_seconds
+            circuit.probe = None
+
+    def record_failure(self, family, probe=None):
+        """Record a failed or timed out request; `probe` is called to test upstream once the circuit half-opens"""
+        if not self.enabled:
+            return
+        with self._lock:
+            circuit = self._circuit(family)
+            circuit.failures += 1
+            if probe is not None:
+                circuit.probe = probe
+            if circuit.state == OPEN:
+                return
+            if circuit.state == HALF_OPEN:
+                # The trial request failed; stay away for longer this time
+                circuit.reset_seconds = min(circuit.reset_seconds * 2, self.max_reset_seconds)
+            elif circuit.failures < self.failure_threshold:
+                return
+            circuit.state = OPEN
+            circuit.opened_at = time.time()
+            circuit.trips += 1
+            delay = circuit.reset_seconds
+
+        print(f"Circuit for TMDb {family} requests opened; retrying upstream in {delay:.0f}s")
+        timer = threading.Timer(delay, self._probe, args=(family,))
+        timer.daemon = True
+        timer.start()
+
+    def _probe(self, family):
+        with self._lock:
+            circuit = self._circuit(family)
+            if circuit.state != OPEN:
+                return
+            circuit.state = HALF_OPEN
+            probe = circuit.probe
+
+        if probe is None:
+            # Nothing to try with; let the next foreground request be the trial
+            self.record_success(family)
+            return
+        try:
+            # The probe goes through the normal request path, which records its outcome
+            probe()
+        except Exception:
+            self.record_failure(family)
+        with self._lock:
+            stuck = self._circuit(family).state == HALF_OPEN
+        if stuck:
+            # The probe was answered without reaching upstream (e.g. coalesced); try again later
+            self.record_failure(family)
+
+    def state(self, family):
+        """Get "closed", "open" or "half_open" for a family"""
+        with self._lock:
+            circuit = self._circuits.get(family)
+            return circuit.state if circuit is not None else CLOSED
+
+    def stats(self):
+        """Get each family's state, consecutive failures and number of times it opened"""
+        with self._lock:
+            return {
+                family: {"state": circuit.state, "failures": circuit.failures, "trips": circuit.trips,
+                         "opened_at": circuit.opened_at}
+                for family, circuit in self._circuits.items()
+            }
+
+
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker():
+    """Get the process-wide circuit breaker shared by every TMDbService instance"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _circuit_breaker_lock:
+            if _circuit_breaker is None:
+                _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
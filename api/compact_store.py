@@ -0,0 +1,224 @@
+"""Normalized, dictionary-compressed storage for movie details payloads
+
+TMDb details payloads repeat themselves: the same keys in every document, the
+same people across many movies' credits, the same movies across many similar
+and recommendations lists. `normalize_details` splits a payload into the movie's
+own document plus the people and related movies it mentions, so each of those
+is stored once however many movies refer to it; `denormalize_details` puts the
+payload back together on read.
+
+Every document is compressed on its own, so point reads stay cheap, with a
+dictionary trained on documents of the same kind. The codec is set by
+TMDB_CATALOG_CODEC: zstd (the default, from the zstandard package) or zlib with
+a preset dictionary. Each blob starts with its codec and dictionary id, so blobs
+written with an older dictionary or another codec stay readable.
+"""
+import json
+import random
+import struct
+import threading
+import zlib
+
+try:
+    # Listed in requirements.txt; without it the catalog falls back to zlib and cannot read zstd blobs
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .config import CATALOG_CODEC
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODECS = {"zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+if CATALOG_CODEC not in CODECS:
+    raise ValueError(f"TMDB_CATALOG_CODEC must be one of {', '.join(CODECS)}, not {CATALOG_CODEC!r}")
+if CATALOG_CODEC == "zstd" and zstandard is None:
+    print("TMDB_CATALOG_CODEC is zstd but the zstandard package is not installed; compressing with zlib")
+    DEFAULT_CODEC = CODEC_ZLIB
+else:
+    DEFAULT_CODEC = CODECS[CATALOG_CODEC]
+# Legacy blobs are bare zlib streams, whose first byte is 0x78, so these never collide with them
+_BLOB_HEADER = struct.Struct("<BH")
+_ZLIB_STREAM = 0x78
+
+# zlib only looks back 32 KiB, so a larger preset dictionary would be wasted
+DICTIONARY_SIZES = {CODEC_ZLIB: 32 * 1024, CODEC_ZSTD: 64 * 1024}
+# Raw deflate streams: the zlib header and checksum would add 6 bytes to every small document
+_ZLIB_WBITS = -15
+# A kind gets a dictionary once this many documents of it are available to train on, using at most TRAINING_SAMPLES
+DICTIONARY_MIN_SAMPLES = 100
+TRAINING_SAMPLES = 2000
+COMPRESSION_LEVEL = 9
+
+# Fields describing a person rather than their part in one movie
+PERSON_FIELDS = ("adult", "gender", "id", "known_for_department", "name", "original_name", "popularity",
+                 "profile_path")
+RELATED_SECTIONS = ("similar", "recommendations")
+
+def encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def normalize_details(details):
+    """Split a details payload into (document, {person id: person}, {movie id: related movie})"""
+    document = dict(details)
+    people = {}
+    credits = details.get("credits")
+    if isinstance(credits, dict):
+        credits = dict(credits)
+        for role in ("cast", "crew"):
+            entries = []
+            for entry in credits.get(role) or []:
+                person = {k: v for k, v in entry.items() if k in PERSON_FIELDS}
+                if entry.get("id") is None or len(person) == 1:
+                    # No id to refer to, or already normalized
+                    entries.append(entry)
+                    continue
+                people[entry["id"]] = person
+                entries.append({k: v for k, v in entry.items() if k not in PERSON_FIELDS or k == "id"})
+            if role in credits:
+                credits[role] = entries
+        document["credits"] = credits
+
+    movies = {}
+    for section in RELATED_SECTIONS:
+        related = details.get(section)
+        if isinstance(related, dict) and related.get("results"):
+            results = []
+            for movie in related["results"]:
+                if isinstance(movie, dict) and movie.get("id") is not None:
+                    movies[movie["id"]] = movie
+                    movie = movie["id"]
+                results.append(movie)
+            document[section] = {**related, "results": results}
+    return document, people, movies
+
+
+def referenced_ids(document):
+    """Get the (person ids, related movie ids) a normalized document refers to"""
+    person_ids = set()
+    credits = document.get("credits")
+    if isinstance(credits, dict):
+        for role in ("cast", "crew"):
+            person_ids.update(entry["id"] for entry in credits.get(role) or [] if entry.get("id") is not None)
+    movie_ids = set()
+    for section in RELATED_SECTIONS:
+        related = document.get(section)
+        if isinstance(related, dict):
+            movie_ids.update(movie_id for movie_id in related.get("results") or [] if isinstance(movie_id, int))
+    return person_ids, movie_ids
+
+
+def denormalize_details(document, people, movies):
+    """Rebuild a details payload from its normalized document and the people and movies it refers to"""
+    details = dict(document)
+    credits = document.get("credits")
+    if isinstance(credits, dict):
+        credits = dict(credits)
+        for role in ("cast", "crew"):
+            if role in credits:
+                credits[role] = [{**people.get(entry.get("id"), {}), **entry} for entry in credits[role]]
+        details["credits"] = credits
+    for section in RELATED_SECTIONS:
+        related = document.get(section)
+        if isinstance(related, dict) and related.get("results"):
+            details[section] = {**related, "results": [
+                movies[movie_id] if isinstance(movie_id, int) else movie_id
+                for movie_id in related["results"] if not isinstance(movie_id, int) or movie_id in movies
+            ]}
+    return details
+
+
+def train_dictionary(samples, codec=DEFAULT_CODEC):
+    """Train a compression dictionary from encoded sample documents, or get None if they are too few to train on"""
+    size = DICTIONARY_SIZES[codec]
+    if codec == CODEC_ZSTD:
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError:
+            return None
+
+    # zlib has no trainer; a preset dictionary works by letting documents refer back into it, so sample
+    # documents themselves make a good one: they hold the keys, shared values and vocabulary of the rest
+    chosen, total = [], 0
+    for sample in random.Random(0).sample(samples, len(samples)):
+        if total + len(sample) > size:
+            continue
+        chosen.append(sample)
+        total += len(sample)
+    return b"".join(chosen) or None
+
+
+class DictionaryCodec:
+    """Compress JSON documents with the current dictionary of their kind
+
+    `load` is called with a dictionary id the codec has not seen and must return
+    (codec, dictionary bytes); it lets readers pick up dictionaries trained by
+    other processes.
+    """
+
+    def __init__(self, load):
+        self._load = load
+        self._dictionaries = {}
+        self._active = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def add(self, dictionary_id, kind, codec, data, active=True):
+        """Register a dictionary, making it the one new documents of its kind are compressed with"""
+        with self._lock:
+            self._dictionaries[dictionary_id] = (codec, data)
+            if active:
+                self._active[kind] = dictionary_id
+
+    def has_dictionary(self, kind):
+        return kind in self._active
+
+    def _dictionary(self, dictionary_id):
+        entry = self._dictionaries.get(dictionary_id)
+        if entry is None:
+            codec, data = self._load(dictionary_id)
+            with self._lock:
+                entry = self._dictionaries.setdefault(dictionary_id, (codec, data))
+        return entry
+
+    def _zstd(self, direction, dictionary_id, data):
+        # zstd (de)compressors are not thread-safe, and building one digests the dictionary, so each thread keeps its own
+        cache = getattr(self._local, "zstd", None)
+        if cache is None:
+            cache = self._local.zstd = {}
+        key = (direction, dictionary_id)
+        if key not in cache:
+            dict_data = zstandard.ZstdCompressionDict(data) if data else None
+            if direction == "compress":
+                cache[key] = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dict_data)
+            else:
+                cache[key] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return cache[key]
+
+    def compress(self, kind, value):
+        """Compress a JSON-serializable document"""
+        raw = encode(value)
+        dictionary_id = self._active.get(kind, 0)
+        codec, data = self._dictionary(dictionary_id) if dictionary_id else (DEFAULT_CODEC, b"")
+        if codec == CODEC_ZSTD:
+            body = self._zstd("compress", dictionary_id, data).compress(raw)
+        else:
+            compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, _ZLIB_WBITS, zdict=data) if data else \
+                zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, _ZLIB_WBITS)
+            body = compressor.compress(raw) + compressor.flush()
+        return _BLOB_HEADER.pack(codec, dictionary_id) + body
+
+    def decompress(self, blob):
+        """Get the document stored in a blob, including blobs written before compression used dictionaries"""
+        if blob[0] == _ZLIB_STREAM:
+            return json.loads(zlib.decompress(blob))
+        codec, dictionary_id = _BLOB_HEADER.unpack_from(blob)
+        data = self._dictionary(dictionary_id)[1] if dictionary_id else b""
+        body = memoryview(blob)[_BLOB_HEADER.size:]
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("This store was written with zstd; install the zstandard package to read it")
+            return json.loads(self._zstd("decompress", dictionary_id, data).decompress(body))
+        decompressor = zlib.decompressobj(_ZLIB_WBITS, zdict=data) if data else zlib.decompressobj(_ZLIB_WBITS)
+        return json.loads(decompressor.decompress(body) + decompressor.flush())
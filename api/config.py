@@ -6,11 +6,151 @@ load_dotenv()
 
 # TMDb API configuration
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "62c2a5b61056c6a72e2552752f2139ca")
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-TMDB_IMAGE_BASE_URL = "https://image.tmdb.org/t/p/"
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_IMAGE_BASE_URL = os.getenv("TMDB_IMAGE_BASE_URL", "https://image.tmdb.org/t/p/")
 POSTER_SIZE = "w500"
 BACKDROP_SIZE = "original"
 PROFILE_SIZE = "w185"
 
 # Default configuration
-DEFAULT_LANGUAGE = "en-US"
\ No newline at end of file
+DEFAULT_LANGUAGE = "en-US"
+
+# HTTP connection pool configuration
+HTTP_POOL_SIZE = int(os.getenv("TMDB_HTTP_POOL_SIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("TMDB_HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("TMDB_HTTP_READ_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("TMDB_HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("TMDB_HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("TMDB_HTTP_BACKOFF_MAX", "30"))
+
+# Response cache configuration
+CACHE_ENABLED = os.getenv("TMDB_CACHE_ENABLED", "1") != "0"
+CACHE_DIR = os.getenv("TMDB_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("TMDB_CACHE_MEMORY_ENTRIES", "2048"))
+
+# Cache lifetimes per endpoint family, in seconds: (fresh TTL, extra stale-while-revalidate window)
+CACHE_TTLS = {
+    "genre": (7 * 24 * 3600, 30 * 24 * 3600),
+    "trending": (3600, 6 * 3600),
+    "search": (10 * 60, 60 * 60),
+    "discover": (30 * 60, 6 * 3600),
+    "movie": (24 * 3600, 7 * 24 * 3600),
+}
+DEFAULT_CACHE_TTL = (10 * 60, 60 * 60)
+
+# Client-side rate limit shared by every upstream request (0 disables it)
+RATE_LIMIT_PER_SECOND = float(os.getenv("TMDB_RATE_LIMIT_PER_SECOND", "40"))
+RATE_LIMIT_BURST = int(os.getenv("TMDB_RATE_LIMIT_BURST", "20"))
+
+# Async batch client configuration
+ASYNC_MAX_CONCURRENCY = int(os.getenv("TMDB_ASYNC_MAX_CONCURRENCY", "8"))
+
+# Image cache configuration
+POSTER_SIZES = ["w92", "w154", "w185", "w342", "w500", "w780", "original"]
+PROFILE_SIZES = ["w45", "w185", "h632", "original"]
+BACKDROP_SIZES = ["w300", "w780", "w1280", "original"]
+IMAGE_CACHE_DIR = os.getenv("TMDB_IMAGE_CACHE_DIR", os.path.join(CACHE_DIR, "images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("TMDB_IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_REVALIDATE_SECONDS = int(os.getenv("TMDB_IMAGE_REVALIDATE_SECONDS", str(7 * 24 * 3600)))
+# Device pixel ratio assumed when picking an image size for a rendered width
+IMAGE_PIXEL_RATIO = float(os.getenv("TMDB_IMAGE_PIXEL_RATIO", "1.0"))
+
+# Background prefetch configuration
+PREFETCH_ENABLED = os.getenv("TMDB_PREFETCH_ENABLED", "1") != "0"
+PREFETCH_WORKERS = int(os.getenv("TMDB_PREFETCH_WORKERS", "4"))
+# Queued plus running prefetch tasks; anything beyond this budget is dropped
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("TMDB_PREFETCH_MAX_IN_FLIGHT", "8"))
+PREFETCH_DETAILS_COUNT = int(os.getenv("TMDB_PREFETCH_DETAILS_COUNT", "4"))
+
+# Offline search index: "auto" answers searches from the index once one has been built, "off" never does
+SEARCH_INDEX_MODE = os.getenv("TMDB_SEARCH_INDEX", "auto")
+SEARCH_INDEX_DIR = os.getenv("TMDB_SEARCH_INDEX_DIR", os.path.join(CACHE_DIR, "search_index"))
+
+# Local columnar movie table for discover filters: "auto" answers discover queries locally
+# once the table holds LOCAL_DISCOVER_MIN_MOVIES movies, "off" never does
+LOCAL_DISCOVER_MODE = os.getenv("TMDB_LOCAL_DISCOVER", "auto")
+LOCAL_DISCOVER_MIN_MOVIES = int(os.getenv("TMDB_LOCAL_DISCOVER_MIN_MOVIES", "1000"))
+
+# Metrics: timers and counters on the request and render hot paths, exported in OpenMetrics text format
+METRICS_ENABLED = os.getenv("TMDB_METRICS_ENABLED", "1") != "0"
+# Rewrite this file with the current metrics every METRICS_EXPORT_INTERVAL seconds (empty disables it)
+METRICS_FILE = os.getenv("TMDB_METRICS_FILE", "")
+METRICS_EXPORT_INTERVAL = float(os.getenv("TMDB_METRICS_EXPORT_INTERVAL", "15"))
+# Serve the metrics over HTTP at /metrics on this port (0 disables it)
+METRICS_PORT = int(os.getenv("TMDB_METRICS_PORT", "0"))
+# Show request, cache and render timings in the sidebar
+DEBUG_PANEL = os.getenv("TMDB_DEBUG_PANEL", "0") != "0"
+
+# Favorites persistence: "sqlite" keeps favorites across sessions, "memory" only for the life of the process
+FAVORITES_BACKEND = os.getenv("TMDB_FAVORITES_BACKEND", "sqlite")
+FAVORITES_DB = os.getenv("TMDB_FAVORITES_DB", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".data", "favorites.db"))
+# Pending favorites changes are written at the end of each rerun, or sooner once this many accumulate
+FAVORITES_WRITE_BATCH = int(os.getenv("TMDB_FAVORITES_WRITE_BATCH", "50"))
+
+# Search and discover results are shown as a window of this many TMDb pages; loading more drops the oldest
+RESULTS_WINDOW_PAGES = int(os.getenv("TMDB_RESULTS_WINDOW_PAGES", "3"))
+
+# Search as you type: wait this long after the last keystroke before querying, then stream this many pages
+SEARCH_DEBOUNCE_SECONDS = float(os.getenv("TMDB_SEARCH_DEBOUNCE_SECONDS", "0.25"))
+SEARCH_STREAM_PAGES = int(os.getenv("TMDB_SEARCH_STREAM_PAGES", "2"))
+SEARCH_MIN_QUERY_LENGTH = int(os.getenv("TMDB_SEARCH_MIN_QUERY_LENGTH", "2"))
+# How often the page checks for newly streamed results while a search is in flight
+SEARCH_STREAM_POLL_SECONDS = float(os.getenv("TMDB_SEARCH_STREAM_POLL_SECONDS", "0.5"))
+# First-page results kept per query so longer queries can be answered by refining a prefix's results
+SEARCH_PREFIX_CACHE_ENTRIES = int(os.getenv("TMDB_SEARCH_PREFIX_CACHE_ENTRIES", "1024"))
+
+# Circuit breaker per endpoint family: open after this many consecutive failures or timeouts (0 disables it),
+# then send a background trial request after BREAKER_RESET_SECONDS, doubling up to BREAKER_MAX_RESET_SECONDS
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("TMDB_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("TMDB_BREAKER_RESET_SECONDS", "15"))
+BREAKER_MAX_RESET_SECONDS = float(os.getenv("TMDB_BREAKER_MAX_RESET_SECONDS", "300"))
+# A session waits at most this long for an upstream fetch before serving what the cache has (the fetch carries on)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("TMDB_REQUEST_DEADLINE_SECONDS", "8"))
+# The same for an image download, after which the poster's placeholder (or its stored copy) is shown
+IMAGE_DEADLINE_SECONDS = float(os.getenv("TMDB_IMAGE_DEADLINE_SECONDS", "3"))
+# Expired responses are kept this much longer, to be served while TMDb is unreachable
+CACHE_OFFLINE_KEEP_SECONDS = int(os.getenv("TMDB_CACHE_OFFLINE_KEEP_SECONDS", str(30 * 24 * 3600)))
+
+# Shared cache daemon: when set, workers send every TMDb call to the daemon listening on this Unix socket,
+# which owns the connection pool, rate limiter and caches for all of them (run it with python -m api.daemon)
+DAEMON_SOCKET = os.getenv("TMDB_DAEMON_SOCKET", "")
+# Seconds a worker waits for the daemon to answer before serving the call itself: a little over the request
+# deadline the daemon keeps to, so a daemon that accepts connections but hangs costs no more than a slow upstream
+DAEMON_TIMEOUT = float(os.getenv("TMDB_DAEMON_TIMEOUT", str(REQUEST_DEADLINE_SECONDS + 2)))
+# Idle connections to the daemon kept open per worker process
+DAEMON_POOL_SIZE = int(os.getenv("TMDB_DAEMON_POOL_SIZE", "8"))
+
+# Local movie catalog filled by `python -m api.catalog ingest` from TMDb daily ID exports:
+# "auto" answers movie details from it when it holds the movie, "off" always asks TMDb
+CATALOG_MODE = os.getenv("TMDB_CATALOG", "auto")
+CATALOG_DB = os.getenv("TMDB_CATALOG_DB", os.path.join(CACHE_DIR, "catalog.sqlite3"))
+# Ingestion fetches this many movies at once, and checkpoints after every batch
+CATALOG_INGEST_WORKERS = int(os.getenv("TMDB_CATALOG_INGEST_WORKERS", "8"))
+CATALOG_INGEST_BATCH = int(os.getenv("TMDB_CATALOG_INGEST_BATCH", "200"))
+# Details are compressed with trained "zstd" dictionaries, or "zlib" preset dictionaries where zstandard
+# is not installed; a catalog written with zstd needs zstandard to be read
+CATALOG_CODEC = os.getenv("TMDB_CATALOG_CODEC", "zstd")
+
+# Local recommendations built by `python -m api.recommendations build` from cached and catalog movie details:
+# "auto" answers similar movies from them once built (TMDb's /similar otherwise), "off" never does
+RECOMMENDATIONS_MODE = os.getenv("TMDB_RECOMMENDATIONS", "auto")
+RECOMMENDATIONS_DIR = os.getenv("TMDB_RECOMMENDATIONS_DIR", os.path.join(CACHE_DIR, "recommendations"))
+# Neighbors stored per movie
+RECOMMENDATIONS_NEIGHBORS = int(os.getenv("TMDB_RECOMMENDATIONS_NEIGHBORS", "20"))
+
+# Trending snapshot: trending pages 1..TRENDING_SNAPSHOT_PAGES for the day and week, with their poster
+# thumbnails, precomputed into one file (python -m api.trending_snapshot build) that Home renders from.
+# "auto" serves pages from it while it is younger than TRENDING_SNAPSHOT_MAX_AGE, "off" never does
+TRENDING_SNAPSHOT_MODE = os.getenv("TMDB_TRENDING_SNAPSHOT", "auto")
+TRENDING_SNAPSHOT_FILE = os.getenv("TMDB_TRENDING_SNAPSHOT_FILE", os.path.join(CACHE_DIR, "trending.snapshot"))
+TRENDING_SNAPSHOT_PAGES = int(os.getenv("TMDB_TRENDING_SNAPSHOT_PAGES", "5"))
+TRENDING_SNAPSHOT_MAX_AGE = int(os.getenv("TMDB_TRENDING_SNAPSHOT_MAX_AGE", str(6 * 3600)))
+# Rendered width the snapshot's posters are sized for (the Home grid's column width)
+TRENDING_SNAPSHOT_POSTER_WIDTH = int(os.getenv("TMDB_TRENDING_SNAPSHOT_POSTER_WIDTH", "300"))
+# The app process (or the cache daemon, when one is used) rebuilds the snapshot this often; 0 leaves it to cron
+TRENDING_SNAPSHOT_REFRESH_SECONDS = int(os.getenv("TMDB_TRENDING_SNAPSHOT_REFRESH_SECONDS", "1800"))
+
+# Result cards are filled in with runtime, genres and top cast from each movie's details, fetched for a page at once:
+# at most HYDRATION_WORKERS fetches run at a time, and a render waits at most HYDRATION_DEADLINE_SECONDS for them
+HYDRATION_WORKERS = int(os.getenv("TMDB_HYDRATION_WORKERS", "8"))
+HYDRATION_DEADLINE_SECONDS = float(os.getenv("TMDB_HYDRATION_DEADLINE_SECONDS", "1.5"))
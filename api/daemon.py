@@ -0,0 +1,432 @@
+"""Shared cache daemon for multi-process deployments
+
+One daemon per host owns the TMDb connection pool, rate limiter, response cache,
+image cache and prefetcher. Every Streamlit worker process talks to it over a
+Unix socket through DaemonTMDbService, which has the same API as TMDbService,
+so all workers share one upstream quota and one warm cache.
+
+    python -m api.daemon --socket /run/cinestream/tmdb.sock
+    TMDB_DAEMON_SOCKET=/run/cinestream/tmdb.sock streamlit run app.py
+
+Messages are length-prefixed JSON headers, followed by raw bytes for images.
+A worker that cannot reach the daemon serves the call with its own TMDbService.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    DAEMON_SOCKET, DAEMON_TIMEOUT, DAEMON_POOL_SIZE, TMDB_IMAGE_BASE_URL, POSTER_SIZE, BACKDROP_SIZE
+)
+from .cache import CARD_SECTIONS, DETAIL_SECTIONS
+from .hydration import get_hydrator
+from .metrics import REQUESTS, REQUEST_LATENCY
+from .trending_snapshot import snapshot_page, snapshot_poster, start_snapshot_job
+
+_HEADER = struct.Struct(">I")
+
+# Detail sections requested from the daemon while a worker renders the rest of the view
+_section_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tmdb-daemon-sections")
+
+# Service methods a worker may call, by the endpoint family they are counted under
+REQUEST_METHODS = {
+    "get_trending_movies": "trending",
+    "search_movies": "search",
+    "get_movie_details": "movie",
+    "get_movie_section": "movie",
+    "get_similar_movies": "movie",
+    "get_recommendations_for": "movie",
+    "get_genres": "genre",
+    "discover_movies": "discover",
+}
+IMAGE_METHODS = ("get_movie_poster_image", "get_backdrop_image", "get_profile_image")
+STATS_METHODS = ("get_cache_stats", "get_request_stats", "get_prefetch_stats", "has_local_discover")
+# Workers ask the daemon whether its movie table is ready at most this often; once it is, it stays ready
+LOCAL_DISCOVER_CHECK_SECONDS = 30
+
+
+def send_message(sock, header, body=b""):
+    """Send a JSON header and an optional binary body"""
+    payload = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload + body)
+
+
+def _read_exactly(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise ConnectionError("TMDb daemon connection closed")
+    return data
+
+
+def read_message(stream):
+    """Read a (header, body) message from a socket's binary file; body is None without one"""
+    (size,) = _HEADER.unpack(_read_exactly(stream, _HEADER.size))
+    header = json.loads(_read_exactly(stream, size))
+    body = _read_exactly(stream, header["size"]) if header.get("size") is not None else None
+    return header, body
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    """Answer one worker connection's calls until it disconnects"""
+
+    def handle(self):
+        while True:
+            try:
+                request, _ = read_message(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+
+            try:
+                result = self.server.dispatch(request["method"], request.get("args", []), request.get("kwargs", {}))
+            except Exception as e:
+                header, body = {"ok": False, "error": f"{type(e).__name__}: {e}"}, b""
+            else:
+                if isinstance(result, bytes):
+                    header, body = {"ok": True, "size": len(result)}, result
+                else:
+                    header, body = {"ok": True, "result": result}, b""
+
+            try:
+                try:
+                    send_message(self.connection, header, body)
+                except (TypeError, ValueError) as e:
+                    # The result could not be serialized, so nothing was sent; the worker still needs a reply
+                    send_message(self.connection, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+            except OSError:
+                # The worker went away mid-reply
+                return
+
+
+class TMDbDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve a single TMDbService to every worker process on the host"""
+
+    daemon_threads = True
+
+    def __init__(self, path=DAEMON_SOCKET, service=None):
+        from .tmdb_service import TMDbService
+
+        self.service = service or TMDbService()
+        _remove_stale_socket(path)
+        super().__init__(path, _DaemonHandler)
+        # Only processes running as the same user may use the daemon's API key and caches
+        os.chmod(path, 0o600)
+
+    def dispatch(self, method, args, kwargs):
+        """Call a whitelisted service method on behalf of a worker"""
+        if method in REQUEST_METHODS or method in IMAGE_METHODS or method in STATS_METHODS:
+            return getattr(self.service, method)(*args, **kwargs)
+        if method == "prefetch":
+            scope, target, target_args, target_kwargs = args
+            if target not in REQUEST_METHODS:
+                raise ValueError(f"Cannot prefetch {target!r}")
+            # Only whether it was queued goes back; the worker never waits on the result
+            future = self.service.prefetch(scope, getattr(self.service, target), *target_args, **target_kwargs)
+            return future is not None
+        if method == "set_prefetch_context":
+            scope, context = args
+            self.service.prefetcher.set_context(scope, context)
+            return None
+        if method == "forget_prefetch_scope":
+            self.service.prefetcher.forget(*args)
+            return None
+        if method == "get_api_key":
+            return self.service.api_key
+        raise ValueError(f"Unknown method {method!r}")
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path):
+    """Remove a socket file left by a daemon that is no longer running"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"A TMDb daemon is already listening on {path}")
+    finally:
+        probe.close()
+
+
+class DaemonError(RuntimeError):
+    """The daemon could not complete a call"""
+
+
+class _RemotePrefetcher:
+    """The parts of the Prefetcher API that workers use, forwarded to the daemon's prefetcher"""
+
+    def __init__(self, service):
+        self._service = service
+
+    def set_context(self, scope, context):
+        """Record the scope's current view, cancelling queued tasks from a previous one"""
+        self._forward("set_prefetch_context", scope, context)
+
+    def forget(self, scope):
+        """Cancel the scope's tasks and drop its context"""
+        self._forward("forget_prefetch_scope", scope)
+
+    def _forward(self, method, *args):
+        try:
+            self._service._call(method, *args)
+        except (OSError, DaemonError):
+            # Prefetching is best effort; the daemon being down must not fail the page
+            pass
+
+    def stats(self):
+        """Get task counters and the prefetch hit rate"""
+        return self._service.get_prefetch_stats()
+
+
+class DaemonTMDbService:
+    """TMDbService API served by the shared cache daemon
+
+    Falls back to an in-process TMDbService for any call the daemon cannot answer,
+    so a worker keeps working (with its own cold state) while the daemon is down.
+    """
+
+    def __init__(self, path=DAEMON_SOCKET, timeout=DAEMON_TIMEOUT, pool_size=DAEMON_POOL_SIZE):
+        self.path = path
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.image_base_url = TMDB_IMAGE_BASE_URL
+        self.prefetcher = _RemotePrefetcher(self)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._api_key = None
+        self._local_service = None
+        self._local_discover = False
+        self._local_discover_checked_at = None
+
+    def _connect(self, reuse=True):
+        """Get (socket, reused), taking an idle connection when there is one"""
+        if reuse:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop(), True
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock, False
+
+    def _release(self, sock):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _call(self, method, *args, **kwargs):
+        """Call a service method in the daemon and return its result"""
+        reuse = True
+        while True:
+            sock, reused = self._connect(reuse)
+            try:
+                send_message(sock, {"method": method, "args": args, "kwargs": kwargs})
+                with sock.makefile("rb") as stream:
+                    header, body = read_message(stream)
+                break
+            except ConnectionError:
+                sock.close()
+                if not reused:
+                    raise
+                # An idle connection may have been closed by a daemon restart; retry once on a new one
+                reuse = False
+            except BaseException:
+                # The connection may hold half a message; never reuse it
+                sock.close()
+                raise
+        self._release(sock)
+        if not header["ok"]:
+            raise DaemonError(header["error"])
+        return body if body is not None else header["result"]
+
+    def _local(self):
+        """Get the in-process service used while the daemon is unreachable"""
+        with self._lock:
+            if self._local_service is None:
+                from .tmdb_service import TMDbService
+
+                self._local_service = TMDbService()
+        return self._local_service
+
+    def _call_or_local(self, method, *args, **kwargs):
+        try:
+            return self._call(method, *args, **kwargs), "daemon"
+        except (OSError, DaemonError) as e:
+            print(f"Error calling TMDb daemon at {self.path}, serving {method} locally: {e}")
+            return getattr(self._local(), method)(*args, **kwargs), "local"
+
+    def _request(self, method, *args, **kwargs):
+        family = REQUEST_METHODS[method]
+        with REQUEST_LATENCY.time(family=family):
+            data, source = self._call_or_local(method, *args, **kwargs)
+        REQUESTS.inc(family=family, source=source)
+        return data
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            try:
+                self._api_key = self._call("get_api_key")
+            except (OSError, DaemonError):
+                return self._local().api_key
+        return self._api_key
+
+    def with_api_key(self, api_key):
+        """Get an in-process service that makes its requests with the given API key
+
+        The daemon serves every worker and user on the host with its own key, so a key
+        typed into a session is used for that session's requests and never reaches the daemon.
+        """
+        return self._local().with_api_key(api_key)
+
+    def get_trending_movies(self, time_window="week", page=1):
+        """Get trending movies for the day or week, from the trending snapshot when it holds the page"""
+        # The snapshot file is mapped by every worker, so these never cross the socket
+        data = snapshot_page(time_window, page)
+        if data is not None:
+            REQUESTS.inc(family="trending", source="snapshot")
+            return data
+        return self._request("get_trending_movies", time_window, page=page)
+
+    def search_movies(self, query, page=1, include_adult=False):
+        """Search for movies by title"""
+        return self._request("search_movies", query, page=page, include_adult=include_adult)
+
+    def get_movie_details(self, movie_id, sections=DETAIL_SECTIONS):
+        """Get a movie's details with the given sections"""
+        return self._request("get_movie_details", movie_id, sections=list(sections or ()))
+
+    def get_movie_section(self, movie_id, section):
+        """Get one detail section of a movie ("credits", "videos" or "keywords")"""
+        return self._request("get_movie_section", movie_id, section)
+
+    def fetch_movie_sections(self, movie_id, sections=DETAIL_SECTIONS):
+        """Start fetching a movie's detail sections in the background, returning {section: Future}"""
+        return {section: _section_executor.submit(self.get_movie_section, movie_id, section) for section in sections}
+
+    def hydrate_movies(self, movie_ids, sections=CARD_SECTIONS):
+        """Start fetching details for a page of results on the bounded hydration pool, returning {movie_id: Future}"""
+        return get_hydrator().submit(self.get_movie_details, movie_ids, sections)
+
+    def get_similar_movies(self, movie_id):
+        """Get movies similar to one"""
+        return self._request("get_similar_movies", movie_id)
+
+    def get_recommendations_for(self, movie_ids):
+        """Get movies recommended for someone who likes the given movies, or None without local recommendations"""
+        return self._request("get_recommendations_for", list(movie_ids))
+
+    def get_genres(self):
+        """Get the list of official genres for movies"""
+        return self._request("get_genres")
+
+    def discover_movies(self, params=None):
+        """Discover movies by different types of data"""
+        return self._request("discover_movies", params)
+
+    def has_local_discover(self):
+        """Check whether the daemon answers discover queries locally, fast enough to apply filters live"""
+        # Asked on every Search rerun, so the answer is remembered rather than sent over the socket each time
+        now = time.monotonic()
+        if not self._local_discover and (self._local_discover_checked_at is None or
+                                         now - self._local_discover_checked_at >= LOCAL_DISCOVER_CHECK_SECONDS):
+            self._local_discover = bool(self._call_or_local("has_local_discover")[0])
+            self._local_discover_checked_at = now
+        return self._local_discover
+
+    def prefetch(self, scope, func, *args, **kwargs):
+        """Ask the daemon to call one of this service's methods in the background"""
+        method = getattr(func, "__name__", None)
+        if getattr(func, "__self__", None) is not self or method not in REQUEST_METHODS:
+            return None
+        try:
+            return self._call("prefetch", scope, method, args, kwargs)
+        except (OSError, DaemonError):
+            # Prefetching is best effort; never do it in the foreground
+            return None
+
+    def get_prefetch_stats(self):
+        """Get the daemon's prefetch task counters and hit rate"""
+        return self._call_or_local("get_prefetch_stats")[0]
+
+    def get_cache_stats(self):
+        """Get hit/miss counters for the daemon's response cache"""
+        return self._call_or_local("get_cache_stats")[0]
+
+    def get_request_stats(self):
+        """Get counters for upstream, coalesced and rate-limited requests across every worker"""
+        return self._call_or_local("get_request_stats")[0]
+
+    def get_movie_poster_url(self, poster_path, size=POSTER_SIZE):
+        """Get the full URL for a movie poster"""
+        if not poster_path:
+            return None
+        return f"{self.image_base_url}{size}{poster_path}"
+
+    def get_backdrop_url(self, backdrop_path, size=BACKDROP_SIZE):
+        """Get the full URL for a movie backdrop"""
+        if not backdrop_path:
+            return None
+        return f"{self.image_base_url}{size}{backdrop_path}"
+
+    def get_profile_url(self, profile_path, size=POSTER_SIZE):
+        """Get the full URL for a person's profile image"""
+        if not profile_path:
+            return None
+        return f"{self.image_base_url}{size}{profile_path}"
+
+    def get_movie_poster_image(self, poster_path, width=None):
+        """Get poster image bytes for a column `width` pixels wide, from the trending snapshot when it has them"""
+        data = snapshot_poster(poster_path, width)
+        if data is not None:
+            return data
+        return self._call_or_local("get_movie_poster_image", poster_path, width=width)[0]
+
+    def get_backdrop_image(self, backdrop_path, width=None):
+        """Get backdrop image bytes for a column `width` pixels wide"""
+        return self._call_or_local("get_backdrop_image", backdrop_path, width=width)[0]
+
+    def get_profile_image(self, profile_path, width=None):
+        """Get profile image bytes for a column `width` pixels wide"""
+        return self._call_or_local("get_profile_image", profile_path, width=width)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the TMDb cache daemon shared by every worker process")
+    parser.add_argument("--socket", default=DAEMON_SOCKET or "/tmp/cinestream-tmdb.sock", help="Unix socket path")
+    args = parser.parse_args(argv)
+
+    daemon = TMDbDaemon(args.socket)
+    # The daemon owns upstream access for every worker, so it keeps the snapshot current for all of them
+    start_snapshot_job(daemon.service)
+    print(f"TMDb daemon listening on {args.socket}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+
+from .config import FAVORITES_BACKEND, FAVORITES_DB, FAVORITES_WRITE_BATCH
+
+
+class FavoritesBackend:
+    """Persistent storage for favorites, as ordered movie ids per user"""
+
+    def load(self, user_id):
+        """Get a user's favorite movie ids, oldest first"""
+        raise NotImplementedError
+
+    def apply(self, user_id, added, removed):
+        """Persist a batch of changes: `added` ids in order, then `removed` ids"""
+        raise NotImplementedError
+
+
+class MemoryFavoritesBackend(FavoritesBackend):
+    """Keeps favorites for the life of the process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+
+    def load(self, user_id):
+        with self._lock:
+            return list(self._users.get(user_id, {}))
+
+    def apply(self, user_id, added, removed):
+        with self._lock:
+            ids = self._users.setdefault(user_id, {})
+            for movie_id in removed:
+                ids.pop(movie_id, None)
+            for movie_id in added:
+                ids.pop(movie_id, None)
+                ids[movie_id] = None
+
+
+class SQLiteFavoritesBackend(FavoritesBackend):
+    """Stores favorites in SQLite, writing each batch of changes in one transaction"""
+
+    def __init__(self, path=FAVORITES_DB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS favorites ("
+                "user_id TEXT NOT NULL, movie_id INTEGER NOT NULL, added_at REAL NOT NULL, "
+                "PRIMARY KEY (user_id, movie_id))"
+            )
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, user_id):
+        rows = self._connection().execute(
+            "SELECT movie_id FROM favorites WHERE user_id = ? ORDER BY rowid", (user_id,)
+        )
+        return [movie_id for (movie_id,) in rows]
+
+    def apply(self, user_id, added, removed):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "DELETE FROM favorites WHERE user_id = ? AND movie_id = ?",
+                [(user_id, movie_id) for movie_id in removed]
+            )
+            # REPLACE gives a re-added movie a new rowid, moving it to the end like the in-memory order
+            conn.executemany(
+                "INSERT OR REPLACE INTO favorites (user_id, movie_id, added_at) VALUES (?, ?, ?)",
+                [(user_id, movie_id, now) for movie_id in added]
+            )
+
+
+FAVORITES_BACKENDS = {
+    "sqlite": SQLiteFavoritesBackend,
+    "memory": MemoryFavoritesBackend,
+}
+
+
+class FavoritesStore:
+    """One user's favorites: movie ids in insertion order with O(1) membership, add and remove
+
+    Changes are applied in memory immediately and written to the backend in
+    batches by `flush`, which the app calls once per rerun.
+    """
+
+    def __init__(self, user_id, backend=None, write_batch=FAVORITES_WRITE_BATCH):
+        self.user_id = user_id
+        self.backend = backend or get_favorites_backend()
+        self.write_batch = write_batch
+        # A dict doubles as an insertion-ordered set
+        self._ids = dict.fromkeys(self.backend.load(user_id))
+        self._pending = {}
+
+    def __contains__(self, movie_id):
+        return movie_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(list(self._ids))
+
+    def _record(self, movie_id, added):
+        # Only the latest change to a movie matters; moving it to the end keeps re-adds ordered
+        self._pending.pop(movie_id, None)
+        self._pending[movie_id] = added
+        if len(self._pending) >= self.write_batch:
+            self.flush()
+
+    def add(self, movie_id):
+        """Add a movie, returning False if it was already a favorite"""
+        if movie_id in self._ids:
+            return False
+        self._ids[movie_id] = None
+        self._record(movie_id, True)
+        return True
+
+    def remove(self, movie_id):
+        """Remove a movie, returning False if it was not a favorite"""
+        if movie_id not in self._ids:
+            return False
+        del self._ids[movie_id]
+        self._record(movie_id, False)
+        return True
+
+    def clear(self):
+        for movie_id in list(self._ids):
+            self.remove(movie_id)
+
+    def flush(self):
+        """Write pending changes to the backend in one batch"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        added = [movie_id for movie_id, is_added in pending.items() if is_added]
+        removed = [movie_id for movie_id, is_added in pending.items() if not is_added]
+        try:
+            self.backend.apply(self.user_id, added, removed)
+        except sqlite3.Error as e:
+            print(f"Error saving favorites: {e}")
+            # Keep the changes, merged under any made since, for the next flush
+            for movie_id, is_added in self._pending.items():
+                pending.pop(movie_id, None)
+                pending[movie_id] = is_added
+            self._pending = pending
+
+
+_favorites_backend = None
+_favorites_backend_lock = threading.Lock()
+
+
+def get_favorites_backend():
+    """Get the process-wide favorites backend selected by FAVORITES_BACKEND"""
+    global _favorites_backend
+    if _favorites_backend is None:
+        with _favorites_backend_lock:
+            if _favorites_backend is None:
+                _favorites_backend = FAVORITES_BACKENDS.get(FAVORITES_BACKEND, SQLiteFavoritesBackend)()
+    return _favorites_backend
@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    HTTP_POOL_SIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+)
+from .rate_limiter import get_rate_limiter
+from .metrics import HTTP_RETRIES
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Get the process-wide HTTP session shared by every TMDbService instance"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled in get_with_retry so that Retry-After and
+                # jitter behave the same for every caller
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_SIZE,
+                    pool_maxsize=HTTP_POOL_SIZE,
+                    pool_block=True,
+                    max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def backoff_delay(attempt):
+    """Get a full-jitter exponential backoff delay for the given retry attempt"""
+    ceiling = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def parse_retry_after(response):
+    """Get the delay requested by a Retry-After header, in seconds"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        delay = retry_at.timestamp() - time.time()
+
+    return min(max(delay, 0.0), HTTP_BACKOFF_MAX)
+
+
+def get_with_retry(url, params=None, timeout=None, max_retries=HTTP_MAX_RETRIES, headers=None, rate_limit=True):
+    """GET a URL through the shared session, retrying 429/5xx and connection errors
+
+    Pass rate_limit=False for hosts outside the API quota, such as the image CDN.
+    """
+    session = get_session()
+    rate_limiter = get_rate_limiter()
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    attempt = 0
+    while True:
+        # Every attempt, including retries, spends a token from the shared bucket
+        if rate_limit:
+            rate_limiter.acquire()
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            HTTP_RETRIES.inc(reason="connection")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                return response
+            delay = parse_retry_after(response)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            HTTP_RETRIES.inc(reason=response.status_code)
+            response.close()
+
+        attempt += 1
+        time.sleep(delay)
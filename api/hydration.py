@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import HYDRATION_WORKERS
+
+
+class Hydrator:
+    """Bounded pool fetching movie details for pages of result cards
+
+    A movie whose details are already being fetched for another render (or
+    another session) shares that fetch instead of taking a second worker.
+    """
+
+    def __init__(self, workers=HYDRATION_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="tmdb-hydrate")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fetch, movie_ids, sections):
+        """Start `fetch(movie_id, sections)` for each movie, returning {movie_id: Future}"""
+        sections = tuple(sections)
+        futures, started = {}, []
+        with self._lock:
+            for movie_id in movie_ids:
+                key = (movie_id, sections)
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = self._in_flight[key] = self._executor.submit(fetch, movie_id, sections)
+                    started.append((key, future))
+                futures[movie_id] = future
+        # Registered outside the lock, since a callback runs right away when its future is already done
+        for key, future in started:
+            future.add_done_callback(lambda _, key=key: self._forget(key))
+        return futures
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def stats(self):
+        """Get the number of movies being fetched"""
+        with self._lock:
+            return {"in_flight": len(self._in_flight)}
+
+
+_hydrator = None
+_hydrator_lock = threading.Lock()
+
+
+def get_hydrator():
+    """Get the process-wide hydration pool shared by every session"""
+    global _hydrator
+    if _hydrator is None:
+        with _hydrator_lock:
+            if _hydrator is None:
+                _hydrator = Hydrator()
+    return _hydrator
@@ -0,0 +1,326 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+
+from .config import (
+    TMDB_IMAGE_BASE_URL,
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_BYTES,
+    IMAGE_REVALIDATE_SECONDS,
+    IMAGE_PIXEL_RATIO,
+    IMAGE_DEADLINE_SECONDS,
+)
+from .circuit_breaker import get_circuit_breaker
+from .http_client import get_with_retry
+from .single_flight import SingleFlight
+
+IMAGE_INDEX_NAME = "index.sqlite3"
+
+# Eviction frees space down to this fraction of the budget so it doesn't run on every write
+EVICTION_TARGET = 0.9
+
+# Access times are written to the index in batches of this many hits
+TOUCH_BATCH_SIZE = 64
+
+# The image CDN gets its own circuit, apart from the API's endpoint families
+IMAGE_FAMILY = "images"
+
+# Downloads run here so a render can stop waiting on a slow CDN without cancelling the download
+_download_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tmdb-images")
+
+
+def size_width(size):
+    """Get the pixel width of a TMDb size bucket like w342 or h632"""
+    if size.startswith("w"):
+        return int(size[1:])
+    if size.startswith("h"):
+        # Height buckets are used for 2:3 portraits
+        return int(size[1:]) * 2 // 3
+    return None
+
+
+def pick_size(sizes, width, pixel_ratio=IMAGE_PIXEL_RATIO):
+    """Pick the smallest TMDb size bucket that covers a rendered width in CSS pixels"""
+    if not width:
+        return sizes[-1]
+
+    target = width * pixel_ratio
+    for size in sizes:
+        bucket_width = size_width(size)
+        if bucket_width is not None and bucket_width >= target:
+            return size
+    return sizes[-1]
+
+
+def _render_placeholder(width, height, text):
+    """Render a placeholder PNG with centered text"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), (30, 30, 30))
+    draw = ImageDraw.Draw(image)
+    left, top, right, bottom = draw.textbbox((0, 0), text)
+    draw.text(
+        ((width - (right - left)) / 2, (height - (bottom - top)) / 2),
+        text,
+        fill=(160, 160, 160)
+    )
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class ImageCache:
+    """On-disk, content-addressed cache of TMDb images with ETag revalidation
+
+    Files are keyed by size bucket and image path. Total size is bounded and the
+    least recently used files are evicted first.
+    """
+
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES,
+                 revalidate_after=IMAGE_REVALIDATE_SECONDS, base_url=TMDB_IMAGE_BASE_URL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.base_url = base_url
+        self.db_path = os.path.join(directory, IMAGE_INDEX_NAME)
+        self._local = threading.local()
+        self._single_flight = SingleFlight()
+        self._placeholders = {}
+        self._pending_touches = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "evicted": 0}
+        self.breaker = get_circuit_breaker()
+        self._init_db()
+
+    def _connection(self):
+        """Get this thread's SQLite connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "key TEXT PRIMARY KEY, file TEXT NOT NULL, size_bytes INTEGER NOT NULL, "
+                "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS images_accessed_at ON images (accessed_at)")
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _file_path(self, key, image_path):
+        """Get the content-addressed file path for a cache key"""
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        extension = os.path.splitext(image_path)[1] or ".img"
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def _read(self, file_path):
+        try:
+            with open(file_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, file_path, data):
+        """Write a file atomically so readers never see a partial image"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+    def get(self, image_path, size):
+        """Get image bytes for a TMDb path and size bucket, or None if unavailable"""
+        if not image_path:
+            return None
+
+        key = f"{size}{image_path}"
+        row = self._connection().execute(
+            "SELECT file, etag, last_modified, fetched_at FROM images WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is not None and time.time() - row[3] < self.revalidate_after:
+            data = self._read(row[0])
+            if data is not None:
+                self._touch(key)
+                self._count("hits")
+                return data
+            row = None
+
+        # Serve the stored copy, however old, or nothing while the CDN is down or slow
+        if not self.breaker.allow(IMAGE_FAMILY):
+            return self._read(row[0]) if row is not None else None
+        if IMAGE_DEADLINE_SECONDS <= 0:
+            return self._single_flight.do(key, lambda: self._fetch(key, image_path, size, row))
+        future = _download_executor.submit(self._single_flight.do, key, lambda: self._fetch(key, image_path, size, row))
+        try:
+            return future.result(timeout=IMAGE_DEADLINE_SECONDS)
+        except FutureTimeoutError:
+            self.breaker.record_failure(IMAGE_FAMILY, probe=lambda: self._fetch(key, image_path, size, row))
+            return self._read(row[0]) if row is not None else None
+
+    def _touch(self, key):
+        """Record an access for LRU eviction, batching the index writes"""
+        with self._lock:
+            self._pending_touches[key] = time.time()
+            if len(self._pending_touches) < TOUCH_BATCH_SIZE:
+                return
+        self._flush_touches()
+
+    def _flush_touches(self):
+        with self._lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        if touches:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE images SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in touches.items()]
+                )
+
+    def _fetch(self, key, image_path, size, row):
+        """Download an image, or revalidate the stored copy if there is one"""
+        file_path = self._file_path(key, image_path)
+        headers = {}
+        if row is not None:
+            if row[1]:
+                headers["If-None-Match"] = row[1]
+            if row[2]:
+                headers["If-Modified-Since"] = row[2]
+
+        try:
+            response = get_with_retry(f"{self.base_url}{size}{image_path}", headers=headers, rate_limit=False)
+            if response.status_code == 304 and row is not None:
+                self.breaker.record_success(IMAGE_FAMILY)
+                data = self._read(row[0])
+                if data is not None:
+                    conn = self._connection()
+                    with conn:
+                        conn.execute(
+                            "UPDATE images SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                            (time.time(), time.time(), key)
+                        )
+                    self._count("revalidated")
+                    return data
+                # The file vanished; fetch it again without validators
+                response = get_with_retry(f"{self.base_url}{size}{image_path}", rate_limit=False)
+            response.raise_for_status()
+            self.breaker.record_success(IMAGE_FAMILY)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching image {size}{image_path}: {e}")
+            status = getattr(e.response, "status_code", None)
+            if status is None or status >= 500 or status == 429:
+                self.breaker.record_failure(IMAGE_FAMILY, probe=lambda: self._fetch(key, image_path, size, row))
+            else:
+                # A missing image says nothing about the CDN's health
+                self.breaker.record_success(IMAGE_FAMILY)
+            # Serve the stored copy, however old, rather than nothing
+            return self._read(row[0]) if row is not None else None
+
+        data = response.content
+        self._write(file_path, data)
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, file, size_bytes, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, file_path, len(data), response.headers.get("ETag"),
+                 response.headers.get("Last-Modified"), now, now)
+            )
+        self._count("misses")
+        self._evict()
+        return data
+
+    def _evict(self):
+        """Delete least recently used images until the cache is back under budget"""
+        self._flush_touches()
+        conn = self._connection()
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICTION_TARGET
+        evicted = []
+        for key, file_path, size_bytes in conn.execute(
+            "SELECT key, file, size_bytes FROM images ORDER BY accessed_at"
+        ).fetchall():
+            if total <= target:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            evicted.append((key,))
+            total -= size_bytes
+
+        with conn:
+            conn.executemany("DELETE FROM images WHERE key = ?", evicted)
+        self._count("evicted", len(evicted))
+
+    def clear(self):
+        """Remove every cached image from disk and the index"""
+        with self._lock:
+            self._pending_touches.clear()
+        conn = self._connection()
+        for (file_path,) in conn.execute("SELECT file FROM images").fetchall():
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+        with conn:
+            conn.execute("DELETE FROM images")
+
+    def get_placeholder(self, width=500, height=750, text="No Image"):
+        """Get a locally generated placeholder PNG, cached in memory and on disk"""
+        key = (width, height, text)
+        data = self._placeholders.get(key)
+        if data is not None:
+            return data
+
+        digest = hashlib.sha1(f"{width}x{height}:{text}".encode("utf-8")).hexdigest()[:16]
+        file_path = os.path.join(self.directory, f"placeholder_{digest}.png")
+        data = self._read(file_path)
+        if data is None:
+            data = _render_placeholder(width, height, text)
+            self._write(file_path, data)
+        self._placeholders[key] = data
+        return data
+
+    def stats(self):
+        """Get hit/miss/revalidation/eviction counters and the bytes on disk"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["bytes"] = self._connection().execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM images"
+        ).fetchone()[0]
+        return stats
+
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Get the process-wide image cache shared by every TMDbService instance"""
+    global _image_cache
+    if _image_cache is None:
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = ImageCache()
+    return _image_cache
@@ -0,0 +1,210 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    SEARCH_DEBOUNCE_SECONDS,
+    SEARCH_STREAM_PAGES,
+    SEARCH_MIN_QUERY_LENGTH,
+    SEARCH_PREFIX_CACHE_ENTRIES,
+)
+from .search_index import normalize, tokenize
+
+# Debounced search tasks for every session; most of their time is spent waiting
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tmdb-search")
+
+
+def matches_query(title, query):
+    """Check whether a title matches a query typed so far: every word, the last one as a prefix"""
+    terms = tokenize(query)
+    if not terms:
+        return False
+    words = tokenize(title)
+    *complete, partial = terms
+    return all(term in words for term in complete) and any(word.startswith(partial) for word in words)
+
+
+class PrefixResultCache:
+    """Bounded LRU of first-page search results by normalized query, shared by every session"""
+
+    def __init__(self, max_entries=SEARCH_PREFIX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, query, results):
+        key = normalize(query).strip()
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def refine(self, query):
+        """Answer a query from the results of its longest cached prefix, or None if no prefix is cached"""
+        key = normalize(query).strip()
+        with self._lock:
+            for end in range(len(key), SEARCH_MIN_QUERY_LENGTH - 1, -1):
+                results = self._entries.get(key[:end])
+                if results is not None:
+                    self._entries.move_to_end(key[:end])
+                    break
+            else:
+                return None
+        if end == len(key):
+            return results
+        return [movie for movie in results if matches_query(movie.get("title"), query)]
+
+
+class SearchStream:
+    """Results for one query, appended page by page by a background task"""
+
+    def __init__(self, query):
+        self.query = query
+        self.total_pages = None
+        self.failed = False
+        self._pages = []
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop the task before its next upstream request; a request already in flight is left to finish"""
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def results(self):
+        """Get the results received so far, in page order with duplicates removed"""
+        with self._lock:
+            pages = list(self._pages)
+        seen = set()
+        results = []
+        for page in pages:
+            for movie in page:
+                if movie.get("id") not in seen:
+                    seen.add(movie.get("id"))
+                    results.append(movie)
+        return results
+
+    def _add_page(self, data):
+        with self._lock:
+            self._pages.append(data.get("results", []))
+            self.total_pages = data.get("total_pages", 1)
+
+
+class IncrementalSearch:
+    """One session's search as you type
+
+    Each new query supersedes the previous one: the old stream is cancelled, and
+    the new one waits out the debounce delay before fetching anything, so
+    keystrokes that arrive in quick succession cost no upstream requests.
+    """
+
+    def __init__(self, service, prefix_cache=None, debounce=SEARCH_DEBOUNCE_SECONDS, pages=SEARCH_STREAM_PAGES):
+        self.service = service
+        self.prefix_cache = prefix_cache or get_prefix_cache()
+        self.debounce = debounce
+        self.pages = max(pages, 1)
+        self.stream = None
+
+    def update(self, query):
+        """Get the stream for `query`, starting it (and cancelling the previous one) if the query changed"""
+        if self.stream is not None and self.stream.query == query:
+            return self.stream
+        if self.stream is not None:
+            self.stream.cancel()
+        self.stream = SearchStream(query)
+        _executor.submit(self._run, self.stream)
+        return self.stream
+
+    def provisional(self, query):
+        """Get results refined from a cached prefix while the exact query is in flight"""
+        return self.prefix_cache.refine(query) or []
+
+    def _run(self, stream):
+        try:
+            # A newer keystroke during the debounce delay cancels this query before it costs anything
+            if stream._cancelled.wait(self.debounce):
+                return
+            for page in range(1, self.pages + 1):
+                if stream.cancelled:
+                    return
+                data = self.service.search_movies(stream.query, page=page)
+                if not data or "results" not in data:
+                    stream.failed = page == 1
+                    return
+                stream._add_page(data)
+                if page == 1:
+                    self.prefix_cache.put(stream.query, data["results"])
+                if page >= data.get("total_pages", 1):
+                    return
+        except Exception as e:
+            print(f"Error searching for {stream.query!r}: {e}")
+            stream.failed = True
+        finally:
+            stream._done.set()
+
+
+class SuggestionTrie:
+    """Prefix tree of past queries, completing a prefix with the most frequently used ones"""
+
+    def __init__(self):
+        self._root = {}
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def insert(self, text, weight=1):
+        key = normalize(text).strip()
+        if not key:
+            return
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[None] = text
+        self._counts[text] = self._counts.get(text, 0) + weight
+
+    def complete(self, prefix, limit=5):
+        """Get up to `limit` stored queries starting with `prefix`, most used first"""
+        node = self._root
+        for char in normalize(prefix).strip():
+            node = node.get(char)
+            if node is None:
+                return []
+
+        found = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    found.append(child)
+                else:
+                    stack.append(child)
+        found.sort(key=lambda text: (-self._counts[text], text))
+        return found[:limit]
+
+
+_prefix_cache = None
+_prefix_cache_lock = threading.Lock()
+
+
+def get_prefix_cache():
+    """Get the process-wide prefix result cache"""
+    global _prefix_cache
+    if _prefix_cache is None:
+        with _prefix_cache_lock:
+            if _prefix_cache is None:
+                _prefix_cache = PrefixResultCache()
+    return _prefix_cache
@@ -0,0 +1,349 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import METRICS_ENABLED, METRICS_FILE, METRICS_EXPORT_INTERVAL, METRICS_PORT
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for a metric family with optional labels
+
+    Every update is a no-op when the registry is disabled, so instrumented code
+    pays for one attribute check and nothing else.
+    """
+
+    type_name = None
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self):
+        """Get a copy of {label values: value}"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; per label set it keeps bucket counts, a total count and a sum"""
+
+    type_name = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Bucket counts are stored per bucket and made cumulative on export
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels):
+        """Time a block and observe its duration in seconds"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def collect(self):
+        with self._lock:
+            return {key: (list(counts), count, total) for key, (counts, count, total) in self._values.items()}
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile of one label set from its buckets, as the upper bound of the bucket holding it"""
+        state = self.collect().get(self._key(labels))
+        if state is None or state[1] == 0:
+            return None
+        counts, count, _ = state
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        for key, (counts, count, total) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_count{labels} {count}"
+            yield f"{self.name}_sum{labels} {_format_value(float(total))}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Set of named metrics rendered together in the OpenMetrics text format
+
+    Collectors are callables returning [(name, type, help, {labels tuple: value}, labelnames)],
+    evaluated at export time for values that already live elsewhere, like cache counters.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Render every metric in the OpenMetrics text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.extend(metric.samples())
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, type_name, help_text, values, labelnames in families:
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.append(f"# HELP {name} {_escape(help_text)}")
+                suffix = "_total" if type_name == "counter" else ""
+                for key, value in sorted(values.items()):
+                    lines.append(f"{name}{suffix}{_format_labels(labelnames, key)} {_format_value(value)}")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+UPSTREAM_LATENCY = registry.histogram(
+    "tmdb_upstream_request_duration_seconds",
+    "Time to fetch a response from the TMDb API, including retries",
+    ["family", "outcome"],
+)
+UPSTREAM_ERRORS = registry.counter(
+    "tmdb_upstream_errors",
+    "TMDb API requests that failed after retries",
+    ["family", "reason"],
+)
+HTTP_RETRIES = registry.counter(
+    "tmdb_http_retries",
+    "HTTP attempts retried after a 429, a 5xx or a connection error",
+    ["reason"],
+)
+REQUESTS = registry.counter(
+    "tmdb_requests",
+    "Service requests by endpoint family and how they were answered",
+    ["family", "source"],
+)
+REQUEST_LATENCY = registry.histogram(
+    "tmdb_request_duration_seconds",
+    "Time to answer a service request, whether from the cache or upstream",
+    ["family"],
+)
+RENDER_LATENCY = registry.histogram(
+    "tmdb_render_duration_seconds",
+    "Time to render a page or component in a script rerun",
+    ["section"],
+)
+LAST_RENDER = registry.gauge(
+    "tmdb_last_render_duration_seconds",
+    "Duration of the most recent rerun of each page",
+    ["section"],
+)
+
+
+def timed(section):
+    """Decorate a rendering function to observe its duration under `section`"""
+    def decorator(func):
+        if not registry.enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with RENDER_LATENCY.time(section=section):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_rerun(page, started):
+    """Record a page rerun that began at perf_counter() time `started`"""
+    if not registry.enabled:
+        return
+    elapsed = time.perf_counter() - started
+    RENDER_LATENCY.observe(elapsed, section=f"page:{page}")
+    LAST_RENDER.set(elapsed, section=f"page:{page}")
+
+
+def write_metrics_file(path=METRICS_FILE):
+    """Write the current metrics to a file, replacing it atomically"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters(path=METRICS_FILE, port=METRICS_PORT, interval=METRICS_EXPORT_INTERVAL):
+    """Start the configured file and HTTP exporters once per process"""
+    global _exporters_started
+    if not registry.enabled or _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+        if path:
+            def export_loop():
+                while True:
+                    try:
+                        write_metrics_file(path)
+                    except OSError as e:
+                        print(f"Error writing metrics to {path}: {e}")
+                    time.sleep(interval)
+
+            threading.Thread(target=export_loop, name="tmdb-metrics-file", daemon=True).start()
+
+        if port:
+            try:
+                server = ThreadingHTTPServer(("", port), _MetricsHandler)
+            except OSError as e:
+                # Another process (or Streamlit worker) already serves this port
+                print(f"Error serving metrics on port {port}: {e}")
+            else:
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="tmdb-metrics-http", daemon=True).start()
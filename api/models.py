@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class Movie:
+    """Minimal movie summary: enough to render a card"""
+
+    id: int
+    title: str = "Unknown Title"
+    release_date: str = ""
+    vote_average: float = 0.0
+    poster_path: str = None
+    overview: str = "No overview available."
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a summary from a TMDb result, details payload or another Movie"""
+        if isinstance(data, cls):
+            return data
+        return cls(
+            id=data.get("id"),
+            title=data.get("title") or "Unknown Title",
+            release_date=data.get("release_date") or "",
+            vote_average=data.get("vote_average") or 0.0,
+            poster_path=data.get("poster_path"),
+            overview=data.get("overview") or "No overview available.",
+        )
+
+    @property
+    def year(self):
+        return self.release_date[:4] if self.release_date else "Unknown Year"
+
+
+@dataclass(slots=True)
+class CastMember:
+    id: int
+    name: str
+    character: str = ""
+    profile_path: str = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data.get("id"),
+            name=data.get("name", ""),
+            character=data.get("character") or "",
+            profile_path=data.get("profile_path"),
+        )
+
+
+@dataclass(slots=True)
+class Video:
+    key: str
+    name: str = ""
+    type: str = ""
+    site: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            key=data.get("key"),
+            name=data.get("name") or "",
+            type=data.get("type") or "",
+            site=data.get("site") or "",
+        )
+
+
+@dataclass(slots=True)
+class MovieDetails:
+    """Movie details with the append_to_response sections parsed on first access
+
+    The raw section payloads are kept by reference, so building a MovieDetails
+    from a cached response copies nothing until a section is actually rendered.
+    """
+
+    id: int
+    title: str = "Unknown Title"
+    release_date: str = ""
+    vote_average: float = 0.0
+    poster_path: str = None
+    backdrop_path: str = None
+    overview: str = "No overview available."
+    runtime: int = None
+    status: str = "N/A"
+    genres: tuple = ()
+    _sections: dict = field(default_factory=dict, repr=False, compare=False)
+    _parsed: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data.get("id"),
+            title=data.get("title") or "Unknown Title",
+            release_date=data.get("release_date") or "",
+            vote_average=data.get("vote_average") or 0.0,
+            poster_path=data.get("poster_path"),
+            backdrop_path=data.get("backdrop_path"),
+            overview=data.get("overview") or "No overview available.",
+            runtime=data.get("runtime"),
+            status=data.get("status") or "N/A",
+            genres=tuple(genre["name"] for genre in data.get("genres", [])),
+            _sections={name: data[name] for name in ("credits", "videos", "recommendations", "similar") if name in data},
+        )
+
+    @property
+    def year(self):
+        return self.release_date[:4] if self.release_date else "Unknown Year"
+
+    def add_section(self, name, data):
+        """Attach a section that arrived after the basic details"""
+        self._sections[name] = data
+        self._parsed.pop(name, None)
+
+    def _section(self, name, parse):
+        parsed = self._parsed.get(name)
+        if parsed is None:
+            parsed = self._parsed[name] = parse(self._sections.get(name) or {})
+        return parsed
+
+    @property
+    def cast(self):
+        return self._section("credits", lambda credits: [CastMember.from_dict(c) for c in credits.get("cast", [])])
+
+    @property
+    def videos(self):
+        return self._section("videos", lambda videos: [Video.from_dict(v) for v in videos.get("results", [])])
+
+    @property
+    def similar(self):
+        return self._section("similar", lambda similar: [Movie.from_dict(m) for m in similar.get("results", [])])
+
+    @property
+    def recommendations(self):
+        return self._section(
+            "recommendations", lambda related: [Movie.from_dict(m) for m in related.get("results", [])]
+        )
@@ -0,0 +1,250 @@
+import math
+import threading
+
+import numpy as np
+
+from .cache import iter_cached_movies
+from .config import LOCAL_DISCOVER_MODE, LOCAL_DISCOVER_MIN_MOVIES
+
+RESULTS_PER_PAGE = 20
+INITIAL_CAPACITY = 1024
+
+# Sort keys accepted by discover/movie, mapped to table columns
+SORT_COLUMNS = {
+    "popularity": "popularity",
+    "vote_average": "vote_average",
+    "vote_count": "vote_count",
+    "primary_release_date": "release_date",
+    "release_date": "release_date",
+}
+
+COLUMN_DTYPES = {
+    "id": np.int32,
+    "genre_mask": np.uint64,
+    "release_date": np.int32,
+    "vote_average": np.float32,
+    "vote_count": np.int32,
+    "language": np.uint16,
+    "popularity": np.float32,
+}
+
+
+def date_to_int(date_str):
+    """Convert a YYYY-MM-DD date to a YYYYMMDD integer, or 0 if it is missing or malformed"""
+    try:
+        return int((date_str or "").replace("-", "")[:8])
+    except ValueError:
+        return 0
+
+
+class MovieTable:
+    """Columnar, in-memory table of movie metadata for vectorized discover queries
+
+    Each column is a NumPy array; genres are stored as a bitmask and languages as
+    small integer codes. Rows are upserted by movie id, and the summary dict of
+    each movie is kept alongside for rendering results.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._columns = {name: np.zeros(INITIAL_CAPACITY, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+        self._summaries = []
+        self._rows = {}
+        self._genre_bits = {}
+        self._languages = {}
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = len(self._columns["id"]) * 2
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def _genre_mask(self, genre_ids):
+        mask = 0
+        for genre_id in genre_ids:
+            bit = self._genre_bits.get(genre_id)
+            if bit is None:
+                if len(self._genre_bits) >= 64:
+                    continue
+                bit = self._genre_bits[genre_id] = len(self._genre_bits)
+            mask |= 1 << bit
+        return mask
+
+    def _language_code(self, language):
+        code = self._languages.get(language)
+        if code is None:
+            code = self._languages[language] = len(self._languages) + 1
+        return code
+
+    def add_movies(self, movies):
+        """Insert or update movies from TMDb result or detail dicts"""
+        movies = [movie for movie in movies if movie.get("id") is not None]
+        if not movies:
+            return
+
+        with self._lock:
+            rows = []
+            values = {name: [] for name in COLUMN_DTYPES}
+            for movie in movies:
+                genre_ids = movie.get("genre_ids")
+                if genre_ids is None:
+                    genre_ids = [genre["id"] for genre in movie.get("genres", [])]
+
+                row = self._rows.get(movie["id"])
+                if row is None:
+                    row = self._rows[movie["id"]] = len(self._summaries)
+                    self._summaries.append(None)
+                rows.append(row)
+                self._summaries[row] = movie
+
+                values["id"].append(movie["id"])
+                values["genre_mask"].append(self._genre_mask(genre_ids))
+                values["release_date"].append(date_to_int(movie.get("release_date")))
+                values["vote_average"].append(movie.get("vote_average") or 0.0)
+                values["vote_count"].append(movie.get("vote_count") or 0)
+                values["language"].append(self._language_code(movie.get("original_language")))
+                values["popularity"].append(movie.get("popularity") or 0.0)
+
+            while len(self._summaries) > len(self._columns["id"]):
+                self._grow()
+            rows = np.array(rows, dtype=np.int64)
+            for name, dtype in COLUMN_DTYPES.items():
+                self._columns[name][rows] = np.array(values[name], dtype=dtype)
+            # Publish the new rows only once their columns are written
+            self._size = len(self._summaries)
+
+    def _snapshot(self):
+        """Get views of the populated rows of each column"""
+        with self._lock:
+            size = self._size
+            return size, {name: column[:size] for name, column in self._columns.items()}
+
+    def query(self, genre_ids=None, release_date_range=None, rating_range=None, language=None,
+              min_votes=0, sort_by="popularity.desc", offset=0, limit=RESULTS_PER_PAGE, any_genre=False):
+        """Filter and sort the table, returning (total matches, [movie summaries])
+
+        Movies must have every genre in `genre_ids`, or at least one with `any_genre`.
+        """
+        size, columns = self._snapshot()
+        if size == 0:
+            return 0, []
+
+        mask = np.ones(size, dtype=bool)
+        if genre_ids:
+            required = 0
+            for genre_id in genre_ids:
+                bit = self._genre_bits.get(genre_id)
+                if bit is None:
+                    if any_genre:
+                        continue
+                    return 0, []
+                required |= 1 << bit
+            required = np.uint64(required)
+            if any_genre:
+                mask &= (columns["genre_mask"] & required) != 0
+            else:
+                mask &= (columns["genre_mask"] & required) == required
+        if release_date_range is not None:
+            low, high = release_date_range
+            if low:
+                mask &= columns["release_date"] >= low
+            if high:
+                mask &= columns["release_date"] <= high
+        if rating_range is not None:
+            low, high = rating_range
+            if low is not None:
+                mask &= columns["vote_average"] >= low
+            if high is not None:
+                mask &= columns["vote_average"] <= high
+        if language:
+            code = self._languages.get(language)
+            if code is None:
+                return 0, []
+            mask &= columns["language"] == code
+        if min_votes:
+            mask &= columns["vote_count"] >= min_votes
+
+        rows = np.flatnonzero(mask)
+        total = len(rows)
+        wanted = min(offset + limit, total)
+        if wanted == 0:
+            return total, []
+
+        field, _, direction = sort_by.partition(".")
+        keys = columns[SORT_COLUMNS.get(field, "popularity")][rows].astype(np.float64)
+        if direction != "asc":
+            keys = -keys
+        if wanted < total:
+            top = np.argpartition(keys, wanted - 1)[:wanted]
+            top = top[np.argsort(keys[top], kind="stable")]
+        else:
+            top = np.argsort(keys, kind="stable")
+        page_rows = rows[top[offset:wanted]]
+        return total, [self._summaries[row] for row in page_rows]
+
+    def discover(self, params=None, page=None):
+        """Answer a discover/movie request in the shape of TMDb's response"""
+        params = params or {}
+        page = max(int(page or params.get("page") or 1), 1)
+
+        # TMDb separates genres with "," for AND and "|" for OR
+        genre_ids = None
+        with_genres = str(params.get("with_genres") or "")
+        any_genre = "|" in with_genres
+        if with_genres:
+            genre_ids = [int(g) for g in with_genres.replace("|", ",").split(",") if g]
+
+        total, results = self.query(
+            genre_ids=genre_ids,
+            release_date_range=(
+                date_to_int(params.get("primary_release_date.gte")),
+                date_to_int(params.get("primary_release_date.lte"))
+            ),
+            rating_range=(params.get("vote_average.gte"), params.get("vote_average.lte")),
+            language=params.get("with_original_language"),
+            min_votes=int(params.get("vote_count.gte") or 0),
+            sort_by=params.get("sort_by") or "popularity.desc",
+            offset=(page - 1) * RESULTS_PER_PAGE,
+            any_genre=any_genre,
+        )
+        return {
+            "page": page,
+            "results": results,
+            "total_pages": max(math.ceil(total / RESULTS_PER_PAGE), 1),
+            "total_results": total,
+        }
+
+
+_movie_table = None
+_movie_table_lock = threading.Lock()
+
+
+def get_movie_table():
+    """Get the process-wide movie table seeded from the response cache, or None if disabled"""
+    global _movie_table
+    if LOCAL_DISCOVER_MODE == "off":
+        return None
+    if _movie_table is None:
+        with _movie_table_lock:
+            if _movie_table is None:
+                table = MovieTable()
+                table.add_movies(iter_cached_movies())
+                _movie_table = table
+    return _movie_table
+
+
+def feed_movie_table(movies):
+    """Add movies from a fresh response to the table, if it has been loaded"""
+    if _movie_table is not None:
+        _movie_table.add_movies(movies)
+
+
+def is_local_discover_ready():
+    """Check whether the table has been loaded and holds enough movies to answer discover queries locally"""
+    table = _movie_table
+    return table is not None and len(table) >= LOCAL_DISCOVER_MIN_MOVIES
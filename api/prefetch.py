@@ -0,0 +1,146 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import PREFETCH_ENABLED, PREFETCH_WORKERS, PREFETCH_MAX_IN_FLIGHT
+
+# Number of prefetched cache keys remembered for hit-rate accounting
+MAX_TRACKED_KEYS = 4096
+
+_prefetch_state = threading.local()
+
+
+def is_prefetching():
+    """Check whether the current thread is running a prefetch task"""
+    return getattr(_prefetch_state, "active", False)
+
+
+def carry_prefetch_state(func):
+    """Wrap `func` to run as part of a prefetch task if the calling thread is running one"""
+    if not is_prefetching():
+        return func
+
+    def run(*args, **kwargs):
+        _prefetch_state.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _prefetch_state.active = False
+    return run
+
+
+class Prefetcher:
+    """Background pool that warms the response cache ahead of user navigation
+
+    Tasks belong to a scope (one per session) and a navigation context. Changing a
+    scope's context cancels its queued tasks. Tasks are dropped rather than queued
+    once `max_in_flight` are pending.
+    """
+
+    def __init__(self, workers=PREFETCH_WORKERS, max_in_flight=PREFETCH_MAX_IN_FLIGHT, enabled=PREFETCH_ENABLED):
+        self.enabled = enabled and max_in_flight > 0
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="tmdb-prefetch")
+        self._slots = threading.BoundedSemaphore(max(max_in_flight, 1))
+        self._lock = threading.Lock()
+        self._contexts = {}
+        self._futures = {}
+        self._warmed = OrderedDict()
+        self._stats = {"scheduled": 0, "skipped": 0, "cancelled": 0, "completed": 0, "failed": 0, "warmed": 0, "hits": 0}
+
+    def set_context(self, scope, context):
+        """Record the scope's current view, cancelling queued tasks from a previous one"""
+        with self._lock:
+            previous = self._contexts.get(scope)
+            self._contexts[scope] = context
+        if previous is not None and previous != context:
+            self.cancel(scope)
+
+    def submit(self, scope, func, *args, **kwargs):
+        """Queue a call in the background, or drop it if the in-flight budget is spent"""
+        if not self.enabled:
+            return None
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["skipped"] += 1
+            return None
+
+        future = self._executor.submit(self._run, func, args, kwargs)
+        with self._lock:
+            self._stats["scheduled"] += 1
+            self._futures.setdefault(scope, set()).add(future)
+        future.add_done_callback(lambda f: self._finish(scope, f))
+        return future
+
+    def _run(self, func, args, kwargs):
+        _prefetch_state.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _prefetch_state.active = False
+
+    def _finish(self, scope, future):
+        self._slots.release()
+        with self._lock:
+            futures = self._futures.get(scope)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._futures[scope]
+            if future.cancelled():
+                self._stats["cancelled"] += 1
+            elif future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    def cancel(self, scope):
+        """Cancel the scope's queued tasks; tasks already running are left to finish"""
+        with self._lock:
+            futures = list(self._futures.get(scope, ()))
+        for future in futures:
+            future.cancel()
+
+    def forget(self, scope):
+        """Cancel the scope's tasks and drop its context"""
+        self.cancel(scope)
+        with self._lock:
+            self._contexts.pop(scope, None)
+
+    def note_warmed(self, key):
+        """Record that a prefetch task stored `key` in the response cache"""
+        with self._lock:
+            self._warmed[key] = True
+            self._warmed.move_to_end(key)
+            while len(self._warmed) > MAX_TRACKED_KEYS:
+                self._warmed.popitem(last=False)
+            self._stats["warmed"] += 1
+
+    def note_access(self, key):
+        """Record a foreground cache hit, counting it if a prefetch warmed the key"""
+        with self._lock:
+            if self._warmed.pop(key, None) is not None:
+                self._stats["hits"] += 1
+
+    def stats(self):
+        """Get task counters and the prefetch hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = sum(len(futures) for futures in self._futures.values())
+        stats["hit_rate"] = stats["hits"] / stats["warmed"] if stats["warmed"] else 0.0
+        return stats
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Get the process-wide prefetcher shared by every TMDbService instance"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
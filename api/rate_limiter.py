@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+from .config import RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `capacity`
+
+    Callers reserve a token and then wait out their reservation, so concurrent
+    callers are queued fairly instead of spinning on the lock.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, capacity=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def reserve(self, tokens=1):
+        """Take tokens from the bucket and get how long the caller must wait before using them"""
+        if not self.enabled:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated_at
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+            # The balance may go negative; that debt is the queue of waiting callers
+            self._tokens -= tokens
+            self._stats["acquired"] += tokens
+            if self._tokens >= 0:
+                return 0.0
+            delay = -self._tokens / self.rate
+            self._stats["throttled"] += 1
+            self._stats["wait_seconds"] += delay
+            return delay
+
+    def acquire(self, tokens=1):
+        """Block the calling thread until tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens=1):
+        """Wait without blocking the event loop until tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self):
+        """Get counters of acquired tokens and of callers that had to wait"""
+        with self._lock:
+            return dict(self._stats)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Get the process-wide token bucket applied to every upstream request"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket()
+    return _rate_limiter
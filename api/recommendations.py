@@ -0,0 +1,300 @@
+"""Local item-to-item movie recommendations from genres, cast/crew overlap and keywords
+
+Each movie is a TF-IDF weighted feature vector: its genres, top billed cast,
+key crew and keywords. The build step finds every movie's nearest neighbors by
+cosine similarity and stores them as fixed-width NumPy arrays that are
+memory-mapped on load, so answering "similar movies" or "recommended for you"
+is a couple of array lookups.
+
+Build it from the movie details in the response cache and the local catalog:
+
+    python -m api.recommendations build
+    python -m api.recommendations similar 550
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .cache import iter_cached_details
+from .config import CATALOG_DB, RECOMMENDATIONS_MODE, RECOMMENDATIONS_DIR, RECOMMENDATIONS_NEIGHBORS
+
+INDEX_VERSION = 1
+
+# Relative weight of each kind of feature, applied on top of its IDF
+FEATURE_WEIGHTS = {"genre": 1.0, "cast": 1.0, "crew": 1.5, "keyword": 1.2}
+CAST_FEATURES = 10
+CREW_JOBS = frozenset({"Director", "Screenplay", "Writer", "Original Music Composer", "Director of Photography"})
+# Features shared by more than this share of movies only add noise to candidate generation
+MAX_FEATURE_SHARE = 0.05
+# Most popular movies per genre, considered as neighbors for movies with little else in common
+GENRE_POOL_SIZE = 200
+
+# Fields kept for each movie, enough to render a card
+DOC_FIELDS = ("id", "title", "release_date", "vote_average", "poster_path", "overview", "popularity")
+
+
+def movie_features(details):
+    """Get the (kind, id) features of a movie details payload"""
+    genres = [genre["id"] for genre in details.get("genres", [])] or details.get("genre_ids", [])
+    features = [("genre", genre_id) for genre_id in genres]
+    credits = details.get("credits") or {}
+    cast = sorted(credits.get("cast", []), key=lambda member: member.get("order", 0))[:CAST_FEATURES]
+    features.extend(("cast", member["id"]) for member in cast)
+    features.extend(("crew", member["id"]) for member in credits.get("crew", []) if member.get("job") in CREW_JOBS)
+    keywords = (details.get("keywords") or {}).get("keywords", [])
+    features.extend(("keyword", keyword["id"]) for keyword in keywords)
+    return list(dict.fromkeys(features))
+
+
+def iter_detailed_movies(catalog_db=CATALOG_DB):
+    """Yield every movie details payload in the response cache and the local catalog"""
+    yield from iter_cached_details()
+    if os.path.exists(catalog_db):
+        from .catalog import MovieCatalog
+
+        yield from MovieCatalog(catalog_db).iter_details()
+
+
+def build_index(movies, directory=RECOMMENDATIONS_DIR, neighbors=RECOMMENDATIONS_NEIGHBORS):
+    """Build neighbor lists from an iterable of movie details payloads and publish them atomically"""
+    # Only the card summary and features of each movie are kept, never whole payloads
+    movies_by_id = {}
+    for movie in movies:
+        if movie.get("id") is None or not movie.get("title"):
+            continue
+        features = movie_features(movie)
+        previous = movies_by_id.get(movie["id"])
+        # Later payloads win unless they lack credits or keywords an earlier one had
+        if previous is None or len(features) >= len(previous[1]):
+            summary = {field: movie[field] for field in DOC_FIELDS if movie.get(field) is not None}
+            movies_by_id[movie["id"]] = (summary, features)
+
+    ordered = sorted(movies_by_id.items())
+    docs = [summary for _, (summary, _) in ordered]
+    doc_features = [features for _, (_, features) in ordered]
+    n_docs = len(docs)
+    ids = np.fromiter((doc["id"] for doc in docs), dtype=np.int32, count=n_docs)
+    popularity = np.fromiter((doc.get("popularity") or 0.0 for doc in docs), dtype=np.float32, count=n_docs)
+
+    document_frequency = {}
+    for features in doc_features:
+        for feature in features:
+            document_frequency[feature] = document_frequency.get(feature, 0) + 1
+
+    def weight(feature):
+        return FEATURE_WEIGHTS[feature[0]] * math.log(1 + n_docs / document_frequency[feature])
+
+    # Genres are few, so they are a dense matrix; everything else is an inverted index
+    genre_ids = sorted({feature[1] for feature in document_frequency if feature[0] == "genre"})
+    genre_column = {genre_id: column for column, genre_id in enumerate(genre_ids)}
+    genre_matrix = np.zeros((n_docs, len(genre_ids)), dtype=np.float32)
+    vectors = []
+    postings = {}
+    max_postings = max(int(n_docs * MAX_FEATURE_SHARE), 50)
+    for doc_index, features in enumerate(doc_features):
+        sparse = {}
+        for feature in features:
+            if feature[0] == "genre":
+                genre_matrix[doc_index, genre_column[feature[1]]] = weight(feature)
+            else:
+                sparse[feature] = weight(feature)
+        norm = math.sqrt(float(genre_matrix[doc_index] @ genre_matrix[doc_index]) + sum(w * w for w in sparse.values()))
+        if norm:
+            genre_matrix[doc_index] /= norm
+            sparse = {feature: w / norm for feature, w in sparse.items()}
+        vectors.append(sparse)
+        for feature, w in sparse.items():
+            if document_frequency[feature] <= max_postings:
+                postings.setdefault(feature, []).append((doc_index, w))
+    postings = {
+        feature: (np.array([d for d, _ in entries], dtype=np.int32), np.array([w for _, w in entries], dtype=np.float32))
+        for feature, entries in postings.items()
+    }
+
+    genre_pools = {}
+    for column in range(len(genre_ids)):
+        members = np.flatnonzero(genre_matrix[:, column])
+        genre_pools[column] = members[np.argsort(-popularity[members], kind="stable")[:GENRE_POOL_SIZE]].astype(np.int32)
+
+    neighbor_index = np.full((n_docs, neighbors), -1, dtype=np.int32)
+    neighbor_score = np.zeros((n_docs, neighbors), dtype=np.float16)
+    # Break ties between equally similar movies in favor of popular ones
+    tie_break = 1e-4 * popularity / (popularity.max() if n_docs and popularity.max() > 0 else 1.0)
+    for doc_index, sparse in enumerate(vectors):
+        shared = [feature for feature in sparse if feature in postings]
+        pools = [genre_pools[column] for column in np.flatnonzero(genre_matrix[doc_index])]
+        if shared:
+            candidates = np.concatenate([postings[feature][0] for feature in shared])
+            weights = np.concatenate([postings[feature][1] * sparse[feature] for feature in shared])
+            candidates, inverse = np.unique(candidates, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        else:
+            candidates, scores = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if pools:
+            extra = np.setdiff1d(np.concatenate(pools), candidates)
+            candidates = np.concatenate([candidates, extra])
+            scores = np.concatenate([scores, np.zeros(len(extra), dtype=np.float32)])
+        keep = candidates != doc_index
+        candidates, scores = candidates[keep], scores[keep]
+        if not len(candidates):
+            continue
+        scores = scores + genre_matrix[candidates] @ genre_matrix[doc_index] + tie_break[candidates]
+        top = np.argpartition(-scores, min(neighbors, len(scores)) - 1)[:neighbors]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        neighbor_index[doc_index, :len(top)] = candidates[top]
+        neighbor_score[doc_index, :len(top)] = scores[top]
+
+    encoded_docs = [json.dumps(doc, separators=(",", ":")).encode("utf-8") for doc in docs]
+    doc_offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in encoded_docs], out=doc_offsets[1:])
+
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {
+        "ids": ids,
+        "neighbor_index": neighbor_index,
+        "neighbor_score": neighbor_score,
+        "doc_offsets": doc_offsets,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "docs.bin"), "wb") as f:
+        for encoded in encoded_docs:
+            f.write(encoded)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"version": INDEX_VERSION, "documents": n_docs, "neighbors": neighbors, "built_at": time.time()}, f)
+
+    # Swap the new index into place
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return n_docs
+
+
+class MovieRecommender:
+    """Read-only, memory-mapped neighbor lists built by `build_index`"""
+
+    def __init__(self, directory=RECOMMENDATIONS_DIR):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported recommendations version: {self.meta.get('version')}")
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self.ids = load("ids")
+        self.neighbor_index = load("neighbor_index")
+        self.neighbor_score = load("neighbor_score")
+        self.doc_offsets = load("doc_offsets")
+        self.docs = np.memmap(os.path.join(directory, "docs.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(directory, "docs.bin")) else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _doc_index(self, movie_id):
+        position = int(np.searchsorted(self.ids, movie_id))
+        if position < len(self.ids) and self.ids[position] == movie_id:
+            return position
+        return None
+
+    def document(self, doc_index):
+        """Get the stored movie summary for a document"""
+        start, end = self.doc_offsets[doc_index], self.doc_offsets[doc_index + 1]
+        return json.loads(self.docs[start:end].tobytes())
+
+    def similar(self, movie_id, count=RECOMMENDATIONS_NEIGHBORS):
+        """Get summaries of the movies most similar to one, or None if it is not indexed"""
+        doc_index = self._doc_index(int(movie_id))
+        if doc_index is None:
+            return None
+        neighbors = self.neighbor_index[doc_index]
+        return [self.document(int(i)) for i in neighbors[neighbors >= 0][:count]]
+
+    def recommend(self, movie_ids, count=RECOMMENDATIONS_NEIGHBORS):
+        """Get summaries of the movies closest to a set of movies overall, excluding the set itself
+
+        Returns None if none of the movies are indexed.
+        """
+        indexed = [i for i in (self._doc_index(int(movie_id)) for movie_id in movie_ids) if i is not None]
+        if not indexed:
+            return None
+        neighbors = np.asarray(self.neighbor_index[indexed]).ravel()
+        scores = np.asarray(self.neighbor_score[indexed], dtype=np.float32).ravel()
+        keep = (neighbors >= 0) & ~np.isin(neighbors, indexed)
+        neighbors, inverse = np.unique(neighbors[keep], return_inverse=True)
+        # Summing favors movies that are close to several of the given movies
+        totals = np.bincount(inverse, weights=scores[keep])
+        best = np.argsort(-totals, kind="stable")[:count]
+        return [self.document(int(neighbors[i])) for i in best]
+
+
+def related_page(movies):
+    """Wrap movie summaries in the shape of a TMDb results page"""
+    return {"page": 1, "results": movies, "total_pages": 1, "total_results": len(movies)}
+
+
+_recommender = None
+_recommender_checked = False
+_recommender_lock = threading.Lock()
+
+
+def get_recommender():
+    """Get the process-wide recommender, or None if it is disabled or not built"""
+    global _recommender, _recommender_checked
+    if not _recommender_checked:
+        with _recommender_lock:
+            if not _recommender_checked:
+                if RECOMMENDATIONS_MODE != "off" and os.path.exists(os.path.join(RECOMMENDATIONS_DIR, "meta.json")):
+                    try:
+                        _recommender = MovieRecommender(RECOMMENDATIONS_DIR)
+                    except (OSError, ValueError) as e:
+                        print(f"Error loading recommendations from {RECOMMENDATIONS_DIR}: {e}")
+                _recommender_checked = True
+    return _recommender
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the local movie recommendations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="Build neighbor lists from cached and catalog movie details")
+    build.add_argument("--output", default=RECOMMENDATIONS_DIR, help="Index directory")
+    build.add_argument("--neighbors", type=int, default=RECOMMENDATIONS_NEIGHBORS)
+
+    similar = subcommands.add_parser("similar", help="Show the movies most similar to some movies")
+    similar.add_argument("movie_ids", type=int, nargs="+")
+    similar.add_argument("--index", default=RECOMMENDATIONS_DIR, help="Index directory")
+    similar.add_argument("--count", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        count = build_index(iter_detailed_movies(), args.output, args.neighbors)
+        print(f"Built neighbors for {count} movies into {args.output} in {time.perf_counter() - started:.1f}s")
+    else:
+        recommender = MovieRecommender(args.index)
+        started = time.perf_counter()
+        if len(args.movie_ids) == 1:
+            results = recommender.similar(args.movie_ids[0], args.count)
+        else:
+            results = recommender.recommend(args.movie_ids, args.count)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for movie in results or []:
+            print(f"{movie['id']:>8}  {movie.get('title')}  ({(movie.get('release_date') or '')[:4]})")
+        print(f"{len(results or [])} movies in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
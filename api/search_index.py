@@ -0,0 +1,436 @@
+"""Offline movie title search: BM25 ranking, trigram typo tolerance and prefix search
+
+The index is a directory of NumPy arrays that are memory-mapped on load, so opening
+it is cheap and worker processes share its pages through the OS page cache.
+
+Build it from the response cache or from a TMDb daily export:
+
+    python -m api.search_index build
+    python -m api.search_index build --dump movie_ids_05_15_2024.json.gz
+    python -m api.search_index query "godfathr"
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+from .cache import iter_cached_movies
+from .config import SEARCH_INDEX_MODE, SEARCH_INDEX_DIR
+
+INDEX_VERSION = 1
+TERM_WIDTH = 24
+TITLE_WIDTH = 64
+RESULTS_PER_PAGE = 20
+MAX_RESULTS = 10000
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Fuzzy matching: minimum trigram Jaccard similarity and number of alternatives per token
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_MAX_TERMS = 3
+# Weight given to terms reached through prefix expansion of the last query token
+PREFIX_WEIGHT = 0.8
+PREFIX_MAX_TERMS = 32
+
+# Fields kept for each movie, matching the shape of TMDb search results
+DOC_FIELDS = (
+    "id", "title", "original_title", "original_language", "overview", "release_date",
+    "poster_path", "backdrop_path", "genre_ids", "popularity", "vote_average", "vote_count", "adult"
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Lowercase and strip accents so accented titles match plain-ASCII queries"""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def trigram_codes(term):
+    """Get the hashed character trigrams of a term, padded with boundary markers"""
+    padded = f"^{term}$"
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+def _encode(text, width):
+    """Encode text as UTF-8 truncated to a fixed width without splitting characters"""
+    return text.encode("utf-8")[:width].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _doc_summary(movie):
+    return {field: movie[field] for field in DOC_FIELDS if movie.get(field) is not None}
+
+
+def build_index(movies, directory=SEARCH_INDEX_DIR):
+    """Build an index from an iterable of TMDb movie dicts and publish it atomically"""
+    docs = {}
+    for movie in movies:
+        if movie.get("id") is None or not (movie.get("title") or movie.get("original_title")):
+            continue
+        summary = _doc_summary(movie)
+        summary.setdefault("title", summary.get("original_title"))
+        # Later records win, but keep fields the newer record lacks
+        docs[summary["id"]] = {**docs.get(summary["id"], {}), **summary}
+
+    docs = list(docs.values())
+    n_docs = len(docs)
+
+    ids = np.fromiter((doc["id"] for doc in docs), dtype=np.int32, count=n_docs)
+    popularity = np.fromiter((doc.get("popularity") or 0.0 for doc in docs), dtype=np.float32, count=n_docs)
+    adult = np.fromiter((bool(doc.get("adult")) for doc in docs), dtype=np.uint8, count=n_docs)
+    lengths = np.zeros(n_docs, dtype=np.uint16)
+
+    # Inverted index over title tokens
+    postings = {}
+    normalized_titles = []
+    for doc_index, doc in enumerate(docs):
+        title = doc["title"]
+        tokens = tokenize(title)
+        original = doc.get("original_title")
+        if original and original != title:
+            tokens += tokenize(original)
+        lengths[doc_index] = min(len(tokens), 65535)
+        counts = {}
+        for token in tokens:
+            token = _encode(token, TERM_WIDTH).decode("utf-8")
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            postings.setdefault(token, []).append((doc_index, min(tf, 255)))
+        normalized_titles.append(_encode(normalize(title), TITLE_WIDTH))
+
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    for i, term in enumerate(terms):
+        term_offsets[i + 1] = term_offsets[i] + len(postings[term])
+    posting_docs = np.empty(term_offsets[-1], dtype=np.int32)
+    posting_tf = np.empty(term_offsets[-1], dtype=np.uint8)
+    for i, term in enumerate(terms):
+        entries = postings[term]
+        posting_docs[term_offsets[i]:term_offsets[i + 1]] = [doc_index for doc_index, _ in entries]
+        posting_tf[term_offsets[i]:term_offsets[i + 1]] = [tf for _, tf in entries]
+
+    # Trigram index over the vocabulary, for typo-tolerant term lookup
+    trigram_pairs = []
+    trigram_counts = np.zeros(len(terms), dtype=np.uint8)
+    for term_id, term in enumerate(terms):
+        codes = trigram_codes(term)
+        trigram_counts[term_id] = min(len(codes), 255)
+        trigram_pairs.extend((code, term_id) for code in codes)
+    trigram_pairs = np.array(trigram_pairs, dtype=np.int64).reshape(-1, 2)
+    trigram_pairs = trigram_pairs[np.lexsort((trigram_pairs[:, 1], trigram_pairs[:, 0]))]
+    trigram_keys, trigram_starts = np.unique(trigram_pairs[:, 0], return_index=True)
+    trigram_offsets = np.append(trigram_starts, len(trigram_pairs)).astype(np.int64)
+
+    # Sorted titles for prefix search
+    title_array = np.array(normalized_titles, dtype=f"S{TITLE_WIDTH}")
+    title_order = np.argsort(title_array, kind="stable").astype(np.int32)
+
+    # Stored documents as concatenated JSON with offsets
+    encoded_docs = [json.dumps(doc, separators=(",", ":")).encode("utf-8") for doc in docs]
+    doc_offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in encoded_docs], out=doc_offsets[1:])
+
+    tmp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {
+        "ids": ids,
+        "popularity": popularity,
+        "adult": adult,
+        "lengths": lengths,
+        "terms": np.array([t.encode("utf-8") for t in terms], dtype=f"S{TERM_WIDTH}"),
+        "term_offsets": term_offsets,
+        "posting_docs": posting_docs,
+        "posting_tf": posting_tf,
+        "trigram_keys": trigram_keys.astype(np.uint32),
+        "trigram_offsets": trigram_offsets,
+        "trigram_terms": trigram_pairs[:, 1].astype(np.int32),
+        "trigram_counts": trigram_counts,
+        "titles": title_array[title_order],
+        "title_order": title_order,
+        "doc_offsets": doc_offsets,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "docs.bin"), "wb") as f:
+        for encoded in encoded_docs:
+            f.write(encoded)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "documents": n_docs,
+            "terms": len(terms),
+            "average_length": float(lengths.mean()) if n_docs else 0.0,
+            "built_at": time.time(),
+        }, f)
+
+    # Swap the new index into place
+    old_dir = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return n_docs
+
+
+class MovieSearchIndex:
+    """Read-only, memory-mapped search index built by `build_index`"""
+
+    def __init__(self, directory=SEARCH_INDEX_DIR):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {self.meta.get('version')}")
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        self.ids = load("ids")
+        self.popularity = load("popularity")
+        self.adult = load("adult")
+        self.lengths = load("lengths")
+        self.terms = load("terms")
+        self.term_offsets = load("term_offsets")
+        self.posting_docs = load("posting_docs")
+        self.posting_tf = load("posting_tf")
+        self.trigram_keys = load("trigram_keys")
+        self.trigram_offsets = load("trigram_offsets")
+        self.trigram_terms = load("trigram_terms")
+        self.trigram_counts = load("trigram_counts")
+        self.titles = load("titles")
+        self.title_order = load("title_order")
+        self.doc_offsets = load("doc_offsets")
+        self.docs = np.memmap(os.path.join(directory, "docs.bin"), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(directory, "docs.bin")) else np.zeros(0, dtype=np.uint8)
+        self.n_docs = len(self.ids)
+        self.average_length = self.meta["average_length"] or 1.0
+
+    def __len__(self):
+        return self.n_docs
+
+    def document(self, doc_index):
+        """Get the stored movie summary for a document"""
+        start, end = self.doc_offsets[doc_index], self.doc_offsets[doc_index + 1]
+        return json.loads(self.docs[start:end].tobytes())
+
+    def _term_id(self, term):
+        encoded = _encode(term, TERM_WIDTH)
+        position = int(np.searchsorted(self.terms, encoded))
+        if position < len(self.terms) and self.terms[position] == encoded:
+            return position
+        return None
+
+    def _document_frequency(self, term_id):
+        return int(self.term_offsets[term_id + 1] - self.term_offsets[term_id])
+
+    def _fuzzy_terms(self, token):
+        """Find vocabulary terms that share enough trigrams with a (misspelled) token"""
+        codes = np.fromiter(trigram_codes(token), dtype=np.uint32)
+        # Trigrams the vocabulary lacks still make the token less like every term, so count them all
+        token_count = min(len(codes), 255)
+        positions = np.searchsorted(self.trigram_keys, codes)
+        found = positions < len(self.trigram_keys)
+        positions, codes = positions[found], codes[found]
+        positions = positions[self.trigram_keys[positions] == codes]
+        if len(positions) == 0:
+            return []
+
+        candidates = np.concatenate([
+            self.trigram_terms[self.trigram_offsets[p]:self.trigram_offsets[p + 1]] for p in positions
+        ])
+        term_ids, shared = np.unique(candidates, return_counts=True)
+        similarity = shared / (token_count + self.trigram_counts[term_ids].astype(np.float32) - shared)
+        keep = similarity >= FUZZY_MIN_SIMILARITY
+        term_ids, similarity = term_ids[keep], similarity[keep]
+        best = np.argsort(-similarity, kind="stable")[:FUZZY_MAX_TERMS]
+        return [(int(term_ids[i]), float(similarity[i])) for i in best]
+
+    def _prefix_terms(self, token):
+        """Find the most frequent vocabulary terms starting with a token"""
+        encoded = _encode(token, TERM_WIDTH - 1)
+        low = int(np.searchsorted(self.terms, encoded, side="left"))
+        high = int(np.searchsorted(self.terms, encoded + b"\xff", side="left"))
+        if high - low <= PREFIX_MAX_TERMS:
+            return list(range(low, high))
+        frequencies = np.diff(self.term_offsets[low:high + 1])
+        top = np.argpartition(-frequencies, PREFIX_MAX_TERMS)[:PREFIX_MAX_TERMS]
+        return [low + int(i) for i in top]
+
+    def _alternatives(self, token, is_last):
+        """Get (term_id, weight) pairs a query token can match"""
+        alternatives = {}
+        term_id = self._term_id(token)
+        if term_id is not None:
+            alternatives[term_id] = 1.0
+        if is_last:
+            for prefix_term in self._prefix_terms(token):
+                alternatives.setdefault(prefix_term, PREFIX_WEIGHT)
+        if not alternatives:
+            for fuzzy_term, similarity in self._fuzzy_terms(token):
+                alternatives[fuzzy_term] = similarity
+        return alternatives
+
+    def search(self, query, limit=RESULTS_PER_PAGE, offset=0, include_adult=False, prefix=True):
+        """Rank documents matching every query token, returning (total, [doc indexes])
+
+        The last token is also matched as a prefix so partial input still finds titles.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.n_docs:
+            return 0, []
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        matched = None
+        for position, token in enumerate(tokens):
+            alternatives = self._alternatives(token, prefix and position == len(tokens) - 1)
+            if not alternatives:
+                return 0, []
+            token_mask = np.zeros(self.n_docs, dtype=bool)
+            for term_id, weight in alternatives.items():
+                start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+                docs = np.asarray(self.posting_docs[start:end])
+                tf = np.asarray(self.posting_tf[start:end], dtype=np.float32)
+                df = end - start
+                idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[docs] / self.average_length)
+                scores[docs] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                token_mask[docs] = True
+            matched = token_mask if matched is None else matched & token_mask
+
+        candidates = np.flatnonzero(matched)
+        if not include_adult:
+            candidates = candidates[self.adult[candidates] == 0]
+        total = min(len(candidates), MAX_RESULTS)
+        if total == 0:
+            return 0, []
+
+        # Popularity breaks ties between equally relevant titles
+        ranked = scores[candidates] + 0.1 * np.log1p(self.popularity[candidates])
+        wanted = min(offset + limit, total)
+        if wanted < len(candidates):
+            top = np.argpartition(-ranked, wanted - 1)[:wanted]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-ranked[top], kind="stable")]
+        return total, [int(candidates[i]) for i in top[offset:offset + limit]]
+
+    def prefix_search(self, prefix, limit=10, include_adult=False):
+        """Get the most popular titles starting with `prefix`, for search-as-you-type"""
+        encoded = _encode(normalize(prefix), TITLE_WIDTH - 1)
+        if not encoded:
+            return []
+        low = int(np.searchsorted(self.titles, encoded, side="left"))
+        high = int(np.searchsorted(self.titles, encoded + b"\xff", side="left"))
+        doc_indexes = np.asarray(self.title_order[low:high])
+        if not include_adult:
+            doc_indexes = doc_indexes[self.adult[doc_indexes] == 0]
+        if len(doc_indexes) > limit:
+            popularity = self.popularity[doc_indexes]
+            doc_indexes = doc_indexes[np.argpartition(-popularity, limit - 1)[:limit]]
+        doc_indexes = doc_indexes[np.argsort(-self.popularity[doc_indexes], kind="stable")]
+        return [self.document(int(i)) for i in doc_indexes]
+
+    def search_page(self, query, page=1, include_adult=False):
+        """Answer a search in the shape of TMDb's search/movie response, or None on a miss"""
+        page = max(int(page), 1)
+        total, doc_indexes = self.search(
+            query,
+            limit=RESULTS_PER_PAGE,
+            offset=(page - 1) * RESULTS_PER_PAGE,
+            include_adult=include_adult
+        )
+        if total == 0:
+            return None
+        return {
+            "page": page,
+            "results": [self.document(i) for i in doc_indexes],
+            "total_pages": math.ceil(total / RESULTS_PER_PAGE),
+            "total_results": total,
+        }
+
+
+def iter_dump_movies(path):
+    """Yield movies from a TMDb daily ID export (gzipped JSON lines)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault("title", record.get("original_title"))
+            yield record
+
+
+_search_index = None
+_search_index_checked = False
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Get the process-wide search index, or None if it is disabled or not built"""
+    global _search_index, _search_index_checked
+    if not _search_index_checked:
+        with _search_index_lock:
+            if not _search_index_checked:
+                if SEARCH_INDEX_MODE != "off" and os.path.exists(os.path.join(SEARCH_INDEX_DIR, "meta.json")):
+                    try:
+                        _search_index = MovieSearchIndex(SEARCH_INDEX_DIR)
+                    except (OSError, ValueError) as e:
+                        print(f"Error loading search index from {SEARCH_INDEX_DIR}: {e}")
+                _search_index_checked = True
+    return _search_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline movie search index")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="Build the index")
+    build.add_argument("--dump", help="TMDb daily export (.json.gz) to index instead of cached responses")
+    build.add_argument("--output", default=SEARCH_INDEX_DIR, help="Index directory")
+
+    query = subcommands.add_parser("query", help="Search the index")
+    query.add_argument("text")
+    query.add_argument("--index", default=SEARCH_INDEX_DIR, help="Index directory")
+    query.add_argument("--prefix", action="store_true", help="Run a title prefix search")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        movies = iter_dump_movies(args.dump) if args.dump else iter_cached_movies()
+        count = build_index(movies, args.output)
+        print(f"Indexed {count} movies into {args.output} in {time.perf_counter() - started:.1f}s")
+    else:
+        index = MovieSearchIndex(args.index)
+        started = time.perf_counter()
+        if args.prefix:
+            results = index.prefix_search(args.text)
+        else:
+            response = index.search_page(args.text)
+            results = response["results"] if response else []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for movie in results:
+            print(f"{movie['id']:>8}  {movie.get('title')}  ({(movie.get('release_date') or '')[:4]})")
+        print(f"{len(results)} results in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
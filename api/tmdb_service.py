@@ -1,31 +1,318 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
 import requests
-from .config import TMDB_API_KEY, TMDB_BASE_URL, TMDB_IMAGE_BASE_URL, POSTER_SIZE, BACKDROP_SIZE, DEFAULT_LANGUAGE
+from .config import (
+    TMDB_API_KEY, TMDB_BASE_URL, TMDB_IMAGE_BASE_URL, POSTER_SIZE, BACKDROP_SIZE, DEFAULT_LANGUAGE, CACHE_ENABLED,
+    POSTER_SIZES, PROFILE_SIZES, BACKDROP_SIZES, HTTP_POOL_SIZE, HTTP_MAX_RETRIES, REQUEST_DEADLINE_SECONDS,
+    LOCAL_DISCOVER_MODE
+)
+from .cache import CARD_SECTIONS, DETAIL_SECTIONS, cache_key, endpoint_family, get_response_cache, mark_stale, movies_in_response
+from .circuit_breaker import CLOSED, get_circuit_breaker
+from .http_client import get_with_retry
+from .hydration import get_hydrator
+from .image_cache import get_image_cache, pick_size
+from .prefetch import carry_prefetch_state, get_prefetcher, is_prefetching
+from .rate_limiter import get_rate_limiter
+from .single_flight import SingleFlight
+from .trending_snapshot import snapshot_page, snapshot_poster
+from .metrics import registry, start_exporters, REQUESTS, REQUEST_LATENCY, UPSTREAM_LATENCY, UPSTREAM_ERRORS
+
+# Background refreshes of stale cache entries, shared by all instances
+_revalidate_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tmdb-revalidate")
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+# Identical upstream requests in flight at the same time share a single fetch
+_single_flight = SingleFlight()
+
+# Foreground fetches run here so a session can stop waiting on a slow upstream without cancelling the fetch
+_fetch_executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="tmdb-fetch")
+# Keys of flights that outlived the deadline and have been counted against the breaker
+_overdue = set()
+_overdue_lock = threading.Lock()
+
+# The movie table (and numpy) loads in the background the first time discover is used; until then discover goes upstream
+_movie_table_loaded = threading.Event()
+_movie_table_loading = False
+_movie_table_loading_lock = threading.Lock()
+
+# Detail sections fetched alongside, or after, a movie's basic details
+_section_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tmdb-sections")
+
+
+def _request_stats():
+    flights = _single_flight.stats()
+    limiter = get_rate_limiter().stats()
+    circuits = get_circuit_breaker().stats()
+    return {
+        "upstream_requests": flights["upstream"],
+        "coalesced_requests": flights["coalesced"],
+        "in_flight_requests": _single_flight.in_flight(),
+        "rate_limited_requests": limiter["throttled"],
+        "rate_limit_wait_seconds": limiter["wait_seconds"],
+        "open_circuits": sorted(family for family, circuit in circuits.items() if circuit["state"] != CLOSED),
+    }
+
+
+def _collect_service_metrics():
+    """Export the counters kept by the shared cache, request, prefetch and image components"""
+    counters = _request_stats()
+    families = [
+        ("tmdb_upstream_requests", "counter", "Upstream fetches after coalescing identical requests",
+         {(): counters["upstream_requests"]}, ()),
+        ("tmdb_coalesced_requests", "counter", "Requests that shared an identical in-flight fetch",
+         {(): counters["coalesced_requests"]}, ()),
+        ("tmdb_in_flight_requests", "gauge", "Distinct upstream fetches currently running",
+         {(): counters["in_flight_requests"]}, ()),
+        ("tmdb_rate_limited_requests", "counter", "Requests that waited on the client-side rate limiter",
+         {(): counters["rate_limited_requests"]}, ()),
+        ("tmdb_rate_limit_wait_seconds", "counter", "Total time spent waiting on the rate limiter",
+         {(): counters["rate_limit_wait_seconds"]}, ()),
+        ("tmdb_circuit_open", "gauge", "Whether requests for an endpoint family are held back from upstream", {
+            (family,): int(circuit["state"] != CLOSED) for family, circuit in get_circuit_breaker().stats().items()
+        }, ("family",)),
+        ("tmdb_circuit_trips", "counter", "Times the circuit for an endpoint family opened", {
+            (family,): circuit["trips"] for family, circuit in get_circuit_breaker().stats().items()
+        }, ("family",)),
+    ]
+    
+    if CACHE_ENABLED:
+        cache = get_response_cache().stats()
+        families.append(("tmdb_cache_lookups", "counter", "Response cache lookups by result", {
+            (result,): cache[result] for result in ("memory_hits", "disk_hits", "stale_hits", "misses")
+        }, ("result",)))
+        families.append(("tmdb_cache_hit_ratio", "gauge", "Share of response cache lookups answered from the cache",
+                         {(): cache["hit_ratio"]}, ()))
+    
+    prefetch = get_prefetcher().stats()
+    families.append(("tmdb_prefetch_tasks", "counter", "Prefetch tasks by outcome", {
+        (outcome,): prefetch[outcome] for outcome in ("scheduled", "skipped", "cancelled", "completed", "failed")
+    }, ("outcome",)))
+    families.append(("tmdb_prefetch_hit_rate", "gauge", "Share of prefetched responses later requested by a user",
+                     {(): prefetch["hit_rate"]}, ()))
+    
+    images = get_image_cache().stats()
+    families.append(("tmdb_image_cache_lookups", "counter", "Image cache lookups by result", {
+        (result,): images[result] for result in ("hits", "misses", "revalidated")
+    }, ("result",)))
+    families.append(("tmdb_image_cache_bytes", "gauge", "Bytes of images stored on disk", {(): images["bytes"]}, ()))
+    return families
+
+
+registry.add_collector(_collect_service_metrics)
+
+
+def _load_movie_table():
+    try:
+        from .movie_table import get_movie_table
+        
+        get_movie_table()
+    except Exception as e:
+        print(f"Error loading the movie table: {e}")
+        return
+    _movie_table_loaded.set()
+
+
+def _loaded_movie_table():
+    """Get the movie_table module once its table is built, or None, starting the build the first time"""
+    global _movie_table_loading
+    if LOCAL_DISCOVER_MODE == "off":
+        return None
+    if _movie_table_loaded.is_set():
+        from . import movie_table
+        
+        return movie_table
+    with _movie_table_loading_lock:
+        if _movie_table_loading:
+            return None
+        _movie_table_loading = True
+    # Seeding scans every cached response, which a session thread must not wait on
+    threading.Thread(target=_load_movie_table, name="tmdb-movie-table", daemon=True).start()
+    return None
+
 
 class TMDbService:
     def __init__(self):
         self.api_key = TMDB_API_KEY
         self.base_url = TMDB_BASE_URL
         self.image_base_url = TMDB_IMAGE_BASE_URL
+        self.cache = get_response_cache() if CACHE_ENABLED else None
+        self.images = get_image_cache()
+        self.prefetcher = get_prefetcher()
+        self.breaker = get_circuit_breaker()
+        start_exporters()
+    
+    def with_api_key(self, api_key):
+        """Get a service that makes its requests with the given API key, sharing this one's caches and pool"""
+        service = copy.copy(self)
+        service.api_key = api_key
+        return service
         
     def _make_request(self, endpoint, params=None):
-        """Make a request to the TMDb API"""
-        if params is None:
-            params = {}
+        """Make a request to the TMDb API, served from the shared response cache when possible"""
+        family = endpoint_family(endpoint)
+        with REQUEST_LATENCY.time(family=family):
+            data, source = self._cached_request(endpoint, params)
+        REQUESTS.inc(family=family, source=source)
+        return data
+    
+    def _cached_request(self, endpoint, params):
+        """Get (response, source), where source records whether the cache answered the request"""
+        # Copy so the caller's dict is not mutated with the API key
+        params = dict(params) if params else {}
+        
+        key = cache_key(endpoint, params)
+        family = endpoint_family(endpoint)
+        if self.cache is None:
+            if not self.breaker.allow(family):
+                return None, "offline"
+            return self._await_fetch(key, endpoint, params, lambda: self._fetch(endpoint, params)), "uncached"
+        
+        entry = self.cache.get(key)
+        
+        if entry is not None:
+            if entry.is_servable() and not is_prefetching():
+                self.prefetcher.note_access(key)
+            if entry.is_fresh():
+                return entry.value, "fresh"
+            if entry.is_servable():
+                # Serve the stale copy now and refresh it for the next caller
+                self._revalidate(key, endpoint, params)
+                return entry.value, "stale"
+        
+        # Upstream is down: answer at once with the last known good response, if there is one
+        if not self.breaker.allow(family):
+            return (mark_stale(entry) if entry is not None else None), "offline"
+        
+        data = self._await_fetch(key, endpoint, params, lambda: self._fetch_and_store(key, endpoint, params))
+        if data is None and entry is not None:
+            # The fetch failed or outlived the deadline; it keeps going and fills the cache if it succeeds
+            return mark_stale(entry), "offline"
+        return data, "miss"
+    
+    def _await_fetch(self, key, endpoint, params, fetch):
+        """Run a coalesced fetch, giving up waiting (but not the fetch) after the request deadline
+        
+        A fetch that outlives the deadline counts as an upstream failure straight away, so a hung
+        upstream opens the circuit without waiting for the fetch's retries to give up. If it then
+        fails as well, that is the same failure and is not counted again.
+        """
+        if REQUEST_DEADLINE_SECONDS <= 0:
+            return _single_flight.do(key, fetch)
+        
+        future = _fetch_executor.submit(_single_flight.do, key, carry_prefetch_state(fetch))
+        try:
+            return future.result(timeout=REQUEST_DEADLINE_SECONDS)
+        except FutureTimeoutError:
+            if future.done():
+                # Finished just as the deadline passed; the fetch has counted its own outcome
+                return future.result()
+            # Callers waiting on the same flight count it once
+            with _overdue_lock:
+                first = key not in _overdue
+                _overdue.add(key)
+            if first:
+                future.add_done_callback(lambda _: self._clear_overdue(key))
+                self.breaker.record_failure(endpoint_family(endpoint), probe=lambda: self._probe(endpoint, params))
+            return None
+    
+    @staticmethod
+    def _clear_overdue(key):
+        with _overdue_lock:
+            _overdue.discard(key)
+    
+    @staticmethod
+    def _is_overdue(key):
+        with _overdue_lock:
+            return key in _overdue
+    
+    def _fetch_and_store(self, key, endpoint, params):
+        """Fetch a response from the TMDb API and store it in the cache"""
+        # A flight for this key may have completed between our cache miss and now
+        entry = self.cache.peek(key)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+        
+        data = self._fetch(endpoint, params)
+        if data is not None:
+            self.cache.set(key, endpoint, data)
+            # Until the movie table has loaded there is nothing to feed
+            movie_table = _loaded_movie_table() if _movie_table_loaded.is_set() else None
+            if movie_table is not None:
+                movie_table.feed_movie_table(movies_in_response(endpoint, data))
+            if is_prefetching():
+                self.prefetcher.note_warmed(key)
+        return data
+    
+    def _revalidate(self, key, endpoint, params):
+        """Refresh a stale cache entry in the background"""
+        if not self.breaker.allow(endpoint_family(endpoint)):
+            # The breaker's own trial requests find out when upstream is back
+            return
+        
+        with _revalidating_lock:
+            if key in _revalidating:
+                return
+            _revalidating.add(key)
         
-        params["api_key"] = self.api_key
+        def refresh():
+            try:
+                _single_flight.do(key, lambda: self._fetch_and_store(key, endpoint, params))
+            finally:
+                with _revalidating_lock:
+                    _revalidating.discard(key)
+        
+        _revalidate_executor.submit(refresh)
+    
+    def _fetch(self, endpoint, params, max_retries=HTTP_MAX_RETRIES):
+        """Fetch a response from the TMDb API, bypassing the cache"""
+        request_params = dict(params)
+        request_params["api_key"] = self.api_key
         
         url = f"{self.base_url}/{endpoint}"
+        family = endpoint_family(endpoint)
         
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            response = requests.get(url, params=params)
+            response = get_with_retry(url, params=request_params, max_retries=max_retries)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            outcome = "ok"
+            self.breaker.record_success(family)
+            return data
         except requests.exceptions.RequestException as e:
             print(f"Error making request to {url}: {e}")
+            status = getattr(e.response, "status_code", None)
+            UPSTREAM_ERRORS.inc(family=family, reason=status or type(e).__name__)
+            if status is None or status >= 500 or status == 429:
+                # Connection errors, timeouts, rate limiting and server errors mean upstream is unwell;
+                # a request that ran past the deadline was counted when it did
+                if not self._is_overdue(cache_key(endpoint, params)):
+                    self.breaker.record_failure(family, probe=lambda: self._probe(endpoint, params))
+            else:
+                self.breaker.record_success(family)
             return None
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, family=family, outcome=outcome)
+    
+    def _probe(self, endpoint, params):
+        """Send a single trial request for a family whose circuit is half-open, caching what it gets"""
+        data = self._fetch(endpoint, params, max_retries=0)
+        if data is not None and self.cache is not None:
+            self.cache.set(cache_key(endpoint, params), endpoint, data)
     
-    def get_trending_movies(self, time_window="week", page=1):
-        """Get trending movies for the day or week"""
+    def get_trending_movies(self, time_window="week", page=1, from_snapshot=True):
+        """Get trending movies for the day or week, from the trending snapshot when it holds the page"""
+        if from_snapshot:
+            data = snapshot_page(time_window, page)
+            if data is not None:
+                REQUESTS.inc(family="trending", source="snapshot")
+                return data
+        
         endpoint = f"trending/movie/{time_window}"
         params = {
             "language": DEFAULT_LANGUAGE,
@@ -34,7 +321,15 @@ class TMDbService:
         return self._make_request(endpoint, params)
     
     def search_movies(self, query, page=1, include_adult=False):
-        """Search for movies by title"""
+        """Search for movies by title, answering from the offline index when it has matches"""
+        from .search_index import get_search_index
+        
+        search_index = get_search_index()
+        if search_index is not None:
+            results = search_index.search_page(query, page, include_adult)
+            if results is not None:
+                return results
+        
         endpoint = "search/movie"
         params = {
             "query": query,
@@ -44,15 +339,111 @@ class TMDbService:
         }
         return self._make_request(endpoint, params)
     
-    def get_movie_details(self, movie_id):
-        """Get detailed information about a movie"""
+    def get_movie_details(self, movie_id, sections=DETAIL_SECTIONS, cached=True):
+        """Get a movie's details with the given sections, from the local catalog when it holds the movie
+
+        Each section is requested and cached on its own, concurrently with the basic details,
+        so views that need fewer sections never pay for the rest. With cached=False the catalog
+        and response cache are bypassed and everything comes in one request, as bulk ingestion does.
+        """
+        sections = tuple(sections or ())
         endpoint = f"movie/{movie_id}"
+        params = {
+            "language": DEFAULT_LANGUAGE
+        }
+        if not cached:
+            if sections:
+                params["append_to_response"] = ",".join(sections)
+            return self._fetch(endpoint, params)
+        
+        data = self._catalog_details(movie_id)
+        if data is not None:
+            return data
+        
+        futures = self.fetch_movie_sections(movie_id, sections)
+        data = self._make_request(endpoint, params)
+        if data is None:
+            return None
+        # Cached responses are shared and read-only, so merge into a new dict
+        data = dict(data)
+        for section, future in futures.items():
+            section_data = future.result()
+            if section_data is not None:
+                data[section] = section_data
+        return data
+    
+    def get_movie_section(self, movie_id, section):
+        """Get one detail section of a movie ("credits", "videos" or "keywords")"""
+        data = self._catalog_details(movie_id)
+        if data is not None and section in data:
+            return data[section]
+        
+        endpoint = f"movie/{movie_id}/{section}"
+        params = {
+            "language": DEFAULT_LANGUAGE
+        }
+        return self._make_request(endpoint, params)
+    
+    def fetch_movie_sections(self, movie_id, sections=DETAIL_SECTIONS):
+        """Start fetching a movie's detail sections in the background, returning {section: Future}"""
+        fetch = carry_prefetch_state(self.get_movie_section)
+        return {section: _section_executor.submit(fetch, movie_id, section) for section in sections}
+    
+    def hydrate_movies(self, movie_ids, sections=CARD_SECTIONS):
+        """Start fetching details for a page of results on the bounded hydration pool, returning {movie_id: Future}"""
+        return get_hydrator().submit(self.get_movie_details, movie_ids, sections)
+    
+    def _catalog_details(self, movie_id):
+        from .catalog import get_catalog
+        
+        catalog = get_catalog()
+        return catalog.get(movie_id) if catalog is not None else None
+    
+    def get_similar_movies(self, movie_id):
+        """Get movies similar to one, from the local recommendations when they know the movie"""
+        from .recommendations import get_recommender, related_page
+        
+        recommender = get_recommender()
+        if recommender is not None:
+            similar = recommender.similar(movie_id)
+            if similar is not None:
+                return related_page(similar)
+        
+        endpoint = f"movie/{movie_id}/similar"
         params = {
             "language": DEFAULT_LANGUAGE,
-            "append_to_response": "credits,videos,recommendations,similar"
+            "page": 1
         }
         return self._make_request(endpoint, params)
     
+    def get_recommendations_for(self, movie_ids):
+        """Get movies recommended for someone who likes the given movies, or None without local recommendations"""
+        from .recommendations import get_recommender, related_page
+        
+        recommender = get_recommender()
+        if recommender is None:
+            return None
+        recommended = recommender.recommend(movie_ids)
+        return related_page(recommended) if recommended is not None else None
+    
+    def prefetch(self, scope, func, *args, **kwargs):
+        """Call a service method in the background to warm the response cache"""
+        return self.prefetcher.submit(scope, func, *args, **kwargs)
+    
+    def get_prefetch_stats(self):
+        """Get prefetch task counters and hit rate"""
+        return self.prefetcher.stats()
+    
+    def get_cache_stats(self):
+        """Get hit/miss counters for the shared response cache"""
+        if self.cache is None:
+            return {}
+        return self.cache.stats()
+    
+    def get_request_stats(self):
+        """Get counters for upstream, coalesced and rate-limited requests across the process"""
+        return _request_stats()
+    
     def get_movie_poster_url(self, poster_path, size=POSTER_SIZE):
         """Get the full URL for a movie poster"""
         if not poster_path:
@@ -71,6 +462,28 @@ class TMDbService:
             return None
         return f"{self.image_base_url}{size}{profile_path}"
     
+    def _get_image(self, image_path, sizes, width, placeholder_size):
+        """Get cached image bytes sized for a rendered width, falling back to a placeholder"""
+        data = self.images.get(image_path, pick_size(sizes, width)) if image_path else None
+        if data is None:
+            data = self.images.get_placeholder(*placeholder_size)
+        return data
+    
+    def get_movie_poster_image(self, poster_path, width=None):
+        """Get poster image bytes for a column `width` pixels wide, from the trending snapshot when it has them"""
+        data = snapshot_poster(poster_path, width)
+        if data is not None:
+            return data
+        return self._get_image(poster_path, POSTER_SIZES, width, (500, 750))
+    
+    def get_backdrop_image(self, backdrop_path, width=None):
+        """Get backdrop image bytes for a column `width` pixels wide"""
+        return self._get_image(backdrop_path, BACKDROP_SIZES, width, (1280, 720))
+    
+    def get_profile_image(self, profile_path, width=None):
+        """Get profile image bytes for a column `width` pixels wide"""
+        return self._get_image(profile_path, PROFILE_SIZES, width, (150, 225))
+    
     def get_genres(self):
         """Get the list of official genres for movies"""
         endpoint = "genre/movie/list"
@@ -80,6 +493,15 @@ class TMDbService:
         return self._make_request(endpoint, params)
     
     def discover_movies(self, params=None):
-        """Discover movies by different types of data"""
+        """Discover movies by different types of data, filtering the local movie table when it is large enough"""
+        movie_table = _loaded_movie_table()
+        if movie_table is not None and movie_table.is_local_discover_ready():
+            return movie_table.get_movie_table().discover(params)
+        
         endpoint = "discover/movie"
-        return self._make_request(endpoint, params)
\ No newline at end of file
+        return self._make_request(endpoint, params)
+    
+    def has_local_discover(self):
+        """Check whether discover queries are answered locally, fast enough to apply filters live"""
+        movie_table = _loaded_movie_table()
+        return movie_table is not None and movie_table.is_local_discover_ready()
\ No newline at end of file
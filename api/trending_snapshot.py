@@ -0,0 +1,279 @@
+"""Precomputed trending pages for Home, published as one memory-mapped snapshot file
+
+Trending pages 1..K for the day and the week are fetched once, their movies get
+genre names resolved, and their poster thumbnails are packed next to them:
+
+    header    magic, format version and the index length
+    index     JSON: build time, pages by "window/page", and (offset, length) of each poster
+    posters   image bytes back to back
+
+The file is written under a temporary name and renamed over the previous one, so
+readers see either the old snapshot or the new one. Each process memory-maps it
+and re-opens it when the rename is noticed, so Home renders with no upstream calls.
+
+    python -m api.trending_snapshot build
+    python -m api.trending_snapshot build --pages 10
+    python -m api.trending_snapshot status
+"""
+import argparse
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .config import (
+    POSTER_SIZES, TRENDING_SNAPSHOT_MODE, TRENDING_SNAPSHOT_FILE, TRENDING_SNAPSHOT_PAGES,
+    TRENDING_SNAPSHOT_MAX_AGE, TRENDING_SNAPSHOT_POSTER_WIDTH, TRENDING_SNAPSHOT_REFRESH_SECONDS
+)
+from .image_cache import pick_size
+
+SNAPSHOT_MAGIC = b"TMDBTRND"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+
+TIME_WINDOWS = ("day", "week")
+# Processes look for a newly published snapshot at most this often
+RELOAD_CHECK_SECONDS = 5
+
+
+def _page_key(time_window, page):
+    return f"{time_window}/{int(page)}"
+
+
+def build_snapshot(service=None, path=TRENDING_SNAPSHOT_FILE, pages=TRENDING_SNAPSHOT_PAGES,
+                   poster_width=TRENDING_SNAPSHOT_POSTER_WIDTH):
+    """Fetch trending pages and their posters through a TMDbService and publish them as a snapshot
+
+    Returns the number of pages written, or 0 (leaving the current snapshot in place) if
+    TMDb answered none of them.
+    """
+    if service is None:
+        from .tmdb_service import TMDbService
+
+        service = TMDbService()
+
+    genres = service.get_genres() or {}
+    genre_names = {genre["id"]: genre["name"] for genre in genres.get("genres", [])}
+    poster_size = pick_size(POSTER_SIZES, poster_width)
+
+    page_data = {}
+    for time_window in TIME_WINDOWS:
+        for page in range(1, pages + 1):
+            # Going past the snapshot keeps the build from serving its own previous output
+            data = service.get_trending_movies(time_window, page=page, from_snapshot=False)
+            if not data or "results" not in data:
+                continue
+            results = [
+                {**movie, "genre_names": [genre_names[g] for g in movie.get("genre_ids", []) if g in genre_names]}
+                for movie in data["results"]
+            ]
+            page_data[_page_key(time_window, page)] = {**data, "results": results}
+            if page >= data.get("total_pages", 1):
+                break
+    if not page_data:
+        return 0
+
+    posters = {}
+    for data in page_data.values():
+        for movie in data["results"]:
+            poster_path = movie.get("poster_path")
+            key = f"{poster_size}{poster_path}"
+            if poster_path and key not in posters:
+                image = service.images.get(poster_path, poster_size)
+                if image is not None:
+                    posters[key] = image
+
+    # Offsets are relative to the end of the index, whose length depends on them
+    images, offset = {}, 0
+    for key, image in posters.items():
+        images[key] = [offset, len(image)]
+        offset += len(image)
+    index = json.dumps({
+        "built_at": time.time(),
+        "pages": page_data,
+        "images": images,
+    }, separators=(",", ":")).encode("utf-8")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index)))
+        f.write(index)
+        for image in posters.values():
+            f.write(image)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(page_data)
+
+
+class TrendingSnapshot:
+    """Read-only, memory-mapped trending snapshot written by `build_snapshot`"""
+
+    def __init__(self, path=TRENDING_SNAPSHOT_FILE):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self._mmap)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported trending snapshot: {magic!r} version {version}")
+        index = json.loads(self._mmap[_HEADER.size:_HEADER.size + index_length])
+        self.built_at = index["built_at"]
+        self.pages = index["pages"]
+        self.images = index["images"]
+        self._images_start = _HEADER.size + index_length
+
+    def age(self):
+        """Get the age of the snapshot in seconds"""
+        return time.time() - self.built_at
+
+    def page(self, time_window, page):
+        """Get a trending page, or None if the snapshot does not hold it or is too old
+
+        Pages are shared between sessions and must be treated as read-only.
+        """
+        if self.age() > TRENDING_SNAPSHOT_MAX_AGE:
+            return None
+        return self.pages.get(_page_key(time_window, page))
+
+    def image(self, image_path, size):
+        """Get the bytes of a poster stored in the snapshot, or None"""
+        location = self.images.get(f"{size}{image_path}")
+        if location is None:
+            return None
+        start = self._images_start + location[0]
+        return self._mmap[start:start + location[1]]
+
+
+_snapshot = None
+_snapshot_key = None
+_snapshot_checked_at = None
+_snapshot_lock = threading.Lock()
+
+
+def get_trending_snapshot():
+    """Get the process-wide trending snapshot, re-opened after a new one is published, or None"""
+    global _snapshot, _snapshot_key, _snapshot_checked_at
+    if TRENDING_SNAPSHOT_MODE == "off":
+        return None
+    now = time.monotonic()
+    if _snapshot_checked_at is not None and now - _snapshot_checked_at < RELOAD_CHECK_SECONDS:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot_checked_at is None or now - _snapshot_checked_at >= RELOAD_CHECK_SECONDS:
+            try:
+                stat = os.stat(TRENDING_SNAPSHOT_FILE)
+                key = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                key = None
+            if key != _snapshot_key:
+                # The previous mapping stays valid for callers still holding it
+                _snapshot = None
+                if key is not None:
+                    try:
+                        _snapshot = TrendingSnapshot(TRENDING_SNAPSHOT_FILE)
+                    except (OSError, ValueError, struct.error) as e:
+                        print(f"Error loading trending snapshot from {TRENDING_SNAPSHOT_FILE}: {e}")
+                _snapshot_key = key
+            _snapshot_checked_at = now
+    return _snapshot
+
+
+def snapshot_page(time_window, page):
+    """Get a trending page from the current snapshot, or None"""
+    snapshot = get_trending_snapshot()
+    return snapshot.page(time_window, page) if snapshot is not None else None
+
+
+def snapshot_poster(poster_path, width=None):
+    """Get poster bytes for a column `width` pixels wide from the current snapshot, or None"""
+    snapshot = get_trending_snapshot()
+    if snapshot is None or not poster_path:
+        return None
+    return snapshot.image(poster_path, pick_size(POSTER_SIZES, width))
+
+
+_job_started = False
+_job_lock = threading.Lock()
+_job_stopping = threading.Event()
+# Stop the job at exit. threading's exit hooks run before the thread pools a build fetches with shut down,
+# and before atexit's, which come too late to keep a build from starting then
+getattr(threading, "_register_atexit", atexit.register)(_job_stopping.set)
+
+
+def _snapshot_age(path):
+    try:
+        with open(path, "rb") as f:
+            magic, version, index_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            return time.time() - json.loads(f.read(index_length))["built_at"]
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def _run_job(service, interval):
+    while not _job_stopping.is_set():
+        age = _snapshot_age(TRENDING_SNAPSHOT_FILE)
+        # Another process may have published a fresh snapshot already
+        if age is None or age >= interval:
+            try:
+                build_snapshot(service)
+            except Exception as e:
+                if _job_stopping.is_set():
+                    # The interpreter is shutting down under a build in progress
+                    return
+                print(f"Error building trending snapshot: {e}")
+            age = 0
+        _job_stopping.wait(max(interval - age, RELOAD_CHECK_SECONDS))
+
+
+def start_snapshot_job(service, interval=TRENDING_SNAPSHOT_REFRESH_SECONDS):
+    """Rebuild the snapshot in a background thread every `interval` seconds (once per process)"""
+    global _job_started
+    if interval <= 0 or TRENDING_SNAPSHOT_MODE == "off":
+        return
+    with _job_lock:
+        if _job_started:
+            return
+        _job_started = True
+    threading.Thread(target=_run_job, args=(service, interval), name="tmdb-trending-snapshot", daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the trending snapshot that Home renders from")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    build = subcommands.add_parser("build", help="Fetch trending pages and posters and publish a new snapshot")
+    build.add_argument("--output", default=TRENDING_SNAPSHOT_FILE, help="Snapshot file")
+    build.add_argument("--pages", type=int, default=TRENDING_SNAPSHOT_PAGES, help="Pages per time window")
+    build.add_argument("--poster-width", type=int, default=TRENDING_SNAPSHOT_POSTER_WIDTH)
+
+    status = subcommands.add_parser("status", help="Show what the snapshot holds")
+    status.add_argument("--snapshot", default=TRENDING_SNAPSHOT_FILE, help="Snapshot file")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        pages = build_snapshot(path=args.output, pages=args.pages, poster_width=args.poster_width)
+        if not pages:
+            print("TMDb returned no trending pages; the current snapshot was left in place")
+        else:
+            print(f"Published {pages} pages to {args.output} in {time.perf_counter() - started:.1f}s")
+        return
+
+    snapshot = TrendingSnapshot(args.snapshot)
+    print(f"{len(snapshot.pages)} pages, {len(snapshot.images)} posters, "
+          f"{os.path.getsize(args.snapshot) / 1024:.0f} KiB, built {snapshot.age() / 60:.0f} minutes ago")
+    for key in sorted(snapshot.pages):
+        print(f"  {key:<10} {len(snapshot.pages[key]['results']):>3} movies")
+
+
+if __name__ == "__main__":
+    main()
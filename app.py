@@ -1,13 +1,16 @@
 import streamlit as st
-import os
-from api.tmdb_service import TMDbService
-from components.movie_card import movie_card, display_movie_details
-from components.search_bar import search_bar
-from components.filters import apply_filters
-from utils.helpers import init_session_state, load_with_spinner
+import time
+from api.cache import PANEL_SECTIONS
+from api.config import PREFETCH_DETAILS_COUNT, DEBUG_PANEL, SEARCH_STREAM_POLL_SECONDS
+from api.metrics import RENDER_LATENCY, observe_rerun, timed
+from api.models import Movie
+from components.movie_card import movie_card, movie_strip, detail_panel, GRID_POSTER_WIDTH
+from utils.bootstrap import get_tmdb_service, get_batch_service, get_css, get_genre_names
+from utils.helpers import init_session_state, load_with_spinner, rerun_fragment, stale_notice
 
-# Initialize TMDb service
-tmdb_service = TMDbService()
+# Built once per process and shared by every session (or this session's copy with its own API key);
+# pages import what only they need on first use
+tmdb_service = get_tmdb_service()
 
 # Page configuration
 st.set_page_config(
@@ -19,13 +22,257 @@ st.set_page_config(
 
 # Load custom CSS
 def load_css():
-    css_file = os.path.join(os.path.dirname(__file__), "assets", "styles.css")
-    with open(css_file, "r") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+    st.markdown(f"<style>{get_css()}</style>", unsafe_allow_html=True)
+
+def prefetch_results(context, movies, fetch_next_page=None, **next_page_kwargs):
+    """Warm the cache for the next page of results and the first visible movie details"""
+    scope = st.session_state.session_id
+    # Navigating to a different view cancels prefetches queued for the previous one
+    tmdb_service.prefetcher.set_context(scope, context)
+    
+    if fetch_next_page is not None:
+        tmdb_service.prefetch(scope, fetch_next_page, **next_page_kwargs)
+    
+    for movie in movies[:PREFETCH_DETAILS_COUNT]:
+        # Only what the detail panel shows; keywords are never rendered
+        tmdb_service.prefetch(scope, tmdb_service.get_movie_details, movie.get("id"), sections=PANEL_SECTIONS)
+
+def pagination(total_pages):
+    """Display Previous/Next buttons; they rerun only the results fragment that calls this"""
+    col1, col2, col3 = st.columns([1, 3, 1])
+    
+    with col1:
+        if st.session_state.current_page > 1:
+            if st.button("Previous Page"):
+                st.session_state.current_page -= 1
+                rerun_fragment()
+    
+    with col2:
+        st.markdown(f"<div style='text-align: center;'>Page {st.session_state.current_page} of {min(total_pages, 500)}</div>", unsafe_allow_html=True)
+    
+    with col3:
+        if st.session_state.current_page < min(total_pages, 500):
+            if st.button("Next Page"):
+                st.session_state.current_page += 1
+                rerun_fragment()
+
+# Each results view is a fragment: paging, opening details and toggling favorites rerun
+# only the view (or a smaller fragment inside it), not the sidebar, CSS and filters
+@st.fragment
+@timed("fragment:trending")
+def trending_view(time_window_value):
+    """Display a page of trending movies as a grid, with pagination and the detail panel"""
+    # Fetch trending movies
+    trending_movies = load_with_spinner(
+        tmdb_service.get_trending_movies,
+        time_window=time_window_value,
+        page=st.session_state.current_page
+    )
+    
+    if not trending_movies or "results" not in trending_movies:
+        st.error("Failed to load trending movies. Please check your API key.")
+    else:
+        stale_notice(trending_movies)
+        
+        # Display movies in a grid
+        movies = trending_movies["results"]
+        
+        # Create rows with 4 movies each
+        with RENDER_LATENCY.time(section="trending_grid"):
+            for i in range(0, len(movies), 4):
+                cols = st.columns(4)
+                for j in range(4):
+                    if i + j < len(movies):
+                        with cols[j]:
+                            movie = movies[i + j]
+                            poster = tmdb_service.get_movie_poster_image(movie.get("poster_path"), width=GRID_POSTER_WIDTH)
+                            st.image(poster, use_container_width=True)
+                            
+                            st.markdown(f"**{movie.get('title')}**")
+                            st.markdown(f"⭐ {movie.get('vote_average', 0):.1f}/10")
+                            # Snapshot pages come with genre names already resolved
+                            genre_names = movie.get("genre_names") or get_genre_names(movie.get("genre_ids", []))
+                            if genre_names:
+                                st.caption(", ".join(genre_names[:3]))
+                            
+                            # The detail panel below renders in this same run, so no rerun is needed
+                            if st.button("View Details", key=f"trending_{movie.get('id')}"):
+                                st.session_state.selected_movie = movie.get('id')
+        
+        # Pagination
+        total_pages = trending_movies.get("total_pages", 1)
+        
+        # Warm the next page and the first few detail views in the background
+        home_context = ("Home", time_window_value, st.session_state.current_page)
+        if st.session_state.current_page < min(total_pages, 500):
+            prefetch_results(
+                home_context,
+                movies,
+                tmdb_service.get_trending_movies,
+                time_window=time_window_value,
+                page=st.session_state.current_page + 1
+            )
+        else:
+            prefetch_results(home_context, movies)
+        
+        pagination(total_pages)
+    
+    detail_panel()
+
+@st.fragment
+@timed("fragment:search_results")
+def search_results_view(query):
+    """Display a window of search results that grows with Load more, and the detail panel"""
+    from components.result_list import windowed_results
+    
+    search_results = load_with_spinner(tmdb_service.search_movies, query=query)
+    
+    if not search_results or "results" not in search_results:
+        st.error("Failed to load search results.")
+    elif not search_results["results"]:
+        st.info(f"No results found for '{query}'.")
+    else:
+        stale_notice(search_results)
+        st.subheader(f"Search Results for '{query}'")
+        
+        # Display movies
+        with RENDER_LATENCY.time(section="search_results"):
+            movies, next_page = windowed_results(
+                ("Search", query),
+                lambda page: tmdb_service.search_movies(query, page=page),
+                search_results.get("total_pages", 1)
+            )
+        
+        # Warm the next page and the first few detail views in the background
+        search_context = ("Search", query, next_page)
+        if next_page is not None:
+            prefetch_results(search_context, movies, tmdb_service.search_movies, query=query, page=next_page)
+        else:
+            prefetch_results(search_context, movies)
+    
+    detail_panel()
+
+@st.fragment(run_every=SEARCH_STREAM_POLL_SECONDS)
+@timed("fragment:search_stream")
+def search_stream_view(query):
+    """Display results for a query while they stream in, starting with those refined from a cached prefix"""
+    incremental = st.session_state.incremental_search
+    stream = incremental.update(query)
+    
+    # The full page takes over once every page has arrived
+    if stream.done:
+        st.rerun()
+    
+    movies = stream.results()
+    if movies:
+        st.subheader(f"Search Results for '{query}'")
+    else:
+        movies = incremental.provisional(query)
+        if movies:
+            st.subheader(f"Matches so far for '{query}'")
+    st.caption("Searching...")
+    
+    with RENDER_LATENCY.time(section="search_stream"):
+        for movie in movies:
+            movie_card(movie)
+            st.markdown("---")
+    
+    detail_panel()
+
+@st.fragment
+@timed("fragment:discover_results")
+def discover_results_view(filters):
+    """Display a window of movies matching the filters that grows with Load more, and the detail panel"""
+    from components.result_list import windowed_results
+    
+    discover_results = load_with_spinner(tmdb_service.discover_movies, params={**filters, "page": 1})
+    
+    if not discover_results or "results" not in discover_results:
+        st.error("Failed to load movies with the selected filters.")
+    elif not discover_results["results"]:
+        st.info("No movies found with the selected filters.")
+    else:
+        stale_notice(discover_results)
+        st.subheader("Movies matching your filters")
+        
+        # Display movies
+        with RENDER_LATENCY.time(section="discover_results"):
+            movies, next_page = windowed_results(
+                ("Discover", tuple(sorted(filters.items()))),
+                lambda page: tmdb_service.discover_movies(params={**filters, "page": page}),
+                discover_results.get("total_pages", 1)
+            )
+        
+        # Warm the next page and the first few detail views in the background
+        filters_context = ("Discover", tuple(sorted(filters.items())), next_page)
+        if next_page is not None:
+            prefetch_results(
+                filters_context,
+                movies,
+                tmdb_service.discover_movies,
+                params={**filters, "page": next_page}
+            )
+        else:
+            prefetch_results(filters_context, movies)
+    
+    detail_panel()
+
+@st.fragment
+@timed("fragment:favorites")
+def favorites_view():
+    """Display the user's favorites with Remove buttons and the detail panel"""
+    if not st.session_state.favorites:
+        st.info("You haven't added any movies to your favorites yet.")
+    else:
+        # Add a clear all button
+        if st.button("Clear All Favorites"):
+            st.session_state.favorites.clear()
+            st.session_state.favorites.flush()
+            st.success("Favorites cleared!")
+            rerun_fragment()
+        
+        # Only ids are kept per session; fetch every favorite's basic details in one batch
+        favorite_ids = list(st.session_state.favorites)
+        details = load_with_spinner(get_batch_service().get_movie_details_many, favorite_ids, sections=())
+        
+        # Display favorite movies
+        for movie_id, data in zip(favorite_ids, details):
+            movie = Movie.from_dict(data) if data else Movie(movie_id, overview="Details are unavailable right now.")
+            col1, col2, col3 = st.columns([3, 1, 1])
+            
+            with col1:
+                movie_card(movie)
+            
+            with col2:
+                if st.button("View Details", key=f"fav_details_{movie.id}"):
+                    st.session_state.selected_movie = movie.id
+            
+            with col3:
+                if st.button("Remove", key=f"remove_{movie.id}"):
+                    st.session_state.favorites.remove(movie.id)
+                    st.session_state.favorites.flush()
+                    st.success(f"Removed {movie.title} from favorites!")
+                    rerun_fragment()
+            
+            st.markdown("---")
+        
+        # Only shown once local recommendations have been built
+        recommended = tmdb_service.get_recommendations_for(favorite_ids)
+        if recommended and recommended["results"]:
+            st.subheader("Recommended for you")
+            movie_strip(recommended["results"], key_prefix="recommended")
+    
+    detail_panel()
+
+# Timed from here so every rerun is recorded with the page it rendered
+rerun_started = time.perf_counter()
 
 # Initialize session state
 init_session_state()
 
+# Save favorites changed by a run that ended early in st.rerun()
+st.session_state.favorites.flush()
+
 # Load CSS
 load_css()
 
@@ -41,7 +288,9 @@ with st.sidebar:
         st.warning("TMDb API key not found. Please enter your API key below.")
         api_key = st.text_input("TMDb API Key", type="password")
         if api_key:
-            tmdb_service.api_key = api_key
+            # Kept in this session only; the service every session shares never sees it
+            st.session_state.tmdb_api_key = api_key
+            tmdb_service = get_tmdb_service()
             st.success("API key set successfully!")
     
     # Search history
@@ -49,7 +298,8 @@ with st.sidebar:
         st.subheader("Recent Searches")
         for query in st.session_state.search_history:
             if st.button(query, key=f"history_{query}"):
-                st.session_state.search_input = query
+                from components.search_bar import use_query
+                use_query(query)
                 page = "Search"
     
     # About section
@@ -66,196 +316,58 @@ if page == "Home":
     time_window = st.radio("Trending in:", ["Today", "This Week"], horizontal=True)
     time_window_value = "day" if time_window == "Today" else "week"
     
-    # Fetch trending movies
-    trending_movies = load_with_spinner(
-        tmdb_service.get_trending_movies,
-        time_window=time_window_value,
-        page=st.session_state.current_page
-    )
-    
-    if not trending_movies or "results" not in trending_movies:
-        st.error("Failed to load trending movies. Please check your API key.")
-    else:
-        # Display movies in a grid
-        movies = trending_movies["results"]
-        
-        # Create rows with 4 movies each
-        # In the Home section where trending movies are displayed
-        for i in range(0, len(movies), 4):
-            cols = st.columns(4)
-            for j in range(4):
-                if i + j < len(movies):
-                    with cols[j]:
-                        movie = movies[i + j]
-                        poster_url = tmdb_service.get_movie_poster_url(movie.get("poster_path"))
-                        
-                        if poster_url:
-                            st.image(poster_url, use_container_width=True)
-                        else:
-                            st.image("https://via.placeholder.com/500x750?text=No+Image", use_container_width=True)
-                        
-                        st.markdown(f"**{movie.get('title')}**")
-                        st.markdown(f"⭐ {movie.get('vote_average', 0):.1f}/10")
-                        
-                        # In the trending movies section where you have the View Details button
-                        if st.button("View Details", key=f"trending_{movie.get('id')}"):
-                            st.session_state.selected_movie = movie.get('id')
-                            # Replace experimental_rerun with rerun
-                            st.rerun()
-        
-        # Pagination
-        total_pages = trending_movies.get("total_pages", 1)
-        
-        col1, col2, col3 = st.columns([1, 3, 1])
-        
-        with col1:
-            if st.session_state.current_page > 1:
-                if st.button("Previous Page"):
-                    st.session_state.current_page -= 1
-                    st.rerun()
-        
-        with col2:
-            st.markdown(f"<div style='text-align: center;'>Page {st.session_state.current_page} of {min(total_pages, 500)}</div>", unsafe_allow_html=True)
-        
-        with col3:
-            if st.session_state.current_page < min(total_pages, 500):
-                if st.button("Next Page"):
-                    st.session_state.current_page += 1
-                    st.rerun()
+    trending_view(time_window_value)
 
 elif page == "Search":
     st.title("Search Movies")
     
+    from api.incremental_search import IncrementalSearch
+    from components.filters import apply_filters
+    from components.search_bar import remember_search, search_bar
+    
     # Search bar
     query = search_bar()
     
-    # Filters
-    filters = apply_filters()
+    # Filters apply live when discover queries are answered from the local movie table
+    filters = apply_filters(live=tmdb_service.has_local_discover())
     
     # If search query is provided, search for movies
     if query:
-        search_results = load_with_spinner(
-            tmdb_service.search_movies,
-            query=query,
-            page=st.session_state.current_page
-        )
+        # Each keystroke supersedes the search in flight; finished searches are served from the cache
+        incremental_search = st.session_state.get("incremental_search")
+        # A session that enters its own API key searches with it from then on
+        if incremental_search is None or incremental_search.service is not tmdb_service:
+            st.session_state.incremental_search = IncrementalSearch(tmdb_service)
+        stream = st.session_state.incremental_search.update(query)
         
-        if not search_results or "results" not in search_results:
-            st.error("Failed to load search results.")
-        elif not search_results["results"]:
-            st.info(f"No results found for '{query}'.")
+        if stream.done:
+            # Searches run as the query is typed, so one is remembered once all its results are in
+            remember_search(query)
+            search_results_view(query)
         else:
-            st.subheader(f"Search Results for '{query}'")
-            
-            # Display movies
-            movies = search_results["results"]
-            
-            for movie in movies:
-                movie_card(movie)
-                st.markdown("---")
-            
-            # Pagination
-            total_pages = search_results.get("total_pages", 1)
-            
-            col1, col2, col3 = st.columns([1, 3, 1])
-            
-            with col1:
-                if st.session_state.current_page > 1:
-                    if st.button("Previous Page"):
-                        st.session_state.current_page -= 1
-                        st.rerun()
-            
-            with col2:
-                st.markdown(f"<div style='text-align: center;'>Page {st.session_state.current_page} of {min(total_pages, 500)}</div>", unsafe_allow_html=True)
-            
-            with col3:
-                if st.session_state.current_page < min(total_pages, 500):
-                    if st.button("Next Page"):
-                        st.session_state.current_page += 1
-                        st.rerun()
+            search_stream_view(query)
     
     # If filters are applied but no search query, use discover
     elif filters:
-        discover_results = load_with_spinner(
-            tmdb_service.discover_movies,
-            params={**filters, "page": st.session_state.current_page}
-        )
-        
-        if not discover_results or "results" not in discover_results:
-            st.error("Failed to load movies with the selected filters.")
-        elif not discover_results["results"]:
-            st.info("No movies found with the selected filters.")
-        else:
-            st.subheader("Movies matching your filters")
-            
-            # Display movies
-            movies = discover_results["results"]
-            
-            for movie in movies:
-                movie_card(movie)
-                st.markdown("---")
-            
-            # Pagination
-            total_pages = discover_results.get("total_pages", 1)
-            
-            col1, col2, col3 = st.columns([1, 3, 1])
-            
-            with col1:
-                if st.session_state.current_page > 1:
-                    if st.button("Previous Page"):
-                        st.session_state.current_page -= 1
-                        st.rerun()
-            
-            with col2:
-                st.markdown(f"<div style='text-align: center;'>Page {st.session_state.current_page} of {min(total_pages, 500)}</div>", unsafe_allow_html=True)
-            
-            with col3:
-                if st.session_state.current_page < min(total_pages, 500):
-                    if st.button("Next Page"):
-                        st.session_state.current_page += 1
-                        st.rerun()
+        discover_results_view(filters)
+    
+    else:
+        detail_panel()
 
 elif page == "Favorites":
     st.title("Your Favorites")
     
-    if not st.session_state.favorites:
-        st.info("You haven't added any movies to your favorites yet.")
-    else:
-        # Add a clear all button
-        if st.button("Clear All Favorites"):
-            st.session_state.favorites = []
-            st.success("Favorites cleared!")
-            st.rerun()
-        
-        # Display favorite movies
-        for movie in st.session_state.favorites:
-            col1, col2, col3 = st.columns([3, 1, 1])
-            
-            with col1:
-                movie_card(movie)
-            
-            with col2:
-                if st.button("View Details", key=f"fav_details_{movie.get('id')}"):
-                    st.session_state.selected_movie = movie.get('id')
-            
-            with col3:
-                if st.button("Remove", key=f"remove_{movie.get('id')}"):
-                    st.session_state.favorites.remove(movie)
-                    st.success(f"Removed {movie.get('title')} from favorites!")
-                    st.rerun()
-            
-            st.markdown("---")
-
-# Check if a movie is selected for detailed view
-if "selected_movie" in st.session_state and st.session_state.selected_movie:
-    # Create a modal-like effect
-    st.markdown("---")
-    st.subheader("Movie Details")
+    # Nothing on this page needs prefetching, so drop work queued for the last view
+    tmdb_service.prefetcher.set_context(st.session_state.session_id, ("Favorites",))
     
-    # Display movie details
-    display_movie_details(st.session_state.selected_movie)
+    favorites_view()
+
+st.session_state.favorites.flush()
+
+observe_rerun(page, rerun_started)
+
+if DEBUG_PANEL:
+    from components.debug_panel import debug_panel
     
-    # Close button
-    if st.button("Close Details"):
-        st.session_state.selected_movie = None
-        st.rerun()
\ No newline at end of file
+    with st.sidebar:
+        debug_panel(tmdb_service)
\ No newline at end of file
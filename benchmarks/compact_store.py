@@ -0,0 +1,131 @@
+"""Compare the catalog's normalized, dictionary-compressed storage with plain JSON files
+
+    python -m benchmarks.compact_store --movies 5000 --people 50000 --reads 2000
+
+The same synthetic details payloads are stored as one JSON file per movie, as
+whole documents compressed with zlib (how the catalog stored them before), and
+normalized with trained dictionaries. Reported for each: bytes of payload,
+bytes on disk, compression ratio against the JSON files, and point read
+latency. Every stored movie must read back equal to what was written.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import zlib
+
+from .harness import Measurement, environment_metadata, summarize, write_results
+from .mock_tmdb import MockConfig, make_details
+
+BATCH_SIZE = 200
+
+
+def disk_usage(paths):
+    return sum(os.stat(path).st_blocks * 512 for path in paths)
+
+
+def time_reads(read, ids):
+    latencies = []
+    for movie_id in ids:
+        with Measurement() as m:
+            read(movie_id)
+        latencies.append(m.elapsed_ms)
+    return summarize(latencies)
+
+
+def store_json_files(directory, details):
+    os.makedirs(directory)
+    paths = []
+    for movie_id, payload in details.items():
+        path = os.path.join(directory, f"{movie_id}.json")
+        with open(path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        paths.append(path)
+
+    def read(movie_id):
+        with open(os.path.join(directory, f"{movie_id}.json")) as f:
+            return json.load(f)
+
+    return read, sum(os.path.getsize(path) for path in paths), disk_usage(paths)
+
+
+def store_catalog(path, details, normalized):
+    from api.catalog import MovieCatalog
+
+    catalog = MovieCatalog(path)
+    records = [({"id": movie_id, "original_title": payload["original_title"], "popularity": payload["popularity"]},
+                payload) for movie_id, payload in details.items()]
+    if normalized:
+        for start in range(0, len(records), BATCH_SIZE):
+            catalog.store_batch(records[start:start + BATCH_SIZE], "benchmark", start + BATCH_SIZE)
+        # Retrain on everything stored, as `python -m api.catalog compact` would
+        catalog.compact()
+    else:
+        conn = catalog._connection()
+        with conn:
+            conn.executemany("INSERT INTO movies VALUES (?, ?, 0.0, 0, 0.0, ?)", [
+                (record["id"], record["original_title"], zlib.compress(json.dumps(payload).encode("utf-8")))
+                for record, payload in records
+            ])
+        conn.execute("VACUUM")
+    stats = catalog.stats()
+    return catalog.get, stats["payload_bytes"], disk_usage([path]), stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--people", type=int, default=50000, help="Distinct people the movies' credits draw from")
+    parser.add_argument("--related", action="store_true", help="Include similar and recommendations sections")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--output", default="bench/compact_store.json")
+    args = parser.parse_args(argv)
+
+    from api.cache import DETAIL_SECTIONS
+    from api.compact_store import DEFAULT_CODEC, CODEC_ZSTD
+
+    config = MockConfig(people=args.people)
+    sections = DETAIL_SECTIONS + (("similar", "recommendations") if args.related else ())
+    details = {movie_id: make_details(movie_id, config, sections) for movie_id in range(1, args.movies + 1)}
+    ids = [random.Random(0).randint(1, args.movies) for _ in range(args.reads)]
+    directory = tempfile.mkdtemp(prefix="tmdb-bench-store-")
+
+    stores = {
+        "json_files": store_json_files(os.path.join(directory, "json"), details),
+        "zlib_documents": store_catalog(os.path.join(directory, "zlib.sqlite3"), details, normalized=False),
+        "normalized_dictionary": store_catalog(os.path.join(directory, "compact.sqlite3"), details, normalized=True),
+    }
+    json_bytes = stores["json_files"][1]
+
+    results = {}
+    problems = []
+    for name, (read, payload_bytes, disk_bytes, *extra) in stores.items():
+        mismatched = sum(read(movie_id) != details[movie_id] for movie_id in set(ids))
+        if mismatched:
+            problems.append(f"{mismatched} movies read back differently from {name}")
+        results[name] = {
+            "payload_bytes": payload_bytes,
+            "disk_bytes": disk_bytes,
+            "compression_ratio": json_bytes / payload_bytes if payload_bytes else 0.0,
+            "disk_ratio": stores["json_files"][2] / disk_bytes if disk_bytes else 0.0,
+            "reads": time_reads(read, ids),
+        }
+        if extra:
+            results[name]["catalog"] = extra[0]
+        reads = results[name]["reads"]
+        print(f"  {name:<22} {payload_bytes / 1024 / 1024:8.2f} MiB  ({results[name]['compression_ratio']:5.2f}x)   "
+              f"disk {disk_bytes / 1024 / 1024:8.2f} MiB   read p50 {reads['p50_ms']:7.3f} ms   p95 {reads['p95_ms']:7.3f} ms")
+
+    codec = "zstd" if DEFAULT_CODEC == CODEC_ZSTD else "zlib"
+    results = {"meta": environment_metadata(codec=codec, **vars(args)), "stores": results, "problems": problems}
+    write_results(results, args.output)
+    print(f"\nWrote {args.output} (dictionaries: {codec})")
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Shared helpers for the benchmark scripts: mock environment, timing and reporting"""
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .mock_tmdb import MockConfig, MockTMDbServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, "app.py")
+
+
+def configure_environment(server, env=None):
+    """Point the app's configuration at a mock TMDb server and a fresh cache directory
+
+    Must run before anything under `api` is imported, because the configuration
+    is read from the environment at import time. Returns the cache directory.
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    cache_dir = tempfile.mkdtemp(prefix="tmdb-bench-")
+    os.environ.update({
+        "TMDB_BASE_URL": server.base_url,
+        "TMDB_IMAGE_BASE_URL": server.image_base_url,
+        "TMDB_CACHE_DIR": cache_dir,
+        "TMDB_IMAGE_CACHE_DIR": os.path.join(cache_dir, "images"),
+        "TMDB_SEARCH_INDEX_DIR": os.path.join(cache_dir, "search_index"),
+        "TMDB_FAVORITES_DB": os.path.join(cache_dir, "favorites.db"),
+        "TMDB_API_KEY": "benchmark",
+    })
+    os.environ.update(env or {})
+    return cache_dir
+
+
+def start_mock_environment(config=None, env=None):
+    """Start a mock TMDb server and point the app's configuration at it
+
+    Must run before anything under `api` is imported. Returns (server, cache_dir).
+    """
+    server = MockTMDbServer(config=config or MockConfig()).start()
+    return server, configure_environment(server, env)
+
+
+def percentile(values, pct):
+    """Get a percentile of a list of numbers by linear interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(latencies_ms, **extra):
+    """Summarize latencies in milliseconds with percentiles, plus any extra fields"""
+    summary = {
+        "iterations": len(latencies_ms),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms) if latencies_ms else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": max(latencies_ms) if latencies_ms else 0.0,
+    }
+    summary.update(extra)
+    return summary
+
+
+def current_rss_kb():
+    """Get the resident set size of this process in KiB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class Measurement:
+    """Time a block and record upstream traffic and allocations made inside it"""
+
+    def __init__(self, server=None):
+        self.server = server
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._stats = self.server.stats() if self.server else None
+        tracemalloc.reset_peak()
+        self._allocated = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ms = (time.perf_counter() - self._started) * 1000
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_alloc_kb = max(peak - self._allocated, 0) / 1024
+        self.retained_kb = (current - self._allocated) / 1024
+        if self.server is not None:
+            stats = self.server.stats()
+            self.upstream_requests = stats["requests"] - self._stats["requests"]
+            self.upstream_bytes = stats["bytes"] - self._stats["bytes"]
+        else:
+            self.upstream_requests = self.upstream_bytes = 0
+        return False
+
+
+def environment_metadata(**extra):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        **extra,
+    }
+
+
+def write_results(results, path):
+    """Write benchmark results as JSON"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def _flatten(results, prefix=""):
+    """Yield (name, summary) pairs for every summary dict nested in the results"""
+    for key, value in results.items():
+        if not isinstance(value, dict) or key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if "p95_ms" in value:
+            yield name, value
+        else:
+            yield from _flatten(value, f"{name}.")
+
+
+def compare_results(current, baseline, max_regression=0.25, min_delta_ms=1.0, metric="p95_ms"):
+    """Compare two result sets, returning a list of (name, baseline, current, regressed) rows"""
+    baseline_rows = dict(_flatten(baseline))
+    rows = []
+    for name, summary in _flatten(current):
+        previous = baseline_rows.get(name)
+        if previous is None:
+            continue
+        before, after = previous[metric], summary[metric]
+        regressed = after - before > min_delta_ms and after > before * (1 + max_regression)
+        rows.append((name, before, after, regressed))
+    return rows
+
+
+def report_comparison(rows, metric="p95_ms"):
+    """Print a comparison table and return True if nothing regressed"""
+    print(f"\n{'benchmark':<48} {'baseline ' + metric:>16} {'current':>10} {'change':>8}")
+    for name, before, after, regressed in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        flag = "  REGRESSED" if regressed else ""
+        print(f"{name:<48} {before:>16.2f} {after:>10.2f} {change:>7.1f}%{flag}")
+    return not any(row[3] for row in rows)
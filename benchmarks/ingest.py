@@ -0,0 +1,107 @@
+"""Ingest a fixture daily ID export against a mock TMDb server, checking resume and idempotence
+
+    python -m benchmarks.ingest --movies 2000 --workers 8 --latency 0.02
+
+The export is ingested in two runs (the first stopped halfway), then ingested
+again, which must fetch nothing, then a later day's export with some movies
+changed, which must fetch only those. Throughput, upstream requests per run and
+catalog read latency are reported.
+"""
+import argparse
+import os
+import sys
+
+from .harness import (
+    Measurement,
+    environment_metadata,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig, write_export
+
+
+def run_ingest(server, path, catalog, service, workers, limit=None):
+    from api.catalog import ingest
+
+    with Measurement(server) as m:
+        stats = ingest(path, catalog, service, workers=workers, limit=limit)
+    elapsed = m.elapsed_ms / 1000
+    return {
+        **stats,
+        "seconds": elapsed,
+        "movies_per_second": stats["fetched"] / elapsed if elapsed else 0.0,
+        "upstream_requests": m.upstream_requests,
+        "peak_alloc_kb": m.peak_alloc_kb,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=100, help="Movies changed in the second day's export")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--output", default="bench/ingest.json")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(latency=args.latency, error_rate=args.error_rate)
+    server, cache_dir = start_mock_environment(config)
+
+    from api.catalog import MovieCatalog
+    from api.tmdb_service import TMDbService
+
+    first_day = write_export(os.path.join(cache_dir, "movie_ids_01_01_2024.json.gz"), args.movies, config)
+    second_day = write_export(os.path.join(cache_dir, "movie_ids_01_02_2024.json.gz"), args.movies, config,
+                              changed=args.changed)
+    catalog = MovieCatalog(os.path.join(cache_dir, "catalog.sqlite3"))
+    service = TMDbService()
+
+    runs = {}
+    for name, path, limit in (
+        ("interrupted", first_day, args.movies // 2),
+        ("resumed", first_day, None),
+        ("repeated", first_day, None),
+        ("next_day", second_day, None),
+    ):
+        runs[name] = run_ingest(server, path, catalog, service, args.workers, limit)
+        run = runs[name]
+        print(f"  {name:<12} from line {run['start_line']:>7}  fetched {run['fetched']:>6}  failed {run['failed']:>4}"
+              f"  upstream {run['upstream_requests']:>6}  {run['movies_per_second']:8.1f} movies/s")
+
+    problems = []
+    if runs["repeated"]["upstream_requests"]:
+        problems.append("ingesting a finished export again made upstream requests")
+    if runs["resumed"]["start_line"] == 0:
+        problems.append("the second run did not resume from the checkpoint")
+    if not args.error_rate and runs["next_day"]["fetched"] != args.changed:
+        problems.append(f"the next day's export fetched {runs['next_day']['fetched']} movies, not {args.changed}")
+
+    latencies = []
+    for i in range(args.reads):
+        with Measurement() as m:
+            catalog.get(1 + i % args.movies)
+        latencies.append(m.elapsed_ms)
+    reads = summarize(latencies)
+    stats = catalog.stats()
+    print(f"  catalog read p50 {reads['p50_ms']:.3f} ms   p95 {reads['p95_ms']:.3f} ms   "
+          f"{stats['payload_bytes'] / max(stats['movies'], 1):.0f} bytes/movie")
+
+    results = {
+        "meta": environment_metadata(mock=vars(config), movies=args.movies, workers=args.workers),
+        "ingest": runs,
+        "catalog_read": reads,
+        "catalog": {"movies": stats["movies"], "payload_bytes": stats["payload_bytes"]},
+        "problems": problems,
+    }
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Measure script execution time per UI interaction: a full rerun versus the fragment it reruns
+
+    python -m benchmarks.interactions --iterations 5
+
+AppTest always executes the whole script, which is what every interaction cost
+before the page was split into fragments. The time spent inside the fragment
+that owns the clicked widget, taken from the render timers in api.metrics, is
+what the same interaction costs now that Streamlit reruns only that fragment.
+"""
+import argparse
+import sys
+
+from .harness import (
+    APP_PATH,
+    Measurement,
+    environment_metadata,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig
+
+
+def _button(app, label):
+    for button in app.button:
+        if button.label == label:
+            return button
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def _open_details(app):
+    app.run()
+    _button(app, "View Details").click()
+
+
+def _next_page(app):
+    app.run()
+    _button(app, "Next Page").click()
+
+
+def _add_favorite(app):
+    _open_details(app)
+    app.run()
+    _button(app, "❤️ Add to Favorites").click()
+
+
+def _close_details(app):
+    _open_details(app)
+    app.run()
+    _button(app, "Close Details").click()
+
+
+def _adjust_filter(app):
+    app.run()
+    app.sidebar.radio[0].set_value("Search").run()
+    app.slider[1].set_value((5.0, 10.0))
+
+
+def _remove_favorite(app):
+    _add_favorite(app)
+    app.run()
+    app.sidebar.radio[0].set_value("Favorites").run()
+    _button(app, "Remove").click()
+
+
+# name: (staging function, fragment section rerun by the interaction, fragment executions it takes)
+INTERACTIONS = {
+    "open_details": (_open_details, "fragment:trending", 1),
+    "next_page": (_next_page, "fragment:trending", 2),
+    "add_favorite": (_add_favorite, "fragment:favorite_button", 1),
+    "close_details": (_close_details, "fragment:detail_panel", 2),
+    "adjust_filter": (_adjust_filter, "fragment:filters", 1),
+    "remove_favorite": (_remove_favorite, "fragment:favorites", 2),
+}
+
+
+def _section_totals(section):
+    from api.metrics import RENDER_LATENCY
+
+    state = RENDER_LATENCY.collect().get((section,))
+    if state is None:
+        return 0, 0.0
+    return state[1], state[2]
+
+
+def benchmark_interactions(server, iterations, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for name, (stage, section, executions) in INTERACTIONS.items():
+        full, fragment, errors = [], [], 0
+        for _ in range(iterations):
+            app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+            stage(app)
+            count_before, total_before = _section_totals(section)
+            with Measurement(server) as m:
+                app.run()
+            count_after, total_after = _section_totals(section)
+            if app.exception or count_after == count_before:
+                errors += 1
+                continue
+            full.append(m.elapsed_ms)
+            per_execution = (total_after - total_before) / (count_after - count_before)
+            fragment.append(per_execution * executions * 1000)
+        results[name] = {
+            "section": section,
+            "full_script": summarize(full),
+            "fragment": summarize(fragment),
+            "errors": errors,
+        }
+        before, after = results[name]["full_script"]["p50_ms"], results[name]["fragment"]["p50_ms"]
+        print(f"  {name:<16} full script p50 {before:8.2f} ms   {section:<26} p50 {after:8.2f} ms")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock upstream latency in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run, in seconds")
+    parser.add_argument("--output", default="bench/interactions.json")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(latency=args.latency)
+    server, _ = start_mock_environment(config)
+
+    print("Interactions:")
+    results = {
+        "meta": environment_metadata(mock=vars(config), iterations=args.iterations),
+        "interactions": benchmark_interactions(server, args.iterations, args.timeout),
+    }
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Load-test one app process with many concurrent simulated sessions against a mock TMDb server
+
+    python -m benchmarks.load --sessions 1,2,4,8,16,32 --duration 30 --latency 0.05
+
+Each simulated session is a Streamlit AppTest driven from its own thread through
+the click path Home → Next Page → View Details → Add to Favorites → Search →
+Filters, over and over, for --duration seconds per level. Sessions share the
+process the way they share one `streamlit run` server, including its
+st.cache_resource singletons and caches, which stay warm from level to level.
+The mock server runs in a child process, so CPU is the app's alone. AppTest
+runs the script and builds its output but sends nothing over a websocket, so
+the network and browser side of each interaction is not included.
+
+One session runs unmeasured for --warmup seconds first. For each number of
+sessions this reports throughput (interactions per second),
+latency percentiles per step, upstream requests per interaction, CPU seconds
+per wall second, and RSS growth per session (shared cache growth included).
+The saturation curve is throughput and p95 latency by number of sessions; the
+process is saturated at the first level that adds less than --min-gain
+throughput, or misses --p95-target when one is given.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from .harness import (
+    APP_PATH,
+    REPO_ROOT,
+    configure_environment,
+    current_rss_kb,
+    environment_metadata,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import WORDS
+
+CURVE_WIDTH = 40
+
+
+class MockServerProcess:
+    """The mock TMDb server running in a child process, with the same stats() as the in-process one"""
+
+    def __init__(self, latency, jitter, error_rate):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.mock_tmdb", "--port", str(self.port), "--latency", str(latency),
+             "--jitter", str(jitter), "--error-rate", str(error_rate)],
+            cwd=REPO_ROOT, stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.stats()
+                break
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.stop()
+                    raise RuntimeError("The mock TMDb server did not start")
+                time.sleep(0.05)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/3"
+
+    @property
+    def image_base_url(self):
+        return f"http://127.0.0.1:{self.port}/t/p/"
+
+    def stats(self):
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/__stats", timeout=5) as response:
+            return json.load(response)
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def _click(app, label, index=0):
+    buttons = [button for button in app.button if button.label == label]
+    if not buttons:
+        raise LookupError(f"No button labelled {label!r}")
+    buttons[min(index, len(buttons) - 1)].click().run()
+
+
+def _home(app, rng):
+    app.sidebar.radio[0].set_value("Home").run()
+
+
+def _next_page(app, rng):
+    _click(app, "Next Page")
+
+
+def _view_details(app, rng):
+    _click(app, "View Details", rng.randrange(20))
+
+
+def _add_favorite(app, rng):
+    _click(app, "❤️ Add to Favorites")
+
+
+def _search(app, rng):
+    app.sidebar.radio[0].set_value("Search")
+    app.session_state["search_input"] = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+    app.run()
+
+
+def _filters(app, rng):
+    # Filters are applied to discover results, which show once the search box is empty
+    app.session_state["search_input"] = ""
+    app.slider[1].set_value((rng.choice((5.0, 6.0, 7.0)), 10.0))
+    if any(button.label == "Apply Filters" for button in app.button):
+        _click(app, "Apply Filters")
+    else:
+        app.run()
+
+
+CLICK_PATH = (
+    ("home", _home),
+    ("next_page", _next_page),
+    ("view_details", _view_details),
+    ("add_favorite", _add_favorite),
+    ("search", _search),
+    ("filters", _filters),
+)
+
+
+def share_test_runtime():
+    """Let AppTests run concurrently, as sessions of one server do
+
+    Each AppTest run installs a mock Streamlit runtime as the process-wide instance
+    and clears it when the run ends, which pulls it out from under runs still going
+    in other threads. Runs now fall back to one shared mock runtime when it is gone.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # AppTest cannot drive custom components, so sessions search with the text_input fallback
+    import components.search_bar
+
+    components.search_bar.st_keyup = None
+
+
+def _new_session(timeout):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.run()
+    return app
+
+
+def run_session(index, stop_at, timeout, samples, errors, apps):
+    """Drive one session through the click path until `stop_at`, recording (step, ms) samples
+
+    A step fails with "exception" when the app raised one, and with "harness" when
+    the page it needed to click was not rendered, which AppTest occasionally does
+    to concurrent sessions without the app being at fault.
+    """
+    rng = random.Random(index)
+    # Stagger arrivals so sessions do not move in lockstep
+    time.sleep(rng.uniform(0, 0.5))
+    app = _new_session(timeout)
+    while time.monotonic() < stop_at:
+        for name, step in CLICK_PATH:
+            if time.monotonic() >= stop_at:
+                break
+            started = time.perf_counter()
+            try:
+                step(app, rng)
+                failed = "exception" if app.exception else None
+            except (LookupError, IndexError):
+                failed = "harness"
+            except Exception:
+                failed = "exception"
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if failed:
+                errors[failed][name] = errors[failed].get(name, 0) + 1
+                # Start over as a new visitor, like a user reloading a broken page
+                app = _new_session(timeout)
+                break
+            samples.append((name, elapsed_ms))
+    apps.append(app)
+
+
+def run_level(server, sessions, duration, timeout):
+    gc.collect()
+    rss_before = current_rss_kb()
+    cpu_before = sum(os.times()[:2])
+    upstream_before = server.stats()["requests"]
+    started = time.monotonic()
+
+    stop_at = started + duration
+    samples, errors, apps = [], [{"exception": {}, "harness": {}} for _ in range(sessions)], []
+    session_samples = [[] for _ in range(sessions)]
+    threads = [
+        threading.Thread(target=run_session, args=(i, stop_at, timeout, session_samples[i], errors[i], apps),
+                         name=f"load-session-{i}")
+        for i in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    wall = time.monotonic() - started
+    cpu = sum(os.times()[:2]) - cpu_before
+    # Measured while every session is still alive
+    rss_after = current_rss_kb()
+    upstream = server.stats()["requests"] - upstream_before
+    del apps
+
+    for per_session in session_samples:
+        samples.extend(per_session)
+    latencies = [ms for _, ms in samples]
+    steps = {name: summarize([ms for step, ms in samples if step == name]) for name, _ in CLICK_PATH}
+    error_counts = {
+        kind: {name: sum(e[kind].get(name, 0) for e in errors) for name, _ in CLICK_PATH}
+        for kind in ("exception", "harness")
+    }
+    interactions = len(samples)
+    return {
+        "sessions": sessions,
+        "seconds": wall,
+        "interactions": interactions,
+        "throughput_per_second": interactions / wall if wall else 0.0,
+        "latency": summarize(latencies),
+        "steps": steps,
+        "errors": error_counts,
+        "upstream_requests": upstream,
+        "upstream_per_interaction": upstream / interactions if interactions else 0.0,
+        "cpu_seconds": cpu,
+        "cpu_utilization": cpu / wall if wall else 0.0,
+        "rss_growth_kb": rss_after - rss_before,
+        "rss_per_session_kb": (rss_after - rss_before) / sessions,
+    }
+
+
+def saturation_point(levels, min_gain, p95_target_ms):
+    """Get the first number of sessions that adds less than `min_gain` throughput or misses a p95 target"""
+    previous = None
+    for level in levels:
+        if p95_target_ms is not None and level["latency"]["p95_ms"] > p95_target_ms:
+            return level["sessions"]
+        if previous is not None and level["throughput_per_second"] < previous["throughput_per_second"] * (1 + min_gain):
+            return level["sessions"]
+        previous = level
+    return None
+
+
+def print_curve(levels, saturated_at):
+    peak = max((level["throughput_per_second"] for level in levels), default=0.0) or 1.0
+    print(f"\n{'sessions':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'upstream':>9} {'cpu':>6} "
+          f"{'KiB/session':>12}  throughput")
+    for level in levels:
+        bar = "#" * round(level["throughput_per_second"] / peak * CURVE_WIDTH)
+        marker = "  <- saturated" if level["sessions"] == saturated_at else ""
+        print(f"{level['sessions']:>8} {level['throughput_per_second']:>8.2f} {level['latency']['p50_ms']:>9.1f} "
+              f"{level['latency']['p95_ms']:>9.1f} {level['upstream_per_interaction']:>9.2f} "
+              f"{level['cpu_utilization']:>6.2f} {level['rss_per_session_kb']:>12.0f}  {bar}{marker}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="Comma-separated numbers of concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds each level runs")
+    parser.add_argument("--warmup", type=float, default=10,
+                        help="Seconds one unmeasured session runs first, warming the shared caches")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run, in seconds")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput gain below which a level saturates")
+    parser.add_argument("--p95-target", type=float, default=None,
+                        help="p95 interaction latency target in ms; a level that misses it is saturated")
+    parser.add_argument("--output", default="bench/load.json")
+    args = parser.parse_args(argv)
+
+    server = MockServerProcess(args.latency, args.jitter, args.error_rate)
+    try:
+        configure_environment(server, env={"TMDB_TRENDING_SNAPSHOT_REFRESH_SECONDS": "0"})
+        share_test_runtime()
+        if args.warmup > 0:
+            run_level(server, 1, args.warmup, args.timeout)
+        levels = []
+        for sessions in (int(n) for n in args.sessions.split(",")):
+            level = run_level(server, sessions, args.duration, args.timeout)
+            levels.append(level)
+            print(f"  {sessions:>4} sessions: {level['throughput_per_second']:7.2f} interactions/s   "
+                  f"p95 {level['latency']['p95_ms']:8.1f} ms   exceptions {sum(level['errors']['exception'].values())}"
+                  f"   harness misses {sum(level['errors']['harness'].values())}")
+    finally:
+        server.stop()
+
+    saturated_at = saturation_point(levels, args.min_gain, args.p95_target)
+    print_curve(levels, saturated_at)
+    if saturated_at is None:
+        print("\nNot saturated at the levels tried; try more sessions")
+    else:
+        print(f"\nSaturated at {saturated_at} sessions")
+
+    results = {
+        "meta": environment_metadata(**vars(args)),
+        "levels": {str(level["sessions"]): level for level in levels},
+        "curve": [
+            {"sessions": level["sessions"], "throughput_per_second": level["throughput_per_second"],
+             "p95_ms": level["latency"]["p95_ms"], "p99_ms": level["latency"]["p99_ms"]}
+            for level in levels
+        ],
+        "saturated_at": saturated_at,
+    }
+    problems = [
+        f"the app raised {count} exceptions with {level['sessions']} sessions"
+        for level in levels if (count := sum(level["errors"]["exception"].values()))
+    ]
+    results["problems"] = problems
+    write_results(results, args.output)
+    print(f"Wrote {args.output}")
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
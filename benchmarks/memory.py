@@ -0,0 +1,85 @@
+"""Measure per-session memory held by favorites as raw TMDb dicts, Movie summaries or ids
+
+    python -m benchmarks.memory --sessions 200 --favorites 25
+
+Each favorite is decoded from JSON afresh, as it is after a disk cache hit or an
+upstream fetch, so sessions never share objects. Retained memory is measured
+with tracemalloc after the decoded payloads have been dropped.
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+
+from .harness import REPO_ROOT, write_results, environment_metadata
+from .mock_tmdb import MockConfig, make_details, make_movie
+
+DETAIL_SECTIONS = ("credits", "videos", "recommendations", "similar")
+
+
+def build_sessions(payloads, sessions, favorites, convert):
+    """Build every session's favorites list, returning the sessions and KiB retained per session"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    state = []
+    for s in range(sessions):
+        state.append([convert(json.loads(payloads[(s + f) % len(payloads)])) for f in range(favorites)])
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    return state, retained / sessions / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--favorites", type=int, default=25)
+    parser.add_argument("--cast-size", type=int, default=20)
+    parser.add_argument("--overview-words", type=int, default=40)
+    parser.add_argument("--output", default="bench/memory.json")
+    args = parser.parse_args(argv)
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from api.models import Movie
+
+    config = MockConfig(cast_size=args.cast_size, overview_words=args.overview_words)
+    movie_ids = range(1, 101)
+    details = [json.dumps(make_details(movie_id, config, DETAIL_SECTIONS)) for movie_id in movie_ids]
+    results = [json.dumps(make_movie(movie_id, config)) for movie_id in movie_ids]
+
+    # Before: the details modal stored the whole payload and cards stored the result dict
+    variants = {
+        "details_dict": (details, lambda data: data),
+        "result_dict": (results, lambda data: data),
+        "details_summary": (details, Movie.from_dict),
+        "result_summary": (results, Movie.from_dict),
+        # Now: a FavoritesStore keeps only ids and hydrates them from the shared cache
+        "ids": (details, lambda data: data["id"]),
+    }
+
+    tracemalloc.start()
+    report = {}
+    for name, (payloads, convert) in variants.items():
+        state, per_session_kb = build_sessions(payloads, args.sessions, args.favorites, convert)
+        report[name] = {"per_session_kb": per_session_kb, "per_favorite_bytes": per_session_kb * 1024 / args.favorites}
+        del state
+    tracemalloc.stop()
+
+    for before, after in (("details_dict", "details_summary"), ("result_dict", "result_summary"),
+                          ("details_dict", "ids")):
+        reduction = 1 - report[after]["per_session_kb"] / report[before]["per_session_kb"]
+        report[after]["reduction"] = reduction
+
+    print(f"{'favorites as':<18} {'KiB/session':>12} {'B/favorite':>11} {'reduction':>10}")
+    for name, row in report.items():
+        reduction = f"{row['reduction']:.1%}" if "reduction" in row else ""
+        print(f"{name:<18} {row['per_session_kb']:>12.1f} {row['per_favorite_bytes']:>11.0f} {reduction:>10}")
+
+    write_results({"meta": environment_metadata(**vars(args)), "favorites": report}, args.output)
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""Local stand-in for the TMDb API and image CDN, for benchmarks and load tests
+
+Responses are synthetic but deterministic and shaped like TMDb's. Latency, error
+rate and payload sizes are configurable, and the server counts requests and bytes
+so harnesses can measure upstream amplification.
+
+    python -m benchmarks.mock_tmdb --port 8765 --latency 0.05 --error-rate 0.01
+
+Point the app at it with:
+
+    TMDB_BASE_URL=http://127.0.0.1:8765/3 TMDB_IMAGE_BASE_URL=http://127.0.0.1:8765/t/p/ streamlit run app.py
+"""
+import argparse
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+GENRES = [
+    {"id": 28, "name": "Action"}, {"id": 12, "name": "Adventure"}, {"id": 16, "name": "Animation"},
+    {"id": 35, "name": "Comedy"}, {"id": 80, "name": "Crime"}, {"id": 99, "name": "Documentary"},
+    {"id": 18, "name": "Drama"}, {"id": 10751, "name": "Family"}, {"id": 14, "name": "Fantasy"},
+    {"id": 36, "name": "History"}, {"id": 27, "name": "Horror"}, {"id": 10402, "name": "Music"},
+    {"id": 9648, "name": "Mystery"}, {"id": 10749, "name": "Romance"}, {"id": 878, "name": "Science Fiction"},
+    {"id": 10770, "name": "TV Movie"}, {"id": 53, "name": "Thriller"}, {"id": 10752, "name": "War"},
+    {"id": 37, "name": "Western"},
+]
+LANGUAGES = ["en", "en", "en", "fr", "es", "de", "it", "ja", "ko", "zh", "hi", "ru"]
+WORDS = [
+    "night", "dark", "love", "last", "king", "city", "dead", "star", "war", "return", "shadow", "fire",
+    "secret", "lost", "blood", "dream", "house", "river", "ghost", "summer", "winter", "storm", "queen",
+    "road", "island", "machine", "heart", "silent", "golden", "hunter", "empire", "garden", "midnight",
+]
+NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+SURNAMES = ["Smith", "Garcia", "Kim", "Novak", "Okafor", "Rossi", "Tanaka", "Silva", "Müller", "Dubois"]
+MAX_MOVIE_ID = 1_000_000
+
+
+class MockConfig:
+    """Knobs for the mock server; can be changed while it is running"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, results_per_page=20, total_pages=50,
+                 cast_size=20, related_size=20, overview_words=40, seed=0, hang=0.0, people=5_000_000):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.results_per_page = results_per_page
+        self.total_pages = total_pages
+        self.cast_size = cast_size
+        self.related_size = related_size
+        self.overview_words = overview_words
+        self.seed = seed
+        # Seconds every API request stalls before it is answered, simulating a hung upstream
+        self.hang = hang
+        # Credits draw from this many distinct people; fewer means more of them shared between movies
+        self.people = people
+
+
+def _rng(*parts):
+    return random.Random(zlib.crc32(json.dumps(parts).encode("utf-8")))
+
+
+def make_movie(movie_id, config):
+    """Build a deterministic search-result shaped movie"""
+    rng = _rng("movie", movie_id, config.seed)
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+    return {
+        "adult": False,
+        "backdrop_path": f"/backdrop{movie_id}.jpg",
+        "genre_ids": [genre["id"] for genre in rng.sample(GENRES, rng.randint(1, 3))],
+        "id": movie_id,
+        "original_language": rng.choice(LANGUAGES),
+        "original_title": title,
+        "overview": " ".join(rng.choice(WORDS) for _ in range(config.overview_words)).capitalize() + ".",
+        "popularity": round(rng.uniform(1, 500), 3),
+        "poster_path": f"/poster{movie_id}.jpg" if rng.random() > 0.05 else None,
+        "release_date": f"{rng.randint(1950, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "title": title,
+        "video": False,
+        "vote_average": round(rng.uniform(3, 9), 1),
+        "vote_count": rng.randint(0, 30000),
+    }
+
+
+def make_page(seed_parts, page, config):
+    """Build a page of results whose movie ids depend on the query and page"""
+    rng = _rng("page", seed_parts, page, config.seed)
+    results = [make_movie(rng.randint(1, MAX_MOVIE_ID), config) for _ in range(config.results_per_page)]
+    return {
+        "page": page,
+        "results": results,
+        "total_pages": config.total_pages,
+        "total_results": config.total_pages * config.results_per_page,
+    }
+
+
+def make_person(person_id, config):
+    """Build a person, the same whichever movie's credits they appear in"""
+    rng = _rng("person", person_id, config.seed)
+    return {
+        "id": person_id,
+        "name": f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+        "profile_path": f"/profile{person_id}.jpg" if rng.random() > 0.1 else None,
+    }
+
+
+def make_credits(movie_id, config):
+    rng = _rng("credits", movie_id, config.seed)
+    cast = [{
+        **make_person(rng.randint(1, config.people), config),
+        "character": f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+        "order": i,
+    } for i in range(config.cast_size)]
+    crew = [{
+        **make_person(rng.randint(1, config.people), config),
+        "job": job,
+        "department": department,
+    } for job, department in (("Director", "Directing"), ("Screenplay", "Writing"), ("Producer", "Production"))]
+    return {"id": movie_id, "cast": cast, "crew": crew}
+
+
+def make_videos(movie_id, config):
+    return {"id": movie_id, "results": [
+        {"key": f"trailer{movie_id}", "name": "Official Trailer", "site": "YouTube", "type": "Trailer"},
+        {"key": f"teaser{movie_id}", "name": "Teaser", "site": "YouTube", "type": "Teaser"},
+    ]}
+
+
+def make_related(movie_id, kind, config):
+    rng = _rng(kind, movie_id, config.seed)
+    return {
+        "page": 1,
+        "results": [make_movie(rng.randint(1, MAX_MOVIE_ID), config) for _ in range(config.related_size)],
+        "total_pages": 1,
+        "total_results": config.related_size,
+    }
+
+
+def make_keywords(movie_id, config):
+    rng = _rng("keywords", movie_id, config.seed)
+    return {"id": movie_id, "keywords": [
+        {"id": WORDS.index(word) + 1, "name": word} for word in rng.sample(WORDS, 5)
+    ]}
+
+
+SECTION_BUILDERS = {
+    "credits": make_credits,
+    "videos": make_videos,
+    "keywords": make_keywords,
+    "similar": lambda movie_id, config: make_related(movie_id, "similar", config),
+    "recommendations": lambda movie_id, config: make_related(movie_id, "recommendations", config),
+}
+
+
+def make_details(movie_id, config, append_to_response=()):
+    """Build a movie details payload with any appended sections"""
+    movie = make_movie(movie_id, config)
+    rng = _rng("details", movie_id, config.seed)
+    genre_names = {genre["id"]: genre["name"] for genre in GENRES}
+    details = {k: v for k, v in movie.items() if k != "genre_ids"}
+    details.update({
+        "genres": [{"id": genre_id, "name": genre_names[genre_id]} for genre_id in movie["genre_ids"]],
+        "runtime": rng.randint(75, 190),
+        "status": "Released",
+        "tagline": " ".join(rng.choice(WORDS) for _ in range(6)).capitalize() + ".",
+        "budget": rng.randint(0, 200) * 1_000_000,
+        "revenue": rng.randint(0, 900) * 1_000_000,
+    })
+    for section in append_to_response:
+        builder = SECTION_BUILDERS.get(section)
+        if builder is not None:
+            details[section] = builder(movie_id, config)
+    return details
+
+
+def write_export(path, count, config, changed=0):
+    """Write a TMDb daily ID export fixture (gzipped JSON lines) for `count` movies
+
+    The first `changed` movies get a much higher popularity, as a later day's export would.
+    """
+    import gzip
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for movie_id in range(1, count + 1):
+            movie = make_movie(movie_id, config)
+            popularity = movie["popularity"] * 3 + 10 if movie_id <= changed else movie["popularity"]
+            f.write(json.dumps({"adult": False, "id": movie_id, "original_title": movie["original_title"],
+                                "popularity": popularity, "video": False}) + "\n")
+    return path
+
+
+_image_cache = {}
+_image_lock = threading.Lock()
+
+
+def make_image(size):
+    """Build a real (tiny-palette) PNG roughly the pixel size of a TMDb size bucket"""
+    with _image_lock:
+        data = _image_cache.get(size)
+        if data is None:
+            from PIL import Image
+
+            width = int(size[1:]) if size[1:].isdigit() else 500
+            height = width * 3 // 2 if size.startswith("w") else width
+            if size.startswith("h"):
+                width = width * 2 // 3
+            buffer = io.BytesIO()
+            Image.new("RGB", (width, height), (90, 60, 120)).save(buffer, format="PNG")
+            data = _image_cache[size] = buffer.getvalue()
+        return data
+
+
+def endpoint_family(path):
+    """Get the family a request path is counted under, e.g. "movie" for /3/movie/550"""
+    path = urlparse(path).path
+    if path.startswith("/t/p/"):
+        return "image"
+    if path.startswith("/3/"):
+        return path.split("/")[2]
+    return "other"
+
+
+class MockTMDbHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        self.server.record(self.path, status, len(body))
+
+    def _send_json(self, payload):
+        self._send(200, json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/__stats":
+            body = json.dumps(server.stats()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        delay = config.latency + config.hang + random.uniform(0, config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if config.error_rate and random.random() < config.error_rate:
+            if random.random() < 0.5:
+                self._send(429, b'{"status_code":25}', headers={"Retry-After": "0"})
+            else:
+                self._send(500, b'{"status_code":11}')
+            return
+
+        image = re.fullmatch(r"/t/p/(\w+)/(.+)", url.path)
+        if image:
+            etag = f'"{image.group(1)}-{zlib.crc32(image.group(2).encode())}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+            else:
+                self._send(200, make_image(image.group(1)), "image/png", {"ETag": etag})
+            return
+
+        path = url.path[len("/3"):] if url.path.startswith("/3/") else url.path
+        page = int(query.get("page", 1))
+
+        trending = re.fullmatch(r"/trending/movie/(day|week)", path)
+        movie = re.fullmatch(r"/movie/(\d+)(?:/(\w+))?", path)
+        if trending:
+            self._send_json(make_page(("trending", trending.group(1)), page, config))
+        elif path == "/search/movie":
+            self._send_json(make_page(("search", query.get("query", "").lower()), page, config))
+        elif path == "/discover/movie":
+            filters = sorted((k, v) for k, v in query.items() if k not in ("api_key", "page", "language"))
+            self._send_json(make_page(("discover", filters), page, config))
+        elif path == "/genre/movie/list":
+            self._send_json({"genres": GENRES})
+        elif movie and movie.group(2) is None:
+            sections = [s for s in query.get("append_to_response", "").split(",") if s]
+            self._send_json(make_details(int(movie.group(1)), config, sections))
+        elif movie and movie.group(2) in SECTION_BUILDERS:
+            self._send_json(SECTION_BUILDERS[movie.group(2)](int(movie.group(1)), config))
+        else:
+            self._send(404, b'{"status_code":34,"status_message":"The resource you requested could not be found."}')
+
+
+class MockTMDbServer(ThreadingHTTPServer):
+    """Threaded HTTP server serving synthetic TMDb responses and counting traffic"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), MockTMDbHandler)
+        self.config = config or MockConfig()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/3"
+
+    @property
+    def image_base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/t/p/"
+
+    def record(self, path, status, size):
+        family = endpoint_family(path)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes"] += size
+            self._stats["by_endpoint"][family] = self._stats["by_endpoint"].get(family, 0) + 1
+            if status >= 400:
+                self._stats["errors"] += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"requests": 0, "bytes": 0, "errors": 0, "by_endpoint": {}}
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "by_endpoint": dict(self._stats["by_endpoint"])}
+
+    def start(self):
+        """Serve on a background thread and return self"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-tmdb", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the TMDb API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/500")
+    parser.add_argument("--hang", type=float, default=0.0, help="Seconds every request stalls, simulating an outage")
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--cast-size", type=int, default=20)
+    parser.add_argument("--overview-words", type=int, default=40)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        results_per_page=args.results_per_page,
+        cast_size=args.cast_size,
+        overview_words=args.overview_words,
+        hang=args.hang,
+    )
+    server = MockTMDbServer(args.host, args.port, config)
+    print(f"Mock TMDb API at {server.base_url}, images at {server.image_base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
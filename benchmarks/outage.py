@@ -0,0 +1,149 @@
+"""Simulate TMDb outages against the mock server and check that sessions keep getting answers
+
+    python -m benchmarks.outage --requests 40 --deadline 1
+
+The cache is warmed and then expired, so every request needs upstream. The mock
+server then hangs, recovers, fails every request and recovers again. During an
+outage each call must return within the request deadline, with the last known
+good response marked stale; after it, the breaker's trial request must close the
+circuit so fresh responses come back.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from .harness import (
+    Measurement,
+    environment_metadata,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig
+
+# Each call takes (service, iteration); inputs repeat so all of them are warmed first
+WORKLOAD = (
+    lambda service, i: service.get_trending_movies("week", page=1 + i % 5),
+    lambda service, i: service.get_movie_details(100 + i % 10, sections=()),
+    lambda service, i: service.search_movies(f"night {i % 5}"),
+)
+DISTINCT_INPUTS = 10
+
+
+def expire_all(cache):
+    """Store every cached response again with no lifetime left, as if TMDb had not been reached for weeks"""
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        rows = conn.execute("SELECT key, endpoint, payload FROM responses").fetchall()
+    finally:
+        conn.close()
+    for key, endpoint, payload in rows:
+        cache.set(key, endpoint, json.loads(payload), ttl=0, stale_ttl=0)
+    return len(rows)
+
+
+def run_phase(server, service, requests):
+    from api.cache import stale_since
+
+    latencies, stale, missing = [], 0, 0
+    with Measurement(server) as total:
+        for i in range(requests):
+            call = WORKLOAD[i % len(WORKLOAD)]
+            with Measurement() as m:
+                data = call(service, i // len(WORKLOAD))
+            latencies.append(m.elapsed_ms)
+            if data is None:
+                missing += 1
+            elif stale_since(data) is not None:
+                stale += 1
+    return summarize(
+        latencies,
+        stale_responses=stale,
+        missing_responses=missing,
+        upstream_requests=total.upstream_requests,
+        open_circuits=service.get_request_stats()["open_circuits"],
+    )
+
+
+def wait_for_recovery(service, timeout):
+    """Wait until every circuit has closed, returning the seconds it took or None"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        # Foreground calls keep being served from the cache while the trial request runs
+        for i in range(len(WORKLOAD)):
+            WORKLOAD[i](service, 0)
+        if not service.get_request_stats()["open_circuits"]:
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="Calls per phase")
+    parser.add_argument("--deadline", type=float, default=1.0, help="Request deadline in seconds")
+    parser.add_argument("--read-timeout", type=float, default=2.0)
+    parser.add_argument("--failures", type=int, default=3, help="Failures before a circuit opens")
+    parser.add_argument("--reset", type=float, default=1.0, help="Seconds before the first trial request")
+    parser.add_argument("--recovery-timeout", type=float, default=30.0)
+    parser.add_argument("--output", default="bench/outage.json")
+    args = parser.parse_args(argv)
+
+    config = MockConfig()
+    server, _ = start_mock_environment(config, env={
+        "TMDB_REQUEST_DEADLINE_SECONDS": str(args.deadline),
+        "TMDB_HTTP_READ_TIMEOUT": str(args.read_timeout),
+        "TMDB_HTTP_MAX_RETRIES": "1",
+        "TMDB_BREAKER_FAILURES": str(args.failures),
+        "TMDB_BREAKER_RESET_SECONDS": str(args.reset),
+        "TMDB_PREFETCH_ENABLED": "0",
+    })
+
+    from api.tmdb_service import TMDbService
+
+    service = TMDbService()
+    for i in range(DISTINCT_INPUTS * len(WORKLOAD)):
+        WORKLOAD[i % len(WORKLOAD)](service, i // len(WORKLOAD))
+    expired = expire_all(service.cache)
+
+    phases = {}
+    problems = []
+    # A little slack over the deadline for thread hand-off and the stale copy
+    budget_ms = args.deadline * 1000 + 250
+    for name, hang, error_rate in (("hanging", 60.0, 0.0), ("failing", 0.0, 1.0)):
+        config.hang, config.error_rate = hang, error_rate
+        phases[name] = run_phase(server, service, args.requests)
+        config.hang, config.error_rate = 0.0, 0.0
+        recovered_after = wait_for_recovery(service, args.recovery_timeout)
+        phases[name]["recovered_after_seconds"] = recovered_after
+        phases[f"after_{name}"] = run_phase(server, service, args.requests)
+
+        phase = phases[name]
+        print(f"  {name:<8} p50 {phase['p50_ms']:8.2f} ms   max {phase['max_ms']:8.2f} ms   "
+              f"stale {phase['stale_responses']:>3}/{args.requests}   missing {phase['missing_responses']:>3}   "
+              f"recovered after {recovered_after if recovered_after is not None else float('nan'):.1f}s")
+        if phase["max_ms"] > budget_ms:
+            problems.append(f"a call took {phase['max_ms']:.0f} ms while upstream was {name}")
+        if phase["missing_responses"]:
+            problems.append(f"{phase['missing_responses']} calls got nothing while upstream was {name}")
+        if recovered_after is None:
+            problems.append(f"circuits did not close after upstream stopped {name}")
+        if phases[f"after_{name}"]["stale_responses"]:
+            problems.append(f"stale responses were still served after upstream stopped {name}")
+
+    results = {
+        "meta": environment_metadata(expired_responses=expired, **vars(args)),
+        "outage": phases,
+        "problems": problems,
+    }
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Benchmark every TMDbService method and every app page against a mock TMDb server
+
+    python -m benchmarks.run --output bench/results.json
+    python -m benchmarks.run --latency 0.08 --error-rate 0.02 --baseline bench/results.json
+
+Service methods are measured cold (caches cleared before each call) and warm.
+Pages are rendered through Streamlit's AppTest in a fresh session per iteration.
+With --baseline, p95 latencies are compared and the exit status is 1 on a regression.
+"""
+import argparse
+import sys
+
+from .harness import (
+    APP_PATH,
+    Measurement,
+    compare_results,
+    current_rss_kb,
+    environment_metadata,
+    report_comparison,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig
+
+# Each service benchmark takes (service, iteration) so cold runs can vary their inputs
+SERVICE_CALLS = {
+    "get_genres": lambda service, i: service.get_genres(),
+    "get_trending_movies": lambda service, i: service.get_trending_movies("week", page=1 + i % 5),
+    "search_movies": lambda service, i: service.search_movies(f"night {i % 10}"),
+    "get_movie_details": lambda service, i: service.get_movie_details(100 + i),
+    # What the detail view waits for before its header paints, and what each lazily filled panel costs
+    "get_movie_details_header": lambda service, i: service.get_movie_details(100 + i, sections=()),
+    "get_movie_section_credits": lambda service, i: service.get_movie_section(100 + i, "credits"),
+    "get_movie_section_videos": lambda service, i: service.get_movie_section(100 + i, "videos"),
+    "get_similar_movies": lambda service, i: service.get_similar_movies(100 + i),
+    # A page of 20 result cards, hydrated one movie at a time and on the bounded pool
+    "hydrate_page_serial": lambda service, i: [
+        service.get_movie_details(movie_id, sections=("credits",)) for movie_id in range(5000 + 20 * i, 5020 + 20 * i)
+    ],
+    "hydrate_page_pooled": lambda service, i: [
+        future.result() for future in service.hydrate_movies(range(5000 + 20 * i, 5020 + 20 * i)).values()
+    ],
+    "discover_movies": lambda service, i: service.discover_movies({"with_genres": 28, "page": 1 + i % 5}),
+    "get_movie_poster_image": lambda service, i: service.get_movie_poster_image(f"/poster{i}.jpg", width=300),
+    "get_profile_image": lambda service, i: service.get_profile_image(f"/profile{i}.jpg", width=150),
+}
+
+
+def clear_caches(service):
+    if service.cache is not None:
+        service.cache.clear()
+    service.images.clear()
+
+
+def measure_calls(server, func, iterations, before=None):
+    """Run `func(i)` repeatedly, returning a summary of latency, traffic and allocations"""
+    latencies, requests, transferred, allocations = [], [], [], []
+    for i in range(iterations):
+        if before is not None:
+            before()
+        with Measurement(server) as m:
+            func(i)
+        latencies.append(m.elapsed_ms)
+        requests.append(m.upstream_requests)
+        transferred.append(m.upstream_bytes)
+        allocations.append(m.peak_alloc_kb)
+    return summarize(
+        latencies,
+        upstream_requests_per_call=sum(requests) / iterations,
+        bytes_per_call=sum(transferred) / iterations,
+        peak_alloc_kb=max(allocations),
+    )
+
+
+def benchmark_service(server, iterations):
+    from api.tmdb_service import TMDbService
+
+    service = TMDbService()
+    results = {}
+    for name, call in SERVICE_CALLS.items():
+        cold = measure_calls(server, lambda i: call(service, i), iterations, before=lambda: clear_caches(service))
+        # Warm: repeat the same inputs once the caches hold them
+        call(service, 0)
+        warm = measure_calls(server, lambda i: call(service, 0), iterations)
+        results[name] = {"cold": cold, "warm": warm}
+        print(f"  {name:<26} cold p95 {cold['p95_ms']:8.2f} ms   warm p95 {warm['p95_ms']:8.2f} ms")
+    return results
+
+
+def _click(app, label):
+    """Click the first button with the given label"""
+    for button in app.button:
+        if button.label == label:
+            return button.click()
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def _home(app):
+    pass
+
+
+def _search(app):
+    app.run()
+    app.sidebar.radio[0].set_value("Search").run()
+    # Search runs as the query is typed, so the measured rerun is the one that sees it
+    app.session_state["search_input"] = "night"
+
+
+def _details(app):
+    app.run()
+    _click(app, "View Details")
+
+
+def _favorites(app):
+    from api.favorites import FavoritesStore, MemoryFavoritesBackend
+    from api.tmdb_service import TMDbService
+
+    trending = TMDbService().get_trending_movies("week")
+    app.run()
+    favorites = FavoritesStore("benchmark", MemoryFavoritesBackend())
+    for movie in trending["results"][:10]:
+        favorites.add(movie["id"])
+    app.session_state["favorites"] = favorites
+    app.sidebar.radio[0].set_value("Favorites")
+
+
+# Each page scenario navigates a fresh session and stages the interaction to measure;
+# the harness then times the rerun that renders it
+PAGE_SCENARIOS = {
+    "home": _home,
+    "search": _search,
+    "details": _details,
+    "favorites": _favorites,
+}
+
+
+def benchmark_pages(server, iterations, timeout):
+    from streamlit.testing.v1 import AppTest
+    import components.search_bar
+
+    # AppTest cannot drive custom components, so search with the text_input fallback
+    components.search_bar.st_keyup = None
+    results = {}
+    for name, scenario in PAGE_SCENARIOS.items():
+        latencies, requests, transferred, allocations, errors = [], [], [], [], 0
+        rss_before = current_rss_kb()
+        for _ in range(iterations):
+            app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+            scenario(app)
+            with Measurement(server) as m:
+                app.run()
+            if app.exception:
+                errors += 1
+            latencies.append(m.elapsed_ms)
+            requests.append(m.upstream_requests)
+            transferred.append(m.upstream_bytes)
+            allocations.append(m.peak_alloc_kb)
+        results[name] = summarize(
+            latencies,
+            upstream_requests_per_render=sum(requests) / iterations,
+            bytes_per_render=sum(transferred) / iterations,
+            peak_alloc_kb=max(allocations),
+            rss_growth_kb=current_rss_kb() - rss_before,
+            errors=errors,
+        )
+        print(f"  {name:<26} p50 {results[name]['p50_ms']:8.2f} ms   p95 {results[name]['p95_ms']:8.2f} ms"
+              f"   upstream/render {results[name]['upstream_requests_per_render']:.1f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--page-iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--results-per-page", type=int, default=20)
+    parser.add_argument("--cast-size", type=int, default=20)
+    parser.add_argument("--overview-words", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run, in seconds")
+    parser.add_argument("--skip-pages", action="store_true", help="Only benchmark service methods")
+    parser.add_argument("--output", default="bench/results.json")
+    parser.add_argument("--baseline", help="Previous results JSON to compare p95 latencies against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed relative p95 increase")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        results_per_page=args.results_per_page,
+        cast_size=args.cast_size,
+        overview_words=args.overview_words,
+    )
+    server, cache_dir = start_mock_environment(config)
+
+    print("Service methods:")
+    results = {
+        "meta": environment_metadata(mock=vars(config), iterations=args.iterations,
+                                     page_iterations=args.page_iterations),
+        "service": benchmark_service(server, args.iterations),
+    }
+    if not args.skip_pages:
+        print("Pages:")
+        results["pages"] = benchmark_pages(server, args.page_iterations, args.timeout)
+    results["meta"]["rss_kb"] = current_rss_kb()
+
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        import json
+
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        ok = report_comparison(compare_results(results, baseline, args.max_regression))
+        if not ok:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
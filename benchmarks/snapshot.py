@@ -0,0 +1,136 @@
+"""Render Home's trending pages from the trending snapshot against a mock TMDb server
+
+    python -m benchmarks.snapshot --pages 5 --renders 200 --latency 0.05
+
+Times one Home render (a trending page and its posters) from a cold cache, from
+the warm response and image caches, and from the published snapshot, which must
+make no upstream requests. While readers keep opening the snapshot, it is
+republished repeatedly; every reader must see a complete snapshot.
+"""
+import argparse
+import os
+import sys
+import threading
+
+from .harness import (
+    Measurement,
+    environment_metadata,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig
+
+GRID_POSTER_WIDTH = 300
+
+
+def render_home(service, time_window, page, from_snapshot):
+    """Fetch what one Home render needs: a trending page and its posters"""
+    from api.config import POSTER_SIZES
+
+    data = service.get_trending_movies(time_window, page=page, from_snapshot=from_snapshot)
+    for movie in data["results"]:
+        if from_snapshot:
+            service.get_movie_poster_image(movie.get("poster_path"), width=GRID_POSTER_WIDTH)
+        else:
+            # The image caches, as get_movie_poster_image uses them when there is no snapshot
+            service._get_image(movie.get("poster_path"), POSTER_SIZES, GRID_POSTER_WIDTH, (500, 750))
+    return data
+
+
+def run_renders(server, service, renders, pages, from_snapshot):
+    latencies = []
+    with Measurement(server) as total:
+        for i in range(renders):
+            with Measurement() as m:
+                render_home(service, ("day", "week")[i % 2], 1 + (i // 2) % pages, from_snapshot)
+            latencies.append(m.elapsed_ms)
+    return summarize(latencies, upstream_requests=total.upstream_requests)
+
+
+def check_atomic_publish(path, service, pages, publishes):
+    """Republish the snapshot while readers open it, counting readers that saw a broken file"""
+    from api.trending_snapshot import TrendingSnapshot, build_snapshot
+
+    stop = threading.Event()
+    counts = {"reads": 0, "errors": 0}
+
+    def read():
+        while not stop.is_set():
+            try:
+                snapshot = TrendingSnapshot(path)
+                if len(snapshot.pages) != pages * 2:
+                    raise ValueError("incomplete snapshot")
+                counts["reads"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for _ in range(publishes):
+        build_snapshot(service, path, pages=pages)
+    stop.set()
+    for reader in readers:
+        reader.join()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5, help="Trending pages per time window")
+    parser.add_argument("--renders", type=int, default=200)
+    parser.add_argument("--publishes", type=int, default=20, help="Republishes during the atomicity check")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock upstream latency in seconds")
+    parser.add_argument("--output", default="bench/snapshot.json")
+    args = parser.parse_args(argv)
+
+    config = MockConfig(latency=args.latency)
+    server, cache_dir = start_mock_environment(config, env={
+        "TMDB_TRENDING_SNAPSHOT_PAGES": str(args.pages),
+        "TMDB_TRENDING_SNAPSHOT_REFRESH_SECONDS": "0",
+        "TMDB_PREFETCH_ENABLED": "0",
+    })
+
+    from api.tmdb_service import TMDbService
+    from api.trending_snapshot import TRENDING_SNAPSHOT_FILE, build_snapshot
+
+    service = TMDbService()
+    results = {"renders": {}}
+    results["renders"]["cold"] = run_renders(server, service, args.pages * 2, args.pages, False)
+    results["renders"]["warm_cache"] = run_renders(server, service, args.renders, args.pages, False)
+
+    with Measurement(server) as m:
+        published = build_snapshot(service, pages=args.pages)
+    results["build"] = {
+        "pages": published,
+        "seconds": m.elapsed_ms / 1000,
+        "bytes": os.path.getsize(TRENDING_SNAPSHOT_FILE),
+        "upstream_requests": m.upstream_requests,
+    }
+    results["renders"]["snapshot"] = run_renders(server, service, args.renders, args.pages, True)
+    results["publish"] = check_atomic_publish(TRENDING_SNAPSHOT_FILE, service, args.pages, args.publishes)
+
+    for name, summary in results["renders"].items():
+        print(f"  {name:<11} p50 {summary['p50_ms']:8.2f} ms   p95 {summary['p95_ms']:8.2f} ms   "
+              f"upstream {summary['upstream_requests']:>5}")
+    print(f"  snapshot: {published} pages, {results['build']['bytes'] / 1024:.0f} KiB, "
+          f"built in {results['build']['seconds']:.2f}s; {results['publish']['reads']} reads during "
+          f"{args.publishes} republishes, {results['publish']['errors']} broken")
+
+    problems = []
+    if results["renders"]["snapshot"]["upstream_requests"]:
+        problems.append("rendering from the snapshot made upstream requests")
+    if results["publish"]["errors"]:
+        problems.append("readers saw an incomplete snapshot while it was republished")
+
+    results = {"meta": environment_metadata(cache_dir=cache_dir, **vars(args)), **results, "problems": problems}
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+    for problem in problems:
+        print(f"FAILED: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Measure app startup: cold start, first render and steady-state reruns, each in a fresh process
+
+    python -m benchmarks.startup --processes 5 --reruns 10
+
+Every process starts the interpreter, imports Streamlit's AppTest and renders
+the Home page once (first render: app imports, bootstrap and first fetches),
+then reruns it in the same session and in new sessions (steady state: what each
+interaction costs once the process-wide resources are built). Cold start is the
+time from spawning the process until the first render has finished.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from .harness import (
+    APP_PATH,
+    REPO_ROOT,
+    environment_metadata,
+    start_mock_environment,
+    summarize,
+    write_results,
+)
+from .mock_tmdb import MockConfig
+
+
+def child(reruns, timeout):
+    """Run inside a fresh process: render the app and print the timings as JSON"""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    imported = time.perf_counter()
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.run()
+    first_render = time.perf_counter()
+
+    same_session = []
+    for _ in range(reruns):
+        rerun_started = time.perf_counter()
+        app.run()
+        same_session.append((time.perf_counter() - rerun_started) * 1000)
+
+    new_session = []
+    for _ in range(reruns):
+        rerun_started = time.perf_counter()
+        AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+        new_session.append((time.perf_counter() - rerun_started) * 1000)
+
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_render_ms": (first_render - imported) * 1000,
+        "same_session_ms": same_session,
+        "new_session_ms": new_session,
+        "errors": len(app.exception),
+        "modules": sorted(name for name in sys.modules if name.split(".")[0] in ("api", "components", "utils")),
+    }))
+
+
+def benchmark_startup(processes, reruns, timeout):
+    cold, imports, first, same_session, new_session, errors = [], [], [], [], [], 0
+    modules = []
+    for _ in range(processes):
+        spawned = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child", "--reruns", str(reruns), "--timeout", str(timeout)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        elapsed = (time.perf_counter() - spawned) * 1000
+        timings = json.loads(output.stdout.strip().splitlines()[-1])
+        # The spawn-to-first-render time, without the reruns that followed
+        cold.append(elapsed - sum(timings["same_session_ms"]) - sum(timings["new_session_ms"]))
+        imports.append(timings["import_ms"])
+        first.append(timings["first_render_ms"])
+        same_session.extend(timings["same_session_ms"])
+        new_session.extend(timings["new_session_ms"])
+        errors += timings["errors"]
+        modules = timings["modules"]
+    return {
+        "cold_start": summarize(cold),
+        "streamlit_import": summarize(imports),
+        "first_render": summarize(first),
+        "rerun_same_session": summarize(same_session),
+        "rerun_new_session": summarize(new_session),
+        "errors": errors,
+        "home_modules": modules,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=5)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock upstream latency in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="AppTest timeout per run, in seconds")
+    parser.add_argument("--output", default="bench/startup.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        # The parent has already pointed the environment at its mock server
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+        child(args.reruns, args.timeout)
+        return 0
+
+    config = MockConfig(latency=args.latency)
+    # Children inherit the environment, so every process shares this server but starts with cold memory
+    server, _ = start_mock_environment(config)
+
+    print("Startup:")
+    results = {
+        "meta": environment_metadata(mock=vars(config), processes=args.processes, reruns=args.reruns),
+        "startup": benchmark_startup(args.processes, args.reruns, args.timeout),
+    }
+    for name in ("cold_start", "first_render", "rerun_same_session", "rerun_new_session"):
+        summary = results["startup"][name]
+        print(f"  {name:<20} p50 {summary['p50_ms']:8.2f} ms   p95 {summary['p95_ms']:8.2f} ms")
+    write_results(results, args.output)
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
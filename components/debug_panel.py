@@ -0,0 +1,49 @@
+import streamlit as st
+from api.metrics import RENDER_LATENCY, LAST_RENDER, UPSTREAM_LATENCY, REQUESTS
+
+def _format_ms(seconds):
+    if seconds is None:
+        return "N/A"
+    if seconds == float("inf"):
+        return "> 10 s"
+    return f"{seconds * 1000:.0f} ms"
+
+def debug_panel(tmdb_service):
+    """Display request, cache and render timings for this process in the sidebar"""
+    with st.expander("Debug"):
+        last_renders = LAST_RENDER.collect()
+        if last_renders:
+            st.markdown("**Last rerun**")
+            for (section,), seconds in sorted(last_renders.items()):
+                st.markdown(f"{section.removeprefix('page:')}: {_format_ms(seconds)}")
+        
+        st.markdown("**Upstream latency**")
+        upstream = UPSTREAM_LATENCY.collect()
+        if not upstream:
+            st.caption("No upstream requests yet.")
+        for (family, outcome), (_, count, total) in sorted(upstream.items()):
+            p95 = UPSTREAM_LATENCY.quantile(0.95, family=family, outcome=outcome)
+            st.markdown(f"{family} ({outcome}): {count} requests, mean {_format_ms(total / count)}, p95 ≤ {_format_ms(p95)}")
+        
+        st.markdown("**Requests by source**")
+        for (family, source), count in sorted(REQUESTS.collect().items()):
+            st.markdown(f"{family} / {source}: {count}")
+        
+        cache_stats = tmdb_service.get_cache_stats()
+        if cache_stats:
+            st.markdown(f"**Cache hit ratio:** {cache_stats['hit_ratio']:.0%} ({cache_stats['memory_entries']} entries in memory)")
+        
+        request_stats = tmdb_service.get_request_stats()
+        st.markdown(
+            f"**Upstream:** {request_stats['upstream_requests']} fetched, "
+            f"{request_stats['coalesced_requests']} coalesced, "
+            f"{request_stats['rate_limited_requests']} rate limited"
+        )
+        
+        prefetch_stats = tmdb_service.get_prefetch_stats()
+        st.markdown(f"**Prefetch hit rate:** {prefetch_stats['hit_rate']:.0%} of {prefetch_stats['warmed']} warmed")
+        
+        st.markdown("**Component renders**")
+        for (section,), (_, count, total) in sorted(RENDER_LATENCY.collect().items()):
+            if not section.startswith("page:"):
+                st.markdown(f"{section}: {count} renders, mean {_format_ms(total / count)}")
@@ -1,18 +1,16 @@
 import streamlit as st
-from api.tmdb_service import TMDbService
-
-tmdb_service = TMDbService()
+from api.metrics import timed
+from utils.bootstrap import get_genres
 
 def genre_filter():
     """Display a genre filter dropdown"""
-    # Fetch genres
-    genres_data = tmdb_service.get_genres()
+    # Fetched once per process and shared by every session
+    genres = get_genres()
     
-    if not genres_data or "genres" not in genres_data:
+    if genres is None:
         st.warning("Failed to load genres.")
         return None
     
-    genres = genres_data["genres"]
     genre_options = ["All Genres"] + [genre["name"] for genre in genres]
     
     selected_genre = st.selectbox("Genre", genre_options)
@@ -82,8 +80,19 @@ def language_filter():
     
     return None
 
-def apply_filters():
-    """Display and apply all filters"""
+def apply_filters(live=False):
+    """Display and apply all filters
+
+    With `live` the filters apply on every change instead of waiting for the Apply button.
+    Applied filters are kept in session state, so they survive reruns of other parts of the page.
+    """
+    filters_panel(live)
+    return st.session_state.get("applied_filters")
+
+@st.fragment
+@timed("fragment:filters")
+def filters_panel(live):
+    """Display the filters expander; adjusting a filter reruns only this panel until it is applied"""
     with st.expander("Filters"):
         col1, col2 = st.columns(2)
         
@@ -95,7 +104,10 @@ def apply_filters():
             rating_range = rating_filter()
             language_code = language_filter()
         
-        apply_button = st.button("Apply Filters", use_container_width=True)
+        if live:
+            apply_button = True
+        else:
+            apply_button = st.button("Apply Filters", use_container_width=True)
         
         if apply_button:
             filters = {
@@ -110,6 +122,10 @@ def apply_filters():
             # Remove None values
             filters = {k: v for k, v in filters.items() if v is not None}
             
-            return filters
-    
-    return None
\ No newline at end of file
+            previous = st.session_state.get("applied_filters")
+            if filters != previous:
+                st.session_state.applied_filters = filters
+                # The results outside this fragment depend on the filters, so rerun the whole page.
+                # Live filters are first applied during a full run, which renders the results next anyway.
+                if previous is not None or not live:
+                    st.rerun()
@@ -1,62 +1,163 @@
+import time
 import streamlit as st
-from api.tmdb_service import TMDbService
-from utils.helpers import format_runtime, format_date, get_trailer_key, get_youtube_embed_url
+from concurrent.futures import as_completed, TimeoutError as FutureTimeoutError
+from api.cache import PANEL_SECTIONS
+from api.config import HYDRATION_DEADLINE_SECONDS, REQUEST_DEADLINE_SECONDS
+from api.metrics import timed
+from api.models import Movie, MovieDetails
+from utils.bootstrap import get_tmdb_service
+from utils.helpers import (
+    format_runtime, format_date, get_trailer_key, get_youtube_embed_url, rerun_fragment, stale_notice
+)
 
-tmdb_service = TMDbService()
 
+# Approximate rendered widths in pixels, used to pick the smallest image size that fits
+GRID_POSTER_WIDTH = 300
+CARD_POSTER_WIDTH = 300
+SIMILAR_POSTER_WIDTH = 300
+PROFILE_WIDTH = 150
+# Cast members named on a result card
+CARD_CAST_COUNT = 3
+
+@timed("movie_card")
 def movie_card(movie, expanded=False):
-    """Display a movie card with basic information"""
-    poster_url = tmdb_service.get_movie_poster_url(movie.get("poster_path"))
-    
+    """Display a movie card with basic information
+
+    Returns the placeholder under the rating that `fill_card_details` writes runtime, genres and cast into.
+    """
+    # Search results arrive as TMDb dicts, favorites as Movie summaries
+    movie = Movie.from_dict(movie)
     col1, col2 = st.columns([1, 3])
     
-    # In the movie_card function where st.image is used with use_column_width
     with col1:
-        if poster_url:
-            st.image(poster_url, use_container_width=True)
-        else:
-            st.image("https://via.placeholder.com/500x750?text=No+Image", use_container_width=True)
+        poster = get_tmdb_service().get_movie_poster_image(movie.poster_path, width=CARD_POSTER_WIDTH)
+        st.image(poster, use_container_width=True)
     
     with col2:
-        title = movie.get("title", "Unknown Title")
-        year = movie.get("release_date", "")[:4] if movie.get("release_date") else "Unknown Year"
-        
-        st.markdown(f"## {title} ({year})")
+        st.markdown(f"## {movie.title} ({movie.year})")
         
         # Rating
-        vote_average = movie.get("vote_average", 0)
-        st.markdown(f"**Rating:** ⭐ {vote_average:.1f}/10")
+        st.markdown(f"**Rating:** ⭐ {movie.vote_average:.1f}/10")
+        details_slot = st.empty()
         
         # Overview
-        overview = movie.get("overview", "No overview available.")
-        st.markdown(f"**Overview:** {overview}")
+        st.markdown(f"**Overview:** {movie.overview}")
         
         # Add to favorites button
-        if st.button("❤️ Add to Favorites", key=f"fav_{movie.get('id')}"):
-            if movie not in st.session_state.favorites:
-                st.session_state.favorites.append(movie)
-                st.success(f"Added {title} to favorites!")
-            else:
-                st.warning(f"{title} is already in your favorites!")
+        favorite_button(movie.id, movie.title, key=f"fav_{movie.id}")
     
     # Expandable section for more details
     if expanded:
         st.markdown("---")
-        display_movie_details(movie)
+        display_movie_details(movie.id)
+    
+    return details_slot
+
+def card_details_text(details):
+    """Get a card's one-line summary of runtime, genres and top cast from a MovieDetails"""
+    parts = []
+    if details.runtime:
+        parts.append(format_runtime(details.runtime))
+    if details.genres:
+        parts.append(", ".join(details.genres))
+    cast = [member.name for member in details.cast[:CARD_CAST_COUNT]]
+    if cast:
+        parts.append("Starring " + ", ".join(cast))
+    return " · ".join(parts)
+
+@timed("card_details")
+def fill_card_details(slots, deadline=HYDRATION_DEADLINE_SECONDS):
+    """Fill in cards as their movies' details arrive, waiting at most `deadline` seconds
+
+    `slots` maps movie ids to the placeholders returned by `movie_card`. Cards whose
+    details are cached fill in at once; fetches still running at the deadline carry
+    on into the shared cache, so the next render of those cards shows them.
+    """
+    futures = get_tmdb_service().hydrate_movies(list(slots))
+    movie_ids = {future: movie_id for movie_id, future in futures.items()}
+    try:
+        for future in as_completed(movie_ids, timeout=deadline):
+            data = future.result() if future.exception() is None else None
+            if data:
+                text = card_details_text(MovieDetails.from_dict(data))
+                if text:
+                    slots[movie_ids[future]].caption(text)
+    except FutureTimeoutError:
+        pass
+
+@st.fragment
+@timed("fragment:favorite_button")
+def favorite_button(movie_id, title, key):
+    """Display an Add to Favorites button; clicking it reruns only this button"""
+    if st.button("❤️ Add to Favorites", key=key):
+        if st.session_state.favorites.add(movie_id):
+            st.success(f"Added {title} to favorites!")
+        else:
+            st.warning(f"{title} is already in your favorites!")
+        # Fragment reruns skip the end of app.py, where favorites are normally saved
+        st.session_state.favorites.flush()
 
+def movie_strip(movies, key_prefix, count=4):
+    """Display a row of posters with View Details buttons that open the detail panel"""
+    columns = st.columns(count)
+    for i, movie in enumerate(movies[:count]):
+        movie = Movie.from_dict(movie)
+        with columns[i]:
+            poster = get_tmdb_service().get_movie_poster_image(movie.poster_path, width=SIMILAR_POSTER_WIDTH)
+            st.image(poster, use_container_width=True)
+            st.markdown(f"**{movie.title}**")
+            st.markdown(f"{movie.release_date[:4]}")
+            
+            if st.button("View Details", key=f"{key_prefix}_{movie.id}"):
+                st.session_state.selected_movie = movie.id
+                rerun_fragment()
+
+@st.fragment
+@timed("fragment:detail_panel")
+def detail_panel():
+    """Display the selected movie's details; its buttons rerun only this panel"""
+    if not st.session_state.get("selected_movie"):
+        return
+    
+    # Create a modal-like effect
+    st.markdown("---")
+    st.subheader("Movie Details")
+    
+    # Display movie details
+    display_movie_details(st.session_state.selected_movie)
+    
+    # Close button
+    if st.button("Close Details"):
+        st.session_state.selected_movie = None
+        rerun_fragment()
+
+def section_result(future, deadline):
+    """Get a detail section started by `fetch_movie_sections`, or None if it is not back by `deadline` (monotonic)"""
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        # The fetch carries on into the cache, so the next render has it
+        return None
+
+@timed("movie_details")
 def display_movie_details(movie_id):
     """Display detailed information about a movie"""
     # If movie_id is a dictionary (full movie object), extract the ID
     if isinstance(movie_id, dict):
         movie_id = movie_id.get("id")
     
-    # Fetch detailed movie information
-    movie = tmdb_service.get_movie_details(movie_id)
+    # Start the cast and trailer sections now; the header renders as soon as the basic details arrive
+    sections = get_tmdb_service().fetch_movie_sections(movie_id, PANEL_SECTIONS)
+    sections_deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+    data = get_tmdb_service().get_movie_details(movie_id, sections=())
     
-    if not movie:
+    if not data:
         st.error("Failed to load movie details.")
         return
     
+    stale_notice(data)
+    movie = MovieDetails.from_dict(data)
+    
     # Create a container with custom styling for a modal-like effect
     modal_container = st.container()
     
@@ -86,24 +187,19 @@ def display_movie_details(movie_id):
         # Header with movie title and close button
         col1, col2 = st.columns([5, 1])
         with col1:
-            title = movie.get("title", "Unknown Title")
-            year = movie.get("release_date", "")[:4] if movie.get("release_date") else "Unknown Year"
-            st.markdown(f"## {title} ({year})")
+            st.markdown(f"## {movie.title} ({movie.year})")
         
         with col2:
             if st.button("✖️ Close", key=f"close_modal_{movie_id}"):
                 st.session_state.selected_movie = None
-                st.rerun()
+                rerun_fragment()
         
         # Movie poster and basic info
         col1, col2 = st.columns([1, 3])
         
         with col1:
-            poster_url = tmdb_service.get_movie_poster_url(movie.get("poster_path"))
-            if poster_url:
-                st.image(poster_url, use_container_width=True)
-            else:
-                st.image("https://via.placeholder.com/500x750?text=No+Image", use_container_width=True)
+            poster = get_tmdb_service().get_movie_poster_image(movie.poster_path, width=CARD_POSTER_WIDTH)
+            st.image(poster, use_container_width=True)
         
         with col2:
             # Basic information
@@ -112,59 +208,56 @@ def display_movie_details(movie_id):
             col_a, col_b, col_c = st.columns(3)
             
             with col_a:
-                st.markdown(f"**Release Date:** {format_date(movie.get('release_date'))}")
+                st.markdown(f"**Release Date:** {format_date(movie.release_date)}")
             
             with col_b:
-                st.markdown(f"**Runtime:** {format_runtime(movie.get('runtime'))}")
+                st.markdown(f"**Runtime:** {format_runtime(movie.runtime)}")
             
             with col_c:
-                st.markdown(f"**Status:** {movie.get('status', 'N/A')}")
+                st.markdown(f"**Status:** {movie.status}")
             
             # Genres
-            genres = ", ".join([genre["name"] for genre in movie.get("genres", [])])
+            genres = ", ".join(movie.genres)
             st.markdown(f"**Genres:** {genres if genres else 'N/A'}")
             
             # Rating
-            vote_average = movie.get("vote_average", 0)
-            st.markdown(f"**Rating:** ⭐ {vote_average:.1f}/10")
+            st.markdown(f"**Rating:** ⭐ {movie.vote_average:.1f}/10")
             
             # Overview
-            overview = movie.get("overview", "No overview available.")
-            st.markdown(f"**Overview:** {overview}")
+            st.markdown(f"**Overview:** {movie.overview}")
             
             # Add to favorites button
-            if st.button("❤️ Add to Favorites", key=f"modal_fav_{movie_id}"):
-                if movie not in st.session_state.favorites:
-                    st.session_state.favorites.append(movie)
-                    st.success(f"Added {title} to favorites!")
-                else:
-                    st.warning(f"{title} is already in your favorites!")
+            favorite_button(movie.id, movie.title, key=f"modal_fav_{movie_id}")
         
         st.markdown('<hr class="modal-section">', unsafe_allow_html=True)
         
         # Cast
         st.markdown("### Top Cast")
-        cast_cols = st.columns(4)
-        
-        cast = movie.get("credits", {}).get("cast", [])
-        for i, actor in enumerate(cast[:4]):
-            with cast_cols[i]:
-                profile_url = tmdb_service.get_profile_url(actor.get("profile_path"))
-                if profile_url:
-                    st.image(profile_url, width=150)
-                else:
-                    st.image("https://via.placeholder.com/150x225?text=No+Image", width=150)
-                st.markdown(f"**{actor.get('name')}**")
-                st.markdown(f"as {actor.get('character')}")
+        credits = section_result(sections["credits"], sections_deadline)
+        if credits is None:
+            st.info("Cast is unavailable right now.")
+        else:
+            movie.add_section("credits", credits)
+            cast_cols = st.columns(4)
+            
+            for i, actor in enumerate(movie.cast[:4]):
+                with cast_cols[i]:
+                    profile = get_tmdb_service().get_profile_image(actor.profile_path, width=PROFILE_WIDTH)
+                    st.image(profile, width=PROFILE_WIDTH)
+                    st.markdown(f"**{actor.name}**")
+                    st.markdown(f"as {actor.character}")
         
         st.markdown('<hr class="modal-section">', unsafe_allow_html=True)
         
         # Trailer
         st.markdown("### Trailer")
-        videos = movie.get("videos", {})
-        trailer_key = get_trailer_key(videos)
+        videos = section_result(sections["videos"], sections_deadline)
+        movie.add_section("videos", videos)
+        trailer_key = get_trailer_key(movie.videos)
         
-        if trailer_key:
+        if videos is None:
+            st.info("The trailer is unavailable right now.")
+        elif trailer_key:
             trailer_url = get_youtube_embed_url(trailer_key)
             st.video(trailer_url)
         else:
@@ -172,25 +265,13 @@ def display_movie_details(movie_id):
         
         st.markdown('<hr class="modal-section">', unsafe_allow_html=True)
         
-        # Similar Movies
+        # Similar Movies, answered locally when recommendations have been built
         st.markdown("### Similar Movies")
-        similar_movies = movie.get("similar", {}).get("results", [])
+        similar_data = get_tmdb_service().get_similar_movies(movie.id)
+        similar_movies = [Movie.from_dict(m) for m in (similar_data or {}).get("results", [])]
         
         if similar_movies:
-            similar_cols = st.columns(4)
-            for i, similar_movie in enumerate(similar_movies[:4]):
-                with similar_cols[i]:
-                    poster_url = tmdb_service.get_movie_poster_url(similar_movie.get("poster_path"))
-                    if poster_url:
-                        st.image(poster_url, use_container_width=True)
-                    else:
-                        st.image("https://via.placeholder.com/500x750?text=No+Image", use_container_width=True)
-                    st.markdown(f"**{similar_movie.get('title')}**")
-                    st.markdown(f"{similar_movie.get('release_date', '')[:4] if similar_movie.get('release_date') else ''}")
-                    
-                    if st.button("View Details", key=f"similar_{similar_movie.get('id')}"):
-                        st.session_state.selected_movie = similar_movie.get('id')
-                        st.rerun()
+            movie_strip(similar_movies, key_prefix="similar")
         else:
             st.info("No similar movies found.")
         
@@ -0,0 +1,62 @@
+import streamlit as st
+from api.config import RESULTS_WINDOW_PAGES
+from components.movie_card import movie_card, fill_card_details
+from utils.helpers import load_with_spinner, rerun_fragment
+
+# TMDb serves at most this many pages of search or discover results
+MAX_PAGES = 500
+
+def result_window(key):
+    """Get the session's window of result pages for `key`, starting a new one when the list changes"""
+    window = st.session_state.get("result_window")
+    if window is None or window["key"] != key:
+        window = st.session_state.result_window = {"key": key, "first": 1, "last": 1}
+    return window
+
+def windowed_results(key, fetch_page, total_pages, window_pages=RESULTS_WINDOW_PAGES):
+    """Display a bounded window of result pages with buttons to load more or show earlier results
+
+    Only the window's bounds live in session state; pages are fetched through the
+    shared response cache on each render, and pages that slide out of the window
+    are no longer rendered, so memory and page size stay bounded however far the
+    user goes. Cards show their runtime, genres and cast once the window's details
+    arrive, fetched together after everything else is on screen. Returns (movies on the last page shown, next page number or None).
+    Must be called from a fragment, which the buttons rerun.
+    """
+    window = result_window(key)
+    last_page = min(total_pages, MAX_PAGES)
+    
+    if window["first"] > 1:
+        if st.button("Show earlier results", key="window_earlier", use_container_width=True):
+            window["first"] -= 1
+            window["last"] = min(window["last"], window["first"] + window_pages - 1)
+            rerun_fragment()
+    
+    movies = []
+    slots = {}
+    # Results can shift between pages while the user browses; show each movie once
+    seen = set()
+    for page in range(window["first"], window["last"] + 1):
+        results = load_with_spinner(fetch_page, page)
+        movies = (results or {}).get("results", [])
+        if not movies:
+            st.info("No more results.")
+            break
+        for movie in movies:
+            if movie.get("id") in seen:
+                continue
+            seen.add(movie.get("id"))
+            slots[movie.get("id")] = movie_card(movie)
+            st.markdown("---")
+    
+    st.caption(f"Showing pages {window['first']}–{window['last']} of {last_page}")
+    
+    next_page = window["last"] + 1 if window["last"] < last_page else None
+    if next_page is not None and movies:
+        if st.button("Load more", key="window_more", use_container_width=True):
+            window["last"] += 1
+            window["first"] = max(window["first"], window["last"] - window_pages + 1)
+            rerun_fragment()
+    
+    fill_card_details(slots)
+    return movies, next_page
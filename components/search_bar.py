@@ -1,8 +1,57 @@
 import streamlit as st
+from api.config import SEARCH_DEBOUNCE_SECONDS, SEARCH_MIN_QUERY_LENGTH
+from api.incremental_search import SuggestionTrie
+
+try:
+    # Listed in requirements.txt; reports keystrokes instead of waiting for Enter, which is the fallback without it
+    from st_keyup import st_keyup
+except ImportError:
+    st_keyup = None
+
+def use_query(query):
+    """Put a query in the search box, which searches for it"""
+    st.session_state.search_input = query
+    # st_keyup keeps its own text once mounted, so it is remounted under a new key to show the query
+    st.session_state.search_input_version = st.session_state.get("search_input_version", 0) + 1
+
+def remember_search(query):
+    """Add a query to the search history and the suggestions built from it, once per search"""
+    if st.session_state.get("remembered_search") == query:
+        return
+    st.session_state.remembered_search = query
+    if query not in st.session_state.search_history:
+        st.session_state.search_history.insert(0, query)
+        # Keep only the last 5 searches
+        st.session_state.search_history = st.session_state.search_history[:5]
+    st.session_state.suggestions.insert(query)
 
 def search_bar():
-    """Display a search bar for movies"""
-    search_query = st.text_input("Search for movies...", key="search_input")
+    """Display a search bar that searches as you type
+
+    Returns the text typed so far once it is long enough to search for, otherwise None.
+    """
+    if "suggestions" not in st.session_state:
+        st.session_state.suggestions = SuggestionTrie()
+    
+    if st_keyup is not None:
+        search_query = st_keyup(
+            "Search for movies...",
+            value=st.session_state.get("search_input", ""),
+            key=f"search_input_{st.session_state.get('search_input_version', 0)}",
+            debounce=int(SEARCH_DEBOUNCE_SECONDS * 1000)
+        )
+        st.session_state.search_input = search_query or ""
+    else:
+        search_query = st.text_input("Search for movies...", key="search_input")
+    search_query = (search_query or "").strip()
+    
+    # Complete the text typed so far from past searches
+    suggestions = [s for s in st.session_state.suggestions.complete(search_query) if s != search_query]
+    if search_query and suggestions:
+        cols = st.columns(len(suggestions))
+        for col, suggestion in zip(cols, suggestions):
+            with col:
+                st.button(suggestion, key=f"suggestion_{suggestion}", on_click=use_query, args=(suggestion,))
     
     col1, col2 = st.columns([3, 1])
     
@@ -10,19 +59,11 @@ def search_bar():
         search_button = st.button("Search", use_container_width=True)
     
     with col2:
-        clear_button = st.button("Clear", use_container_width=True)
-    
-    if clear_button:
-        st.session_state.search_input = ""
-        return None
+        st.button("Clear", use_container_width=True, on_click=use_query, args=("",))
     
     if search_button and search_query:
-        # Add to search history
-        if search_query not in st.session_state.search_history:
-            st.session_state.search_history.insert(0, search_query)
-            # Keep only the last 5 searches
-            st.session_state.search_history = st.session_state.search_history[:5]
-        
-        return search_query
+        remember_search(search_query)
     
-    return None
\ No newline at end of file
+    if len(search_query) < SEARCH_MIN_QUERY_LENGTH:
+        return None
+    return search_query
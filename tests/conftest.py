@@ -0,0 +1,50 @@
+"""Shared fixtures: every test runs against the mock TMDb server and a throwaway cache directory
+
+The configuration under `api` is read from the environment at import time, so the
+environment is set up here, before any test module imports it.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import APP_PATH, start_mock_environment  # noqa: E402
+
+_server, CACHE_DIR = start_mock_environment(env={
+    # Tests build the trending snapshot themselves when they need one
+    "TMDB_TRENDING_SNAPSHOT_REFRESH_SECONDS": "0",
+    "TMDB_PREFETCH_ENABLED": "0",
+    # Failures and hangs should show up at once rather than after retries and long timeouts
+    "TMDB_HTTP_MAX_RETRIES": "0",
+    "TMDB_REQUEST_DEADLINE_SECONDS": "1",
+    "TMDB_IMAGE_DEADLINE_SECONDS": "1",
+})
+
+
+@pytest.fixture(scope="session")
+def mock_tmdb():
+    """The mock TMDb server shared by the whole run"""
+    yield _server
+
+
+@pytest.fixture
+def mock_config(mock_tmdb):
+    """The mock server's config, restored after the test"""
+    saved = dict(vars(mock_tmdb.config))
+    yield mock_tmdb.config
+    vars(mock_tmdb.config).update(saved)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """Get an AppTest of app.py that has rendered once"""
+    testing = pytest.importorskip("streamlit.testing.v1")
+    import components.search_bar
+
+    # AppTest cannot drive custom components, so search with the text_input fallback
+    monkeypatch.setattr(components.search_bar, "st_keyup", None)
+    at = testing.AppTest.from_file(APP_PATH, default_timeout=60)
+    at.run()
+    return at
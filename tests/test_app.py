@@ -0,0 +1,90 @@
+"""Render every page of app.py with Streamlit's AppTest against the mock TMDb server"""
+import pytest
+
+from benchmarks.harness import APP_PATH
+
+
+def click(app, label, index=0):
+    buttons = [button for button in app.button if button.label == label]
+    assert buttons, f"no {label!r} button"
+    buttons[index].click().run()
+
+
+def test_home(app):
+    assert not app.exception
+    assert [button for button in app.button if button.label == "View Details"]
+
+    click(app, "Next Page")
+    assert not app.exception
+
+
+def test_details_and_favorites(app):
+    click(app, "View Details")
+    assert not app.exception
+    assert any(block.value.startswith("## ") for block in app.markdown)
+
+    click(app, "❤️ Add to Favorites")
+    assert not app.exception
+    assert app.session_state["favorites"]
+
+    app.sidebar.radio[0].set_value("Favorites").run()
+    assert not app.exception
+    assert [button for button in app.button if button.label == "Remove"]
+
+
+def test_search_while_results_stream_in(app, mock_config):
+    # Slow enough that the first render shows the streaming view
+    mock_config.latency = 0.5
+    app.sidebar.radio[0].set_value("Search").run()
+    assert not app.exception
+
+    app.session_state["search_input"] = "night river"
+    app.run()
+    assert not app.exception
+
+
+def test_search_results(app):
+    app.sidebar.radio[0].set_value("Search").run()
+    app.session_state["search_input"] = "silent garden"
+    app.run()
+    # Again once every page has arrived, when the full results view takes over
+    assert app.session_state["incremental_search"].stream.wait(10)
+    app.run()
+    assert not app.exception
+    assert any(block.value.startswith("Search Results for") for block in app.subheader)
+    # Remembered once all its results are in, without a Search click
+    assert app.session_state["search_history"] == ["silent garden"]
+
+    click(app, "Clear")
+    assert app.text_input(key="search_input").value == ""
+    [recent] = [button for button in app.sidebar.button if button.label == "silent garden"]
+    recent.click().run()
+    assert not app.exception
+    assert app.text_input(key="search_input").value == "silent garden"
+
+
+def test_filters(app):
+    app.sidebar.radio[0].set_value("Search").run()
+    app.slider[1].set_value((7.0, 10.0))
+    if [button for button in app.button if button.label == "Apply Filters"]:
+        click(app, "Apply Filters")
+    else:
+        app.run()
+    assert not app.exception
+
+
+def test_entered_api_key_stays_in_its_session(monkeypatch):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    from api.tmdb_service import TMDbService
+    from utils import bootstrap
+
+    shared = TMDbService()
+    shared.api_key = None
+    monkeypatch.setattr(bootstrap, "get_shared_tmdb_service", lambda: shared)
+    app = testing.AppTest.from_file(APP_PATH, default_timeout=60)
+    app.run()
+
+    app.sidebar.text_input[0].input("visitor-key").run()
+    assert not app.exception
+    assert app.session_state["tmdb_service"].api_key == "visitor-key"
+    assert shared.api_key is None
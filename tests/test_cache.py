@@ -0,0 +1,101 @@
+import threading
+import time
+
+from api.cache import ResponseCache, cache_key, mark_stale, stale_since
+from api.single_flight import SingleFlight
+
+
+def test_cache_key_ignores_api_key_and_param_order():
+    assert cache_key("search/movie", {"query": "heat", "page": 1, "api_key": "secret"}) == \
+        cache_key("/search/movie/", {"page": "1", "query": "heat"})
+    assert cache_key("search/movie", {"page": 1}) != cache_key("search/movie", {"page": 2})
+
+
+def test_fresh_entry_is_served_from_memory(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    cache.set("k", "movie/1", {"id": 1}, ttl=60, stale_ttl=60)
+
+    entry = cache.get("k")
+    assert entry.value == {"id": 1}
+    assert entry.is_fresh()
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_entries_survive_a_restart_on_disk(tmp_path):
+    ResponseCache(directory=str(tmp_path)).set("k", "movie/1", {"id": 1}, ttl=60, stale_ttl=60)
+
+    cache = ResponseCache(directory=str(tmp_path))
+    assert cache.get("k").value == {"id": 1}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_expired_entry_is_stale_then_unservable(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    cache.set("stale", "movie/1", {"id": 1}, ttl=0, stale_ttl=60)
+    cache.set("dead", "movie/2", {"id": 2}, ttl=0, stale_ttl=0)
+
+    stale = cache.get("stale")
+    assert not stale.is_fresh() and stale.is_servable()
+    dead = cache.get("dead")
+    assert not dead.is_servable()
+
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_is_bounded(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path), max_entries=2)
+    for i in range(3):
+        cache.set(f"k{i}", "movie/1", {"id": i}, ttl=60, stale_ttl=60)
+    assert cache.stats()["memory_entries"] == 2
+    # Evicted from memory, still on disk
+    assert cache.get("k0").value == {"id": 0}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_purge_keeps_entries_inside_the_offline_grace_period(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    cache.set("old", "movie/1", {"id": 1}, ttl=0, stale_ttl=0)
+    time.sleep(0.01)
+    assert cache.purge_expired(keep_seconds=60) == 0
+    assert cache.purge_expired(keep_seconds=0) == 1
+
+
+def test_mark_stale_records_when_the_response_was_stored(tmp_path):
+    cache = ResponseCache(directory=str(tmp_path))
+    entry = cache.set("k", "movie/1", {"id": 1}, ttl=0, stale_ttl=0)
+
+    data = mark_stale(entry)
+    assert stale_since(data) == entry.stored_at
+    assert stale_since(entry.value) is None
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", fetch))) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    deadline = time.monotonic() + 2
+    while flight.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["result"] * 5
+    assert flight.in_flight() == 0
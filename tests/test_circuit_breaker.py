@@ -0,0 +1,76 @@
+import threading
+import time
+
+from api.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure("movie")
+    assert breaker.allow("movie")
+
+    breaker.record_failure("movie")
+    assert breaker.state("movie") == OPEN
+    assert not breaker.allow("movie")
+    assert breaker.stats()["movie"]["trips"] == 1
+
+
+def test_families_are_independent():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure("search")
+    assert not breaker.allow("search")
+    assert breaker.allow("movie")
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure("movie")
+    breaker.record_success("movie")
+    breaker.record_failure("movie")
+    assert breaker.state("movie") == CLOSED
+
+
+def test_successful_probe_closes_the_circuit():
+    probed = threading.Event()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+
+    def probe():
+        probed.set()
+        breaker.record_success("movie")
+
+    breaker.record_failure("movie", probe=probe)
+    assert wait_for(probed.is_set)
+    assert wait_for(lambda: breaker.state("movie") == CLOSED)
+    assert breaker.allow("movie")
+
+
+def test_failed_probe_reopens_for_longer():
+    states = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05, max_reset_seconds=0.1)
+
+    def probe():
+        states.append(breaker.state("movie"))
+        breaker.record_failure("movie")
+
+    breaker.record_failure("movie", probe=probe)
+    assert wait_for(lambda: breaker.stats()["movie"]["trips"] >= 2)
+    assert states[0] == HALF_OPEN
+    assert breaker._circuits["movie"].reset_seconds == 0.1
+
+
+def test_disabled_breaker_always_allows():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure("movie")
+    assert breaker.allow("movie")
+    assert breaker.stats() == {}
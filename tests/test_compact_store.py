@@ -0,0 +1,82 @@
+import json
+import zlib
+
+import pytest
+
+from api.compact_store import (
+    CODEC_ZLIB, CODEC_ZSTD, DictionaryCodec, denormalize_details, encode, normalize_details, referenced_ids,
+    train_dictionary, zstandard,
+)
+from benchmarks.mock_tmdb import MockConfig, make_details
+
+CODECS = [CODEC_ZLIB, pytest.param(CODEC_ZSTD, marks=pytest.mark.skipif(zstandard is None, reason="needs zstandard"))]
+
+
+@pytest.fixture
+def details():
+    config = MockConfig(people=500)
+    return [make_details(movie_id, config, ("credits", "videos", "keywords", "similar")) for movie_id in range(1, 301)]
+
+
+def test_normalize_round_trip(details):
+    for payload in details:
+        document, people, movies = normalize_details(payload)
+        person_ids, movie_ids = referenced_ids(document)
+        assert person_ids == set(people)
+        assert movie_ids == set(movies)
+        assert denormalize_details(document, people, movies) == payload
+
+
+def test_normalize_is_idempotent(details):
+    document, _, _ = normalize_details(details[0])
+    assert normalize_details(document) == (document, {}, {})
+
+
+def test_people_are_stored_once_per_id(details):
+    document, people, _ = normalize_details(details[0])
+    for entry in document["credits"]["cast"]:
+        assert "name" not in entry
+        assert "name" in people[entry["id"]]
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_codec_round_trip_with_a_trained_dictionary(details, codec):
+    samples = [encode(normalize_details(payload)[0]) for payload in details]
+    dictionary = train_dictionary(samples, codec)
+    assert dictionary
+
+    store = DictionaryCodec(load=lambda dictionary_id: pytest.fail("dictionary should be registered"))
+    store.add(1, "movie", codec, dictionary)
+    for payload in details[:20]:
+        blob = store.compress("movie", payload)
+        assert blob[0] == codec
+        assert store.decompress(blob) == payload
+
+
+def test_dictionary_is_loaded_on_first_use(details):
+    samples = [encode(payload) for payload in details]
+    dictionary = train_dictionary(samples, CODEC_ZLIB)
+    writer = DictionaryCodec(load=None)
+    writer.add(7, "movie", CODEC_ZLIB, dictionary)
+    blob = writer.compress("movie", details[0])
+
+    loaded = []
+    reader = DictionaryCodec(load=lambda dictionary_id: loaded.append(dictionary_id) or (CODEC_ZLIB, dictionary))
+    assert reader.decompress(blob) == details[0]
+    assert reader.decompress(blob) == details[0]
+    assert loaded == [7]
+
+
+def test_reads_blobs_written_without_a_dictionary(details):
+    store = DictionaryCodec(load=None)
+    assert not store.has_dictionary("movie")
+    assert store.decompress(store.compress("movie", details[0])) == details[0]
+
+
+def test_reads_legacy_zlib_blobs(details):
+    legacy = zlib.compress(json.dumps(details[0]).encode("utf-8"))
+    assert DictionaryCodec(load=None).decompress(legacy) == details[0]
+
+
+def test_zlib_dictionary_needs_samples():
+    assert train_dictionary([], CODEC_ZLIB) is None
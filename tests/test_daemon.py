@@ -0,0 +1,29 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from api.config import REQUEST_DEADLINE_SECONDS
+from api.daemon import DaemonTMDbService
+
+
+@pytest.fixture
+def hung_daemon(tmp_path):
+    """A Unix socket that accepts connections and never answers"""
+    path = str(tmp_path / "daemon.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(server.accept()), daemon=True).start()
+    yield path
+    server.close()
+
+
+def test_hung_daemon_is_served_locally_near_the_request_deadline(hung_daemon, mock_tmdb):
+    service = DaemonTMDbService(hung_daemon)
+    started = time.monotonic()
+    data = service.search_movies("night river")
+    assert data["results"]
+    assert time.monotonic() - started < REQUEST_DEADLINE_SECONDS + 3
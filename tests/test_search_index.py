@@ -0,0 +1,39 @@
+import pytest
+
+from api.search_index import MovieSearchIndex, build_index
+
+MOVIES = [
+    {"id": 1, "title": "Inter", "popularity": 5.0},
+    {"id": 2, "title": "Interstellar", "popularity": 50.0},
+    {"id": 3, "title": "Night River", "popularity": 10.0},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    build_index(MOVIES, directory=str(tmp_path))
+    return MovieSearchIndex(directory=str(tmp_path))
+
+
+def ids(index, query):
+    total, docs = index.search(query)
+    return [index.document(doc)["id"] for doc in docs]
+
+
+def test_exact_and_prefix_matches(index):
+    assert ids(index, "night river") == [3]
+    assert ids(index, "night riv") == [3]
+
+
+def test_misspelled_terms_match(index):
+    assert ids(index, "intersteller")[0] == 2
+
+
+def test_fuzzy_similarity_counts_trigrams_no_title_has(tmp_path):
+    build_index([{"id": 1, "title": "Inter"}], directory=str(tmp_path))
+    index = MovieSearchIndex(directory=str(tmp_path))
+    # "interdxv" has 8 trigrams and shares "^in", "int", "nte" and "ter" with the 5 of "inter"; its other
+    # four hash past every trigram in the index, which is where unknown trigrams used to be dropped
+    [(term_id, similarity)] = index._fuzzy_terms("interdxv")
+    assert term_id == index._term_id("inter")
+    assert similarity == pytest.approx(4 / (8 + 5 - 4))
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from api.cache import cache_key, stale_since
+from api.circuit_breaker import OPEN, CircuitBreaker
+from api import tmdb_service
+from api.tmdb_service import TMDbService
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def service(mock_tmdb):
+    """A TMDbService with an empty response cache and a breaker of its own"""
+    service = TMDbService()
+    service.cache.clear()
+    service.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    mock_tmdb.reset_stats()
+    return service
+
+
+def test_second_request_is_served_from_the_cache(service, mock_tmdb):
+    first, source = service._cached_request("movie/11", {})
+    assert source == "miss" and first["id"] == 11
+    again, source = service._cached_request("movie/11", {})
+    assert source == "fresh" and again == first
+    assert mock_tmdb.stats()["requests"] == 1
+
+
+def test_stale_entry_is_served_and_refreshed_in_the_background(service, mock_tmdb):
+    data, _ = service._cached_request("movie/12", {})
+    key = cache_key("movie/12", {})
+    service.cache.set(key, "movie/12", data, ttl=0, stale_ttl=60)
+
+    stale, source = service._cached_request("movie/12", {})
+    assert source == "stale" and stale == data
+    assert wait_for(lambda: service.cache.get(key).is_fresh())
+    assert mock_tmdb.stats()["requests"] == 2
+
+
+def test_last_known_good_is_served_while_upstream_fails(service, mock_config):
+    data, _ = service._cached_request("movie/13", {})
+    service.cache.set(cache_key("movie/13", {}), "movie/13", data, ttl=0, stale_ttl=0)
+
+    mock_config.error_rate = 1.0
+    for _ in range(2):
+        offline, source = service._cached_request("movie/13", {})
+        assert source == "offline"
+        assert stale_since(offline) is not None
+    assert service.breaker.state("movie") == OPEN
+
+    # With the circuit open, upstream is not asked at all
+    offline, source = service._cached_request("movie/13", {})
+    assert source == "offline" and offline["id"] == 13
+
+
+def test_hung_upstream_opens_the_circuit_at_the_deadline(service, mock_config):
+    mock_config.hang = 3
+    started = time.monotonic()
+    for movie_id in (21, 22):
+        assert service._cached_request(f"movie/{movie_id}", {}) == (None, "miss")
+    assert service.breaker.state("movie") == OPEN
+    # Each request gave up at the one second deadline instead of waiting out the hang
+    assert time.monotonic() - started < 4
+
+    started = time.monotonic()
+    assert service._cached_request("movie/23", {}) == (None, "offline")
+    assert time.monotonic() - started < 0.5
+
+
+def test_overdue_request_that_then_fails_is_counted_once(service, mock_config):
+    mock_config.hang = 1.5
+    mock_config.error_rate = 1.0
+    assert service._cached_request("movie/31", {}) == (None, "miss")
+    # Let the fetch fail after the deadline has already counted it
+    assert wait_for(lambda: not tmdb_service._overdue)
+    assert service.breaker.state("movie") != OPEN
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from api import trending_snapshot
+from api.config import POSTER_SIZES, TRENDING_SNAPSHOT_POSTER_WIDTH
+from api.image_cache import pick_size
+from api.trending_snapshot import TrendingSnapshot, build_snapshot, get_trending_snapshot
+from api.tmdb_service import TMDbService
+from benchmarks.harness import REPO_ROOT
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, monkeypatch):
+    """Point the process-wide snapshot at a fresh file, checked for republishing on every call"""
+    path = str(tmp_path / "trending.snapshot")
+    monkeypatch.setattr(trending_snapshot, "TRENDING_SNAPSHOT_FILE", path)
+    monkeypatch.setattr(trending_snapshot, "RELOAD_CHECK_SECONDS", 0)
+    monkeypatch.setattr(trending_snapshot, "_snapshot_checked_at", None)
+    return path
+
+
+def test_build_and_read(snapshot_file):
+    service = TMDbService()
+    assert build_snapshot(service, snapshot_file, pages=2) == 4
+
+    snapshot = TrendingSnapshot(snapshot_file)
+    page = snapshot.page("week", 2)
+    assert page["page"] == 2
+    movie = page["results"][0]
+    assert movie["genre_names"]
+    poster = snapshot.image(movie["poster_path"], pick_size(POSTER_SIZES, TRENDING_SNAPSHOT_POSTER_WIDTH))
+    assert poster[:8] == b"\x89PNG\r\n\x1a\n"
+    assert snapshot.page("week", 3) is None
+
+
+def test_pages_are_served_without_upstream_requests(snapshot_file, mock_tmdb):
+    service = TMDbService()
+    build_snapshot(service, snapshot_file, pages=1)
+    mock_tmdb.reset_stats()
+
+    data = service.get_trending_movies("day", page=1)
+    assert data["results"]
+    assert service.get_movie_poster_image(data["results"][0]["poster_path"], width=300)
+    assert mock_tmdb.stats()["requests"] == 0
+
+
+def test_republishing_swaps_the_file_under_open_readers(snapshot_file):
+    service = TMDbService()
+    build_snapshot(service, snapshot_file, pages=1)
+    before = get_trending_snapshot()
+    inode = os.stat(snapshot_file).st_ino
+
+    build_snapshot(service, snapshot_file, pages=2)
+    assert os.stat(snapshot_file).st_ino != inode
+    assert not [name for name in os.listdir(os.path.dirname(snapshot_file)) if ".tmp-" in name]
+
+    # Readers holding the old mapping keep a complete snapshot; new readers get the new one
+    assert len(before.pages) == 2 and before.page("day", 1)["results"]
+    after = get_trending_snapshot()
+    assert after is not before
+    assert len(after.pages) == 4
+
+
+def test_job_stops_quietly_when_the_interpreter_exits():
+    # Exits while the first build is still fetching, after its thread pools have shut down
+    script = textwrap.dedent("""
+        import time
+        from benchmarks.harness import start_mock_environment
+        from benchmarks.mock_tmdb import MockConfig
+
+        start_mock_environment(MockConfig(latency=0.05))
+        from api.tmdb_service import TMDbService
+        from api.trending_snapshot import start_snapshot_job
+
+        start_snapshot_job(TMDbService(), interval=3600)
+        time.sleep(0.3)
+    """)
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "Error building trending snapshot" not in result.stdout + result.stderr
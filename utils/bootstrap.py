@@ -0,0 +1,77 @@
+import os
+import streamlit as st
+
+# Everything here is built on first use and shared by every session in the process;
+# app.py reruns from the top on each interaction, so anything it constructs itself is rebuilt every time
+CSS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "styles.css")
+
+@st.cache_resource(show_spinner=False)
+def get_shared_tmdb_service():
+    """Get the TMDb service shared by every session, served by the cache daemon when one is configured"""
+    from api.config import DAEMON_SOCKET
+    if DAEMON_SOCKET:
+        from api.daemon import DaemonTMDbService
+        return DaemonTMDbService(DAEMON_SOCKET)
+    
+    from api.tmdb_service import TMDbService
+    from api.trending_snapshot import start_snapshot_job
+    service = TMDbService()
+    start_snapshot_job(service)
+    return service
+
+def get_tmdb_service():
+    """Get this session's TMDb service: the shared one, or a copy using the API key the visitor entered
+
+    The key lives in the session, never on the shared service, so it is used for this visitor's requests only.
+    """
+    service = get_shared_tmdb_service()
+    api_key = st.session_state.get("tmdb_api_key")
+    if not api_key:
+        return service
+    session_service = st.session_state.get("tmdb_service")
+    if session_service is None or session_service.api_key != api_key:
+        session_service = st.session_state.tmdb_service = service.with_api_key(api_key)
+    return session_service
+
+@st.cache_resource(show_spinner=False)
+def _get_shared_batch_service():
+    from api.async_tmdb_service import BatchTMDbService
+    return BatchTMDbService(get_shared_tmdb_service())
+
+def get_batch_service():
+    """Get the batch service used to hydrate favorites, sharing the TMDb service's pool and caches"""
+    service = get_tmdb_service()
+    if service is get_shared_tmdb_service():
+        return _get_shared_batch_service()
+    from api.async_tmdb_service import BatchTMDbService
+    return BatchTMDbService(service)
+
+@st.cache_resource(show_spinner=False)
+def get_css():
+    """Get the app stylesheet, read from disk once"""
+    with open(CSS_FILE, "r") as f:
+        return f.read()
+
+@st.cache_resource(show_spinner=False)
+def _fetch_genres():
+    genres_data = get_tmdb_service().get_genres()
+    if not genres_data or "genres" not in genres_data:
+        # Raising keeps the failure out of the cache, so the next caller tries again
+        raise LookupError("TMDb returned no genre list")
+    return genres_data["genres"]
+
+def get_genres():
+    """Get the official movie genres, fetched once per process, or None if they could not be loaded"""
+    try:
+        return _fetch_genres()
+    except LookupError:
+        return None
+
+
+def get_genre_names(genre_ids):
+    """Get the names of the given genre ids, or an empty list if the genres could not be loaded"""
+    genres = get_genres()
+    if not genres:
+        return []
+    names = {genre["id"]: genre["name"] for genre in genres}
+    return [names[genre_id] for genre_id in genre_ids if genre_id in names]
@@ -1,5 +1,9 @@
 import streamlit as st
 import time
+import uuid
+from streamlit.errors import StreamlitAPIException
+from api.cache import stale_since
+from api.favorites import FavoritesStore
 
 def format_runtime(minutes):
     """Format runtime from minutes to hours and minutes"""
@@ -37,31 +41,57 @@ def load_with_spinner(func, *args, **kwargs):
     with st.spinner("Loading..."):
         return func(*args, **kwargs)
 
+def format_age(seconds):
+    """Format an age in seconds as a rough count of days, hours or minutes"""
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return "moments"
+
+def stale_notice(data):
+    """Tell the user when a response is a saved copy served because TMDb is unreachable"""
+    stored_at = stale_since(data)
+    if stored_at is not None:
+        st.warning(f"TMDb is unreachable right now, so this is a copy saved {format_age(time.time() - stored_at)} ago.")
+
+def rerun_fragment():
+    """Rerun only the calling fragment, or the whole script when the fragment is running as part of it"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
 def get_trailer_key(videos):
-    """Get the key of the official trailer from videos list"""
-    if not videos or "results" not in videos:
+    """Get the key of the official trailer from a list of Video models"""
+    if not videos:
         return None
     
     # First, try to find the official trailer
-    for video in videos["results"]:
-        if video["type"].lower() == "trailer" and "official" in video["name"].lower():
-            return video["key"]
+    for video in videos:
+        if video.type.lower() == "trailer" and "official" in video.name.lower():
+            return video.key
     
     # If no official trailer, get any trailer
-    for video in videos["results"]:
-        if video["type"].lower() == "trailer":
-            return video["key"]
+    for video in videos:
+        if video.type.lower() == "trailer":
+            return video.key
     
     # If no trailer at all, get any video
-    if videos["results"]:
-        return videos["results"][0]["key"]
-    
-    return None
+    return videos[0].key
+
+def get_user_id():
+    """Get the id favorites are saved under, kept in the URL so a bookmark or reload finds them again"""
+    user_id = st.query_params.get("user")
+    if not user_id:
+        user_id = st.query_params["user"] = uuid.uuid4().hex
+    return user_id
 
 def init_session_state():
     """Initialize session state variables"""
+    # Favorites are movie ids, persisted per user and hydrated from the response cache for display
     if "favorites" not in st.session_state:
-        st.session_state.favorites = []
+        st.session_state.favorites = FavoritesStore(get_user_id())
     
     if "search_history" not in st.session_state:
         st.session_state.search_history = []
@@ -70,4 +100,7 @@ def init_session_state():
         st.session_state.current_page = 1
         
     if "selected_movie" not in st.session_state:
-        st.session_state.selected_movie = None
\ No newline at end of file
+        st.session_state.selected_movie = None
+    
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
\ No newline at end of file